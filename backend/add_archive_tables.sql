@@ -0,0 +1,55 @@
+-- Soft deletes and the archive tables filled by archive_data.py.
+-- Run after add_counter_columns.sql and add_moderation_queue.sql.
+ALTER TABLE posts ADD COLUMN deleted_at TIMESTAMP NULL DEFAULT NULL;
+UPDATE posts SET deleted_at = COALESCE(date_modified, CURRENT_TIMESTAMP) WHERE is_active = 0;
+
+CREATE TABLE IF NOT EXISTS posts_archive (
+  post_id          INT PRIMARY KEY,
+  user_id          INT NOT NULL,
+  course_id        INT NULL,
+  content          TEXT NOT NULL,
+  post_type        ENUM('seeking', 'offering') NOT NULL DEFAULT 'seeking',
+  date_created     TIMESTAMP NULL,
+  date_modified    TIMESTAMP NULL,
+  is_active        TINYINT(1) DEFAULT 0,
+  is_reported      TINYINT(1) DEFAULT 0,
+  comment_count    INT NOT NULL DEFAULT 0,
+  report_count     INT NOT NULL DEFAULT 0,
+  last_reported_at TIMESTAMP NULL DEFAULT NULL,
+  deleted_at       TIMESTAMP NULL DEFAULT NULL,
+  archived_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS comments_archive (
+  comment_id    INT PRIMARY KEY,
+  post_id       INT NOT NULL,
+  user_id       INT NOT NULL,
+  content       TEXT NOT NULL,
+  parent_id     INT NULL,
+  date_created  TIMESTAMP NULL,
+  INDEX idx_comments_archive_post (post_id, date_created),
+  FOREIGN KEY (post_id) REFERENCES posts_archive(post_id) ON DELETE CASCADE,
+  FOREIGN KEY (user_id) REFERENCES users(user_id)         ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS post_reports_archive (
+  report_id     INT PRIMARY KEY,
+  post_id       INT NOT NULL,
+  user_id       INT NOT NULL,
+  reason        TEXT NOT NULL,
+  date_created  TIMESTAMP NULL,
+  FOREIGN KEY (post_id) REFERENCES posts_archive(post_id) ON DELETE CASCADE,
+  FOREIGN KEY (user_id) REFERENCES users(user_id)         ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS messages_archive (
+  message_id INT PRIMARY KEY,
+  group_id   INT NOT NULL,
+  user_id    INT NOT NULL,
+  content    TEXT NOT NULL,
+  timestamp  TIMESTAMP NULL,
+  INDEX idx_messages_archive_group (group_id, message_id),
+  FOREIGN KEY (group_id) REFERENCES study_groups(group_id) ON DELETE CASCADE,
+  FOREIGN KEY (user_id)  REFERENCES users(user_id)         ON DELETE CASCADE
+) ENGINE=InnoDB;
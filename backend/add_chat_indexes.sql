@@ -0,0 +1,2 @@
+-- Index for incremental chat sync (WHERE group_id = ? AND message_id > ?)
+ALTER TABLE messages ADD INDEX idx_messages_group (group_id, message_id);
@@ -0,0 +1,2 @@
+-- Covering index for building comment threads (SELECT comment_id, parent_id, date_created ... WHERE post_id = ?)
+ALTER TABLE comments ADD INDEX idx_comments_thread (post_id, date_created, parent_id);
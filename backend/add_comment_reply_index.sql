@@ -0,0 +1,3 @@
+-- Keyset index for threaded comments: one page of top-level comments
+-- (WHERE post_id = ? AND parent_id IS NULL) and the first replies of each comment shown
+ALTER TABLE comments ADD INDEX idx_comments_replies (post_id, parent_id, date_created);
@@ -0,0 +1,11 @@
+-- Denormalised counters shown in the feed, maintained by PostManager and GroupManager
+ALTER TABLE posts
+  ADD COLUMN comment_count INT NOT NULL DEFAULT 0,
+  ADD COLUMN report_count INT NOT NULL DEFAULT 0;
+ALTER TABLE study_groups ADD COLUMN member_count INT NOT NULL DEFAULT 0;
+
+-- Backfill from the existing rows (python reconcile_counters.py does the same in batches)
+UPDATE posts p SET
+  comment_count = (SELECT COUNT(*) FROM comments c WHERE c.post_id = p.post_id),
+  report_count = (SELECT COUNT(*) FROM post_reports r WHERE r.post_id = p.post_id);
+UPDATE study_groups g SET member_count = (SELECT COUNT(*) FROM study_group_members m WHERE m.group_id = g.group_id);
@@ -0,0 +1,21 @@
+-- Per-user enrolled-courses feed, maintained by PostManager and CourseManager
+CREATE TABLE IF NOT EXISTS feed_inbox (
+  user_id      INT NOT NULL,
+  post_id      INT NOT NULL,
+  course_id    INT NOT NULL,
+  post_type    ENUM('seeking', 'offering') NOT NULL DEFAULT 'seeking',
+  date_created TIMESTAMP NOT NULL,
+  PRIMARY KEY (user_id, date_created, post_id),
+  INDEX idx_feed_inbox_type (user_id, post_type, date_created, post_id),
+  INDEX idx_feed_inbox_course (course_id, user_id),
+  INDEX idx_feed_inbox_post (post_id),
+  FOREIGN KEY (user_id)   REFERENCES users(user_id)     ON DELETE CASCADE,
+  FOREIGN KEY (post_id)   REFERENCES posts(post_id)     ON DELETE CASCADE,
+  FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Backfill from the existing enrollments (python reconcile_counters.py does the same in batches)
+INSERT IGNORE INTO feed_inbox (user_id, post_id, course_id, post_type, date_created)
+SELECT uc.user_id, p.post_id, p.course_id, p.post_type, p.date_created
+FROM posts p
+JOIN user_courses uc ON uc.course_id = p.course_id;
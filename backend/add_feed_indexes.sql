@@ -0,0 +1,4 @@
+-- Composite indexes for keyset-paginated feeds (ORDER BY date_created DESC, post_id DESC)
+ALTER TABLE posts ADD INDEX idx_posts_feed (is_active, date_created, post_id);
+ALTER TABLE posts ADD INDEX idx_posts_course_feed (course_id, is_active, date_created, post_id);
+ALTER TABLE posts ADD INDEX idx_posts_type_feed (post_type, is_active, date_created, post_id);
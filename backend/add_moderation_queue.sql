@@ -0,0 +1,21 @@
+-- One report per (post, user) and the index behind the moderation queue.
+-- Run after add_counter_columns.sql.
+
+-- Keep each user's first report of a post before the unique key goes on
+DELETE r FROM post_reports r
+JOIN post_reports earlier
+  ON earlier.post_id = r.post_id AND earlier.user_id = r.user_id AND earlier.report_id < r.report_id;
+ALTER TABLE post_reports ADD UNIQUE KEY uq_post_reports_post_user (post_id, user_id);
+
+ALTER TABLE posts
+  ADD COLUMN last_reported_at TIMESTAMP NULL DEFAULT NULL,
+  ADD INDEX idx_posts_moderation (is_reported, report_count, last_reported_at, post_id);
+
+-- Backfill from the remaining reports
+UPDATE posts p SET
+  report_count = (SELECT COUNT(*) FROM post_reports r WHERE r.post_id = p.post_id),
+  last_reported_at = (SELECT MAX(r.date_created) FROM post_reports r WHERE r.post_id = p.post_id);
+
+-- Posts flagged without a surviving report are dated by when they were written
+UPDATE posts SET last_reported_at = date_created
+WHERE is_reported = 1 AND last_reported_at IS NULL;
@@ -0,0 +1,7 @@
+-- Per-member read cursor behind the unread counts of GET /api/groups/inbox/.
+-- The counts use idx_messages_group from add_chat_indexes.sql.
+ALTER TABLE study_group_members ADD COLUMN last_read_message_id INT NULL;
+
+-- Existing members start with everything read
+UPDATE study_group_members m
+SET last_read_message_id = (SELECT MAX(message_id) FROM messages g WHERE g.group_id = m.group_id);
@@ -0,0 +1,13 @@
+-- Revoked JWTs, mirrored in memory by authentication.tokens. A row revokes one
+-- token (jti), or every token issued to user_id up to revoked_at when jti is NULL.
+-- No foreign key: revoking a deleted user's tokens must outlive the user.
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+  revocation_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  jti           CHAR(32) NULL,
+  user_id       INT NOT NULL,
+  revoked_at    DATETIME(6) NOT NULL,
+  expires_at    DATETIME NOT NULL,
+  UNIQUE KEY uq_revoked_tokens_jti (jti),
+  INDEX idx_revoked_tokens_revoked (revoked_at),
+  INDEX idx_revoked_tokens_expires (expires_at)
+) ENGINE=InnoDB;
@@ -0,0 +1,8 @@
+-- Posts whose search text changed, read by every process's in-process search index
+-- (posts.search) when the FULLTEXT indexes are missing. Rows are kept for a day.
+CREATE TABLE IF NOT EXISTS search_index_changes (
+  change_id  BIGINT AUTO_INCREMENT PRIMARY KEY,
+  post_id    INT NOT NULL,
+  changed_at DATETIME(6) NOT NULL,
+  INDEX idx_search_index_changes_changed (changed_at)
+) ENGINE=InnoDB;
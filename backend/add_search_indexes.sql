@@ -0,0 +1,3 @@
+-- FULLTEXT indexes for /api/posts/search/
+ALTER TABLE posts ADD FULLTEXT INDEX ft_posts_content (content);
+ALTER TABLE comments ADD FULLTEXT INDEX ft_comments_content (content);
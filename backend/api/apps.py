@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Probe the schema once, on the first primary connection, so managers don't
+        # discover missing columns per request. Querying here directly would
+        # also hit the database for management commands that never need it.
+        from .schema import schema
+        connection_created.connect(schema.connection_created, dispatch_uid='api.schema')
+        # Time every statement for the per-request query stats and the slow-query log
+        from . import query_stats
+        connection_created.connect(query_stats.connection_created, dispatch_uid='api.query_stats')
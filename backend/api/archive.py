@@ -0,0 +1,75 @@
+"""
+Batched moves from the hot tables into their ``*_archive`` copies.
+
+Each batch selects (and locks) a set of ids, copies those rows and whatever
+hangs off them into the archive, then deletes them from the hot table, all in
+one transaction, so an interrupted run leaves nothing half-moved and live
+traffic never waits on more than one batch's locks.
+"""
+import time
+from django.db import connection, transaction
+from .schema import schema
+from .sql import for_update_sql
+
+
+def copy_rows(cursor, table, archive_table, where, params):
+    """``INSERT INTO archive_table SELECT ... FROM table WHERE where``"""
+    # Only columns both tables have, so databases missing optional columns still archive
+    columns = ", ".join(sorted(schema.columns(table) & schema.columns(archive_table)))
+    cursor.execute(f"INSERT INTO {archive_table} ({columns}) SELECT {columns} FROM {table} WHERE {where}", params)
+
+
+def matching_ids(table, id_column, where, params, batch_size):
+    """``select_ids`` for ``archive_in_batches``: the lowest ``batch_size`` ids matching ``where``"""
+    def select_ids(cursor):
+        cursor.execute(f"""
+            SELECT {id_column} FROM {table}
+            WHERE {where}
+            ORDER BY {id_column}
+            LIMIT %s
+            {for_update_sql()}
+        """, [*params, batch_size])
+        return [row[0] for row in cursor.fetchall()]
+    return select_ids
+
+
+def leading_ids(table, id_column, condition, params, batch_size):
+    """
+    ``select_ids`` for tables whose ids grow with ``condition``'s column (such as
+    messages by timestamp): the lowest ids up to the first row failing
+    ``condition``. Walks the primary key only, so it needs no extra index and
+    stops as soon as it reaches rows that are too new.
+    """
+    def select_ids(cursor):
+        cursor.execute(f"""
+            SELECT {id_column}, CASE WHEN {condition} THEN 1 ELSE 0 END FROM {table}
+            ORDER BY {id_column}
+            LIMIT %s
+            {for_update_sql()}
+        """, [*params, batch_size])
+        ids = []
+        for row_id, matches in cursor.fetchall():
+            if not matches:
+                break
+            ids.append(row_id)
+        return ids
+    return select_ids
+
+
+def archive_in_batches(select_ids, move, pause=0.0):
+    """
+    Call ``move(cursor, ids, placeholders)`` for each batch ``select_ids(cursor)``
+    returns until it returns none. ``move`` copies the rows and deletes them.
+    Sleeps ``pause`` seconds between batches to leave room for live traffic.
+    Returns the number of rows moved.
+    """
+    moved = 0
+    while True:
+        with transaction.atomic(), connection.cursor() as cursor:
+            ids = select_ids(cursor)
+            if not ids:
+                return moved
+            move(cursor, ids, ", ".join(["%s"] * len(ids)))
+        moved += len(ids)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,158 @@
+import asyncio
+import weakref
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from .query_stats import caller, enabled as query_stats_enabled, measure, query_source
+from .routing import read_alias
+from .rows import columns, to_dicts
+
+
+def _run_sync(alias, query, params, first):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(query, params)
+        names = columns(cursor) if cursor.description else ()
+        rows = cursor.fetchmany(1) if first else cursor.fetchall()
+        return names, rows
+
+
+class ThreadDriver:
+    """
+    Runs each query on Django's own connection in the sync-to-async thread pool.
+
+    Needs no extra packages and works on any database, but every query still
+    occupies a worker thread while it runs.
+    """
+    async def fetch(self, query, params, first=False, alias='default'):
+        if not query_stats_enabled():
+            return await sync_to_async(_run_sync)(alias, query, params, first)
+        # The calling Manager method is only on this thread's stack
+        with caller(query_source()):
+            return await sync_to_async(_run_sync)(alias, query, params, first)
+
+    async def close(self):
+        pass
+
+
+class AioMySQLDriver:
+    """
+    Runs queries on an ``aiomysql`` pool, so a waiting view holds no thread.
+
+    aiomysql pools belong to the event loop that created them, so one pool is
+    kept per loop and database alias. Connection settings come from
+    ``databases[alias]`` (``settings.DATABASES`` by default).
+    """
+    def __init__(self, databases=None, minsize=1, maxsize=10, recycle=3600):
+        try:
+            import aiomysql
+        except ImportError:
+            raise ImproperlyConfigured(
+                "ASYNC_DB_DRIVER 'aiomysql' requires the aiomysql package; "
+                "install it or set ASYNC_DB_DRIVER=thread"
+            )
+        self._aiomysql = aiomysql
+        self._databases = databases
+        self._minsize = minsize
+        self._maxsize = maxsize
+        self._recycle = recycle
+        # Loop -> {alias: task creating its pool}, so concurrent first requests share one pool
+        self._pools = weakref.WeakKeyDictionary()
+
+    async def _create_pool(self, alias):
+        database = (self._databases or settings.DATABASES)[alias]
+        return await self._aiomysql.create_pool(
+            host=database.get('HOST') or 'localhost',
+            port=int(database.get('PORT') or 3306),
+            user=database.get('USER'),
+            password=database.get('PASSWORD'),
+            db=database.get('NAME'),
+            charset=database.get('OPTIONS', {}).get('charset', 'utf8mb4'),
+            autocommit=True,
+            minsize=self._minsize,
+            maxsize=self._maxsize,
+            pool_recycle=self._recycle,
+        )
+
+    async def pool(self, alias='default'):
+        loop = asyncio.get_running_loop()
+        pools = self._pools.setdefault(loop, {})
+        task = pools.get(alias)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            # First use on this loop, or the last attempt to connect failed
+            task = pools[alias] = loop.create_task(self._create_pool(alias))
+        return await task
+
+    async def fetch(self, query, params, first=False, alias='default'):
+        pool = await self.pool(alias)
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                # Not a Django connection, so its statements are timed here
+                with measure(query, alias):
+                    await cursor.execute(query, params)
+                    names = columns(cursor) if cursor.description else ()
+                    rows = await (cursor.fetchmany(1) if first else cursor.fetchall())
+                return names, rows
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        for task in self._pools.pop(loop, {}).values():
+            if task.done() and not task.cancelled() and task.exception() is None:
+                pool = task.result()
+                pool.close()
+                await pool.wait_closed()
+
+
+def _driver_from_settings():
+    name = getattr(settings, 'ASYNC_DB_DRIVER', 'thread')
+    if name == 'thread':
+        return ThreadDriver()
+    if name == 'aiomysql':
+        return AioMySQLDriver(
+            minsize=getattr(settings, 'ASYNC_DB_POOL_MIN', 1),
+            maxsize=getattr(settings, 'ASYNC_DB_POOL_MAX', 10),
+            recycle=getattr(settings, 'ASYNC_DB_POOL_RECYCLE', 3600),
+        )
+    raise ImproperlyConfigured(f"Unknown ASYNC_DB_DRIVER {name!r}")
+
+
+class AsyncDatabase:
+    """
+    Read queries for async views, returning the same dicts as ``api.rows``.
+
+    The managers' ``a``-prefixed methods build their SQL with the same helpers
+    as the sync ones and run it here, so both paths return identical rows.
+    Queries go to ``read_alias()``, the same database the sync read would use.
+    Writes stay on the sync managers and Django's transaction handling.
+    """
+    def __init__(self, driver=None):
+        self._driver = driver
+
+    @property
+    def driver(self):
+        if self._driver is None:
+            self._driver = _driver_from_settings()
+        return self._driver
+
+    def use_driver(self, driver):
+        self._driver = driver
+
+    async def fetch_dicts(self, query, params=None, converters=None):
+        names, rows = await self.driver.fetch(query, params or [], alias=read_alias())
+        return to_dicts(names, rows, converters)
+
+    async def fetch_dict(self, query, params=None, converters=None):
+        names, rows = await self.driver.fetch(query, params or [], first=True, alias=read_alias())
+        records = to_dicts(names, rows, converters)
+        return records[0] if records else None
+
+    async def fetch_value(self, query, params=None):
+        """First column of the first row, or ``None`` when there are no rows"""
+        _, rows = await self.driver.fetch(query, params or [], first=True, alias=read_alias())
+        return rows[0][0] if rows else None
+
+    async def close(self):
+        await self.driver.close()
+
+
+async_db = AsyncDatabase()
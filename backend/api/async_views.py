@@ -0,0 +1,59 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    """Render ``data`` the way DRF's JSONRenderer renders a ``Response``"""
+    if data is None:
+        # DRF sends no body for empty responses such as 304s
+        return HttpResponse(status=status, headers=headers)
+    return JsonResponse(
+        data, status=status, headers=headers, safe=False,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')}
+    )
+
+
+class AsyncAPIView(View):
+    """
+    Async counterpart of a DRF ``APIView`` for hot read endpoints.
+
+    DRF views are synchronous, so under ASGI every request they serve holds a
+    worker thread for as long as its queries take. Subclasses implement
+    ``async def get`` with the managers' ``a``-prefixed methods instead, and
+    any other method is handed to ``sync_view`` (the original DRF view) on a
+    worker thread, so writes keep their serializers and transactions.
+
+    Authentication is done by ``JWTMiddleware``, which has already rejected
+    requests without a valid token.
+    """
+    sync_view = None
+    _sync_handler = None
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        sync_handler = cls.sync_view.as_view() if cls.sync_view else None
+        view = super().as_view(_sync_handler=sync_handler, **initkwargs)
+        # Token-authenticated like the DRF views, which are CSRF exempt too
+        return csrf_exempt(view)
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and self._sync_handler is not None:
+            return await sync_to_async(self._sync_handler)(request, *args, **kwargs)
+        if getattr(request, 'jwt_auth', None) is None:
+            return json_response({'error': 'Authentication required'}, status=status.HTTP_401_UNAUTHORIZED)
+        return await super().dispatch(request, *args, **kwargs)
+
+    def http_method_not_allowed(self, request, *args, **kwargs):
+        response = json_response(
+            {'detail': f'Method "{request.method}" not allowed.'},
+            status=status.HTTP_405_METHOD_NOT_ALLOWED,
+            headers={'Allow': ', '.join(self._allowed_methods())}
+        )
+
+        async def func():
+            return response
+        return func()
@@ -0,0 +1,110 @@
+"""
+MySQL backend that borrows connections from a per-process ``ConnectionPool``.
+
+Configure it through the ``pool`` dict in ``OPTIONS`` (the same place Django's
+own PostgreSQL backend reads its pool settings from)::
+
+    'ENGINE': 'api.backends.pooled_mysql',
+    'OPTIONS': {'pool': {'min_size': 2, 'max_size': 20, 'timeout': 10}},
+
+Django still "opens" and "closes" a connection around every request (keep
+``CONN_MAX_AGE`` at 0); closing just hands it back to the pool, so the next
+request skips the TCP, TLS and authentication handshake.
+"""
+import functools
+import threading
+from django.db.backends.mysql import base as mysql
+from api import metrics
+from api.db_pool import ConnectionPool, PoolTimeout
+
+Database = mysql.Database
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def pool_stats():
+    """``{alias: stats}`` for every pool opened by this process"""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {alias: pool.stats() for (alias, _), pool in pools.items()}
+
+
+_POOL_COUNTERS = ('acquired', 'created', 'closed', 'recycled', 'check_failures', 'timeouts', 'waits')
+
+
+@metrics.collector
+def _pool_metrics():
+    stats = pool_stats()
+    yield ('db_pool_connections', 'gauge', 'Pooled database connections by state.', [
+        ({'alias': alias, 'state': state}, pool[state])
+        for alias, pool in stats.items() for state in ('idle', 'in_use')
+    ])
+    yield ('db_pool_max_connections', 'gauge', 'Largest size each pool may grow to.',
+           [({'alias': alias}, pool['max_size']) for alias, pool in stats.items()])
+    yield ('db_pool_waiting', 'gauge', 'Requests waiting for a free pooled connection.',
+           [({'alias': alias}, pool['waiting']) for alias, pool in stats.items()])
+    yield ('db_pool_wait_seconds_total', 'counter', 'Time spent waiting for a free pooled connection.',
+           [({'alias': alias}, pool['wait_seconds_total']) for alias, pool in stats.items()])
+    yield ('db_pool_events_total', 'counter', 'Pool events: connections acquired, created, closed and so on.', [
+        ({'alias': alias, 'event': event}, pool[event])
+        for alias, pool in stats.items() for event in _POOL_COUNTERS
+    ])
+
+
+def _connect(conn_params):
+    """Open a connection as ``mysql.DatabaseWrapper.get_new_connection`` does"""
+    connection = Database.connect(**conn_params)
+    # mysqlclient's bytes encoder doesn't work; Django drops it too
+    if connection.encoders.get(bytes) is bytes:
+        connection.encoders.pop(bytes)
+    return connection
+
+
+class DatabaseWrapper(mysql.DatabaseWrapper):
+    @property
+    def pool(self):
+        settings_dict = self.settings_dict
+        # The test runner swaps NAME, so a different database gets its own pool
+        key = (self.alias, (settings_dict['HOST'], settings_dict['PORT'], settings_dict['USER'], settings_dict['NAME']))
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                # The pool outlives this wrapper and serves every thread, so it holds plain params, not ``self``
+                pool = _pools[key] = ConnectionPool(
+                    functools.partial(_connect, dict(self.get_connection_params())),
+                    **settings_dict['OPTIONS'].get('pool', {})
+                )
+            return pool
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        try:
+            return self.pool.acquire()
+        except PoolTimeout as e:
+            # Surfaces as django.db.utils.OperationalError like any failed connect
+            raise Database.OperationalError(str(e)) from e
+
+    def init_connection_state(self):
+        # Session settings survive in the pool, so only new connections need them
+        if not getattr(self.connection, '_pool_initialized', False):
+            super().init_connection_state()
+            self.connection._pool_initialized = True
+
+    def _set_autocommit(self, autocommit):
+        # Pooled connections almost always come back in the mode Django asks for
+        if self.connection.get_autocommit() != autocommit:
+            super()._set_autocommit(autocommit)
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # Anything mid-transaction, or broken by an error, is closed rather than reused
+        discard = self.in_atomic_block or not self.autocommit
+        if not discard and self.errors_occurred:
+            discard = not self.is_usable()
+        self.pool.release(self.connection, discard=discard)
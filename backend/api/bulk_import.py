@@ -0,0 +1,205 @@
+import csv
+import json
+import os
+import tempfile
+import time
+from django.db import connection, transaction
+from .sql import insert_many_sql
+
+# Importable tables and their columns, in foreign-key order
+TABLES = {
+    'users': ('user_id', 'name', 'email', 'password', 'is_admin', 'created_at'),
+    'courses': ('course_id', 'course_name', 'description'),
+    'user_courses': ('user_id', 'course_id'),
+    'posts': ('post_id', 'user_id', 'course_id', 'content', 'post_type', 'date_created',
+              'date_modified', 'is_active', 'is_reported', 'comment_count', 'report_count',
+              'last_reported_at'),
+    'comments': ('comment_id', 'post_id', 'user_id', 'content', 'date_created', 'parent_id'),
+    'study_groups': ('group_id', 'title', 'date_created', 'member_count'),
+    'post_group_associations': ('association_id', 'post_id', 'group_id', 'date_created'),
+    'study_group_members': ('group_id', 'user_id', 'joined_at'),
+    'messages': ('message_id', 'group_id', 'user_id', 'content', 'timestamp'),
+}
+
+# File names people reach for that don't match the table name
+TABLE_ALIASES = {
+    'enrollments': 'user_courses',
+    'groups': 'study_groups',
+    'group_members': 'study_group_members',
+}
+
+SUPPORTED_FORMATS = ('.csv', '.jsonl')
+
+
+class BulkImportError(ValueError):
+    """Raised for files or tables the importer can't handle"""
+
+
+def table_for_file(path):
+    """Map ``posts.csv`` or ``enrollments.jsonl`` to the table it loads into"""
+    name, extension = os.path.splitext(os.path.basename(path))
+    if extension not in SUPPORTED_FORMATS:
+        raise BulkImportError(f"{path}: expected one of {', '.join(SUPPORTED_FORMATS)}")
+    table = TABLE_ALIASES.get(name, name)
+    if table not in TABLES:
+        raise BulkImportError(f"{path}: no importable table called {name!r}")
+    return table
+
+
+def import_order(paths):
+    """Sort files so parents are loaded before the rows that reference them"""
+    order = list(TABLES)
+    return sorted(paths, key=lambda path: order.index(table_for_file(path)))
+
+
+def read_file(path, table):
+    """
+    Stream ``(columns, rows)`` from a CSV file with a header row or a JSONL file.
+
+    Empty CSV fields and missing JSON keys load as NULL. Only the first JSONL
+    record's keys decide the columns.
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == '.csv':
+        handle = open(path, newline='', encoding='utf-8')
+        reader = csv.reader(handle)
+        columns = tuple(next(reader, ()))
+        rows = (tuple(value if value != '' else None for value in row) for row in reader)
+    else:
+        handle = open(path, encoding='utf-8')
+        records = (json.loads(line) for line in handle if line.strip())
+        first = next(records, None)
+        columns = tuple(first) if first else ()
+        rows = _json_rows(first, records, columns)
+
+    unknown = [column for column in columns if column not in TABLES[table]]
+    if unknown:
+        handle.close()
+        raise BulkImportError(f"{path}: unknown columns for {table}: {', '.join(unknown)}")
+    return columns, _closing(rows, handle)
+
+
+def _json_rows(first, records, columns):
+    if first is None:
+        return
+    yield tuple(first.get(column) for column in columns)
+    for record in records:
+        yield tuple(record.get(column) for column in columns)
+
+
+def _closing(rows, handle):
+    with handle:
+        yield from rows
+
+
+class ImportStats:
+    def __init__(self, table, rows, seconds):
+        self.table = table
+        self.rows = rows
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+    def __str__(self):
+        return f"{self.table:>24}: {self.rows:>11,} rows in {self.seconds:7.1f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+class BulkImporter:
+    """
+    Loads row streams into a table in chunked transactions.
+
+    ``method='insert'`` sends multi-row INSERTs of ``chunk_size`` rows.
+    ``method='load-data'`` (MySQL only) spools each transaction's rows to a
+    temporary file and sends it with ``LOAD DATA LOCAL INFILE``. This needs
+    ``local_infile`` enabled on both the server and the client (``DB_LOCAL_INFILE``).
+    Each transaction covers ``transaction_rows`` rows so a failure only loses the
+    current chunk.
+
+    Use as a context manager to turn foreign-key checks off for the whole load.
+    Call ``check_constraints`` afterwards to verify nothing was left dangling.
+    """
+    def __init__(self, method='insert', chunk_size=1000, transaction_rows=50000):
+        if method not in ('insert', 'load-data'):
+            raise ValueError(f"Unknown import method {method!r}")
+        if method == 'load-data' and connection.vendor != 'mysql':
+            raise BulkImportError('LOAD DATA LOCAL INFILE is only available on MySQL')
+        self.method = method
+        self.chunk_size = chunk_size
+        self.transaction_rows = max(transaction_rows, chunk_size)
+        self.tables = []
+        self._checks_disabled = None
+
+    def __enter__(self):
+        self._checks_disabled = connection.constraint_checks_disabled()
+        self._checks_disabled.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._checks_disabled.__exit__(*exc_info)
+
+    def check_constraints(self):
+        """Raise ``IntegrityError`` if any loaded row references a missing parent"""
+        connection.check_constraints(table_names=self.tables or None)
+
+    def load_file(self, path, table=None):
+        table = table or table_for_file(path)
+        columns, rows = read_file(path, table)
+        return self.load_rows(table, columns, rows)
+
+    def load_rows(self, table, columns, rows):
+        """Load an iterable of row tuples matching ``columns``; returns ``ImportStats``"""
+        if table not in TABLES:
+            raise BulkImportError(f"No importable table called {table!r}")
+        if table not in self.tables:
+            self.tables.append(table)
+        load_batch = self._load_data if self.method == 'load-data' else self._insert
+        started = time.perf_counter()
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.transaction_rows:
+                count += load_batch(table, columns, batch)
+                batch = []
+        if batch:
+            count += load_batch(table, columns, batch)
+        return ImportStats(table, count, time.perf_counter() - started)
+
+    def _insert(self, table, columns, batch):
+        with transaction.atomic(), connection.cursor() as cursor:
+            for start in range(0, len(batch), self.chunk_size):
+                chunk = batch[start:start + self.chunk_size]
+                params = [value for row in chunk for value in row]
+                cursor.execute(insert_many_sql(table, columns, len(chunk)), params)
+        return len(batch)
+
+    def _load_data(self, table, columns, batch):
+        # NULL must stay unquoted; everything else is quoted with "" doubled inside
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', delete=False) as spool:
+            for row in batch:
+                spool.write(','.join(
+                    'NULL' if value is None else '"' + _text(value).replace('"', '""') + '"'
+                    for value in row
+                ))
+                spool.write('\n')
+        try:
+            query = f"""
+                LOAD DATA LOCAL INFILE %s INTO TABLE {table}
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+                LINES TERMINATED BY '\\n'
+                ({', '.join(columns)})
+            """
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(query, [spool.name])
+        finally:
+            os.unlink(spool.name)
+        return len(batch)
+
+
+def _text(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    return str(value)
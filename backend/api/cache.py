@@ -0,0 +1,56 @@
+import threading
+import time
+from collections import OrderedDict
+from .metrics import cache_requests
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Safe to share between request threads. Each worker process has its own copy,
+    so anything cached here can be stale for up to ``ttl`` seconds in other workers.
+    """
+    def __init__(self, maxsize=1024, ttl=60, timer=time.monotonic, name=None):
+        self.maxsize = maxsize
+        # Named caches report hits and misses as the cache_requests_total metric
+        self.name = name
+        self.ttl = ttl
+        self._timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] <= self._timer():
+                del self._data[key]
+                entry = _MISSING
+            if entry is not _MISSING:
+                self._data.move_to_end(key)
+        if self.name is not None:
+            cache_requests.inc(self.name, 'miss' if entry is _MISSING else 'hit')
+        return default if entry is _MISSING else entry[1]
+
+    def set(self, key, value, ttl=None):
+        if self.maxsize <= 0:
+            return
+        expires_at = self._timer() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger('django')
+
+
+class PoolTimeout(Exception):
+    """No connection became free within the pool's ``timeout``"""
+
+
+class _Entry:
+    __slots__ = ('connection', 'created', 'last_used')
+
+    def __init__(self, connection, now):
+        self.connection = connection
+        self.created = now
+        self.last_used = now
+
+
+def _ping(connection):
+    connection.ping()
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception as e:
+        logger.debug(f"Error closing pooled connection: {str(e)}")
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of DB-API connections.
+
+    ``connect()`` opens a new connection. At most ``max_size`` are open at once,
+    and ``acquire`` waits up to ``timeout`` seconds for one to be released before
+    raising ``PoolTimeout``. Released connections are reused most recently used
+    first. Anything older than ``max_lifetime`` seconds is closed instead of
+    reused, and connections idle for more than ``max_idle`` seconds are closed
+    down to ``min_size``. A connection that sat idle for at least ``check_after``
+    seconds is pinged with ``check`` before being handed out; if the ping fails
+    a fresh one is opened in its place.
+
+    ``stats()`` reports the pool's size and how long callers waited for a
+    connection, so an undersized pool shows up as wait time rather than as
+    unexplained latency.
+    """
+    def __init__(self, connect, min_size=0, max_size=10, timeout=10.0, max_lifetime=3600.0,
+                 max_idle=600.0, check_after=30.0, check=_ping, close=_close, clock=time.monotonic):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self._check = check
+        self._close = close
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._waiting = 0
+        self._counters = dict.fromkeys((
+            'acquired', 'created', 'closed', 'recycled', 'check_failures', 'timeouts', 'waits'
+        ), 0)
+        self._wait_seconds_total = 0.0
+        self._wait_seconds_max = 0.0
+
+    def acquire(self):
+        """Borrow a connection; pass it back to ``release`` when done"""
+        started = self._clock()
+        deadline = started + self.timeout
+        waited = False
+        stale = []
+        with self._cond:
+            while True:
+                self._reap_idle(stale)
+                if self._idle:
+                    entry = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot now, open the connection outside the lock
+                    self._size += 1
+                    entry = None
+                    break
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    self._record_wait(self._clock() - started)
+                    raise PoolTimeout(
+                        f"No database connection free after {self.timeout:g}s "
+                        f"({self.max_size} in use, {self._waiting} waiting)"
+                    )
+                waited = True
+                self._waiting += 1
+                self._cond.wait(remaining)
+                self._waiting -= 1
+            if waited:
+                self._record_wait(self._clock() - started)
+        for connection in stale:
+            self._close(connection)
+
+        try:
+            entry = self._validate(entry)
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._in_use[id(entry.connection)] = entry
+            self._counters['acquired'] += 1
+        return entry.connection
+
+    def release(self, connection, discard=False):
+        """Return a borrowed connection; ``discard`` closes it instead, e.g. after an error"""
+        now = self._clock()
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+            if entry is None:
+                # Not ours, or released twice; don't let it skew the accounting, and
+                # leave a connection that is already back in the idle queue open
+                close = not any(idle.connection is connection for idle in self._idle)
+            else:
+                close = discard or now - entry.created >= self.max_lifetime
+                if close:
+                    self._size -= 1
+                    self._counters['recycled' if not discard else 'closed'] += 1
+                else:
+                    entry.last_used = now
+                    self._idle.append(entry)
+            self._cond.notify()
+        if close:
+            self._close(connection)
+
+    def close_all(self):
+        """Close every idle connection, e.g. before forking or at shutdown"""
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+            self._counters['closed'] += len(idle)
+        for entry in idle:
+            self._close(entry.connection)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                **self._counters,
+                'wait_seconds_total': self._wait_seconds_total,
+                'wait_seconds_max': self._wait_seconds_max,
+            }
+
+    def _validate(self, entry):
+        now = self._clock()
+        if entry is not None:
+            if now - entry.created >= self.max_lifetime:
+                self._close(entry.connection)
+                self._bump('recycled')
+                entry = None
+            elif now - entry.last_used >= self.check_after:
+                try:
+                    self._check(entry.connection)
+                except Exception as e:
+                    logger.warning(f"Pooled connection failed its health check, reconnecting: {str(e)}")
+                    self._close(entry.connection)
+                    self._bump('check_failures')
+                    entry = None
+        if entry is None:
+            entry = _Entry(self._connect(), self._clock())
+            self._bump('created')
+        return entry
+
+    def _reap_idle(self, stale):
+        # Least recently used connections sit at the left; keep min_size of them
+        now = self._clock()
+        while self._idle and self._size > self.min_size and now - self._idle[0].last_used >= self.max_idle:
+            stale.append(self._idle.popleft().connection)
+            self._size -= 1
+            self._counters['closed'] += 1
+
+    def _record_wait(self, seconds):
+        self._counters['waits'] += 1
+        self._wait_seconds_total += seconds
+        self._wait_seconds_max = max(self._wait_seconds_max, seconds)
+
+    def _bump(self, counter):
+        with self._cond:
+            self._counters[counter] += 1
@@ -0,0 +1,297 @@
+"""
+Process metrics in the Prometheus text exposition format, served at ``/api/metrics``.
+
+Counters, gauges and histograms keep their values in per-thread shards: the
+thread recording a value is the only one writing to its shard, so recording
+takes no lock. A scrape adds the shards up. When a thread exits its shard is
+folded into a shared total, so per-request threads don't pile up shards.
+
+Figures that already exist elsewhere, such as the database pool's, are read
+by collectors at scrape time instead of being recorded as they change.
+
+Every worker process has its own figures; scrape each worker, or run one
+worker per scrape target. Only admins, and scrapers sending ``METRICS_TOKEN``,
+can read them.
+"""
+import bisect
+import hmac
+import itertools
+import threading
+import time
+import weakref
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Shard:
+    """One thread's values; it dies with the thread's locals"""
+    def __init__(self):
+        self.values = {}
+
+
+class _Shards:
+    def __init__(self):
+        self._local = threading.local()
+        self._ids = itertools.count()
+        self._live = {}
+        self._retired = {}
+        self._lock = threading.Lock()
+
+    def values(self):
+        """The calling thread's values, keyed by ``(metric name, label values)``"""
+        try:
+            return self._local.shard.values
+        except AttributeError:
+            return self._new_shard()
+
+    def _new_shard(self):
+        shard = _Shard()
+        shard_id = next(self._ids)
+        with self._lock:
+            self._live[shard_id] = shard.values
+        weakref.finalize(shard, self._retire, shard_id, shard.values)
+        self._local.shard = shard
+        return shard.values
+
+    def _retire(self, shard_id, values):
+        with self._lock:
+            self._live.pop(shard_id, None)
+            _merge(self._retired, values)
+
+    def snapshot(self):
+        total = {}
+        with self._lock:
+            _merge(total, self._retired)
+            for values in self._live.values():
+                _merge(total, values.copy())
+        return total
+
+
+def _merge(into, values):
+    for key, value in values.items():
+        current = into.get(key)
+        if isinstance(value, list):
+            if current is None:
+                into[key] = list(value)
+            else:
+                for i, cell in enumerate(value):
+                    current[i] += cell
+        else:
+            into[key] = (current or 0) + value
+
+
+_shards = _Shards()
+_metrics = []
+_collectors = []
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _metrics.append(self)
+
+    def inc(self, *label_values, amount=1):
+        values = _shards.values()
+        key = (self.name, label_values)
+        values[key] = values.get(key, 0) + amount
+
+    def samples(self, snapshot):
+        if not self.labels:
+            # Report a zero before the first update rather than no series at all
+            yield f"{self.name} {_number(snapshot.get((self.name, ()), 0))}"
+            return
+        for (name, label_values), value in sorted(snapshot.items(), key=_sort_key):
+            if name == self.name:
+                yield f"{self.name}{_labels(self.labels, label_values)} {_number(value)}"
+
+
+class Gauge(Counter):
+    """A value that goes up and down, such as open connections"""
+    kind = 'gauge'
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        _metrics.append(self)
+
+    def observe(self, value, *label_values):
+        values = _shards.values()
+        key = (self.name, label_values)
+        cells = values.get(key)
+        if cells is None:
+            # One count per bucket, then +Inf, then the sum
+            cells = values[key] = [0] * (len(self.buckets) + 2)
+        cells[bisect.bisect_left(self.buckets, value)] += 1
+        cells[-1] += value
+
+    def samples(self, snapshot):
+        for (name, label_values), cells in sorted(snapshot.items(), key=_sort_key):
+            if name != self.name:
+                continue
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), cells):
+                cumulative += count
+                labels = _labels(self.labels, label_values, [('le', _number(float(bound)))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_number(cells[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def _sort_key(item):
+    (name, label_values), _ = item
+    return name, tuple(str(value) for value in label_values)
+
+
+def collector(func):
+    """
+    Register ``func()`` to be called at scrape time. It returns
+    ``(name, kind, documentation, [(labels dict, value), ...])`` tuples.
+    """
+    _collectors.append(func)
+    return func
+
+
+def render():
+    """Every metric in the text exposition format"""
+    snapshot = _shards.snapshot()
+    lines = []
+    for metric in _metrics:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples(snapshot))
+    for func in _collectors:
+        for name, kind, documentation, samples in func():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+requests_total = Counter('http_requests_total', 'HTTP requests by route, method and status.',
+                         ('view', 'method', 'status'))
+request_duration = Histogram('http_request_duration_seconds', 'Time to produce each response.',
+                             ('view', 'method'), (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+request_size = Histogram('http_request_size_bytes', 'Request body sizes.', ('view',), SIZE_BUCKETS)
+response_size = Histogram('http_response_size_bytes', 'Response body sizes, streamed responses excluded.',
+                          ('view',), SIZE_BUCKETS)
+db_queries = Counter('db_queries_total', 'SQL statements run, by database alias.', ('alias',))
+db_query_duration = Histogram('db_query_duration_seconds', 'SQL statement run times.', ('alias',),
+                              (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1))
+cache_requests = Counter('cache_requests_total', 'In-process and response cache lookups.', ('cache', 'result'))
+chat_sockets = Gauge('chat_websockets_open', 'Chat WebSocket connections currently open.')
+
+# user_id -> last chat poll. Plain dict stores are atomic, so polls don't lock
+_chat_pollers = {}
+
+
+def chat_poll(user_id):
+    """Note that ``user_id`` just polled a group's messages"""
+    _chat_pollers[user_id] = time.monotonic()
+
+
+@collector
+def _chat_poller_count():
+    window = getattr(settings, 'METRICS_CHAT_POLLER_WINDOW', 60)
+    cutoff = time.monotonic() - window
+    for user_id, seen in list(_chat_pollers.items()):
+        if seen < cutoff:
+            _chat_pollers.pop(user_id, None)
+    return [('chat_pollers_active', 'gauge', f'Users who polled chat messages in the last {window:g} seconds.',
+             [({}, len(_chat_pollers))])]
+
+
+def scrape_token_valid(request):
+    """Whether the request carries ``METRICS_TOKEN`` as its bearer token. Always False while it is unset"""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token:
+        return False
+    sent = request.META.get('HTTP_AUTHORIZATION', '')
+    if not sent.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(sent[len('Bearer '):].encode(), token.encode())
+
+
+def _view_name(request):
+    # Routes rather than paths, so ids don't each get their own series
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        # Answered by middleware before URL resolution, e.g. a rejected token
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return 'unmatched'
+    return match.route or match.view_name
+
+
+class MetricsMiddleware:
+    """Records the request metrics. Goes first, so the time covers the other middleware"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._async = iscoroutinefunction(get_response)
+        if self._async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self._async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - started)
+        return response
+
+    def _record(self, request, response, elapsed):
+        view = _view_name(request)
+        requests_total.inc(view, request.method, str(response.status_code))
+        request_duration.observe(elapsed, view, request.method)
+        try:
+            request_size.observe(int(request.META.get('CONTENT_LENGTH') or 0), view)
+        except ValueError:
+            pass
+        if not response.streaming:
+            response_size.observe(len(response.content), view)
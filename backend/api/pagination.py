@@ -0,0 +1,103 @@
+import base64
+import datetime
+import json
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised when a client sends a cursor or limit we can't decode"""
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Turn the ``limit`` query parameter into a page size between 1 and ``maximum``"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor('limit must be an integer')
+    if limit < 1:
+        raise InvalidCursor('limit must be positive')
+    return min(limit, maximum)
+
+
+def page_params(query_params, cursor_size=2):
+    """
+    Read ``limit`` and ``cursor`` from a request's query parameters.
+
+    Returns ``(limit, cursor_key)``. Both are ``None`` when the client asked for
+    neither, so endpoints can keep their unpaginated response for old clients.
+    """
+    limit = query_params.get('limit')
+    token = query_params.get('cursor')
+    if limit is None and token is None:
+        return None, None
+    return parse_limit(limit), decode_cursor(token, size=cursor_size)
+
+
+def format_key_part(value):
+    # Datetimes are stored as the naive UTC string the database compares against
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.isoformat(sep=' ')
+    return value
+
+
+def encode_cursor(*key):
+    """Encode a sort key such as ``(date_created, post_id)`` into an opaque token"""
+    raw = json.dumps([format_key_part(part) for part in key], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, size=2):
+    """Decode a token produced by ``encode_cursor`` back into its key parts"""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor('Malformed cursor')
+    if not isinstance(key, list) or len(key) != size:
+        raise InvalidCursor('Malformed cursor')
+    return key
+
+
+def keyset_condition(sort_column, id_column, cursor_key):
+    """
+    Build the WHERE fragment that continues a ``sort_column DESC, id_column DESC``
+    scan after ``cursor_key``. The expanded OR form lets MySQL use a range scan
+    on a composite (sort_column, id_column) index.
+    """
+    sort_value, id_value = cursor_key
+    clause = f"({sort_column} < %s OR ({sort_column} = %s AND {id_column} < %s))"
+    return clause, [sort_value, sort_value, id_value]
+
+
+def multi_keyset_condition(columns, cursor_key):
+    """
+    ``keyset_condition`` for any number of ``DESC`` sort columns, the last of
+    which must be unique, e.g. ``(report_count, last_reported_at, post_id)``.
+    """
+    column, *rest = columns
+    value, *rest_values = cursor_key
+    if not rest:
+        return f"{column} < %s", [value]
+    inner, inner_params = multi_keyset_condition(rest, rest_values)
+    return f"({column} < %s OR ({column} = %s AND {inner}))", [value, value, *inner_params]
+
+
+def paginate(rows, limit, key):
+    """
+    Trim a ``limit + 1`` row fetch down to one page.
+
+    Returns ``(page, next_cursor)``; ``next_cursor`` is ``None`` on the last page.
+    ``key`` maps a row to the tuple that was used for ordering.
+    """
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(*key(page[-1]))
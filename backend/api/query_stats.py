@@ -0,0 +1,246 @@
+"""
+Per-request query counting and the slow-query log.
+
+``QueryStatsMiddleware`` gives every request a ``RequestQueries`` in a
+context variable. A wrapper installed on each database connection when it is
+opened (``connection.execute_wrapper``), and the aiomysql driver in
+``api.async_db``, record every statement against it: count, total time and
+the slowest few with the Manager method that ran them. The figures go out as
+a ``Server-Timing`` header and one ``api.queries`` log line per request.
+Statements slower than ``SLOW_QUERY_MS`` are also logged to
+``api.queries.slow`` with their normalized SQL and caller, whether or not
+they ran inside a request.
+
+Queries made while a streaming response is being sent are not counted.
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import sysconfig
+import threading
+import time
+from contextlib import contextmanager
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from . import metrics
+
+logger = logging.getLogger('api.queries')
+slow_logger = logging.getLogger('api.queries.slow')
+
+_current = contextvars.ContextVar('request_queries', default=None)
+# Set around statements handed to another thread, where the caller isn't on the stack
+_caller = contextvars.ContextVar('query_caller', default=None)
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# The standard library, installed packages and the database plumbing never count as the caller
+_SKIP_DIRS = tuple({sysconfig.get_paths()[name] for name in ('stdlib', 'purelib', 'platlib')}) + (
+    os.path.join(_BACKEND_DIR, 'backends'),
+)
+_SKIP_FILES = {os.path.join(_BACKEND_DIR, name) for name in ('query_stats.py', 'async_db.py', 'rows.py', 'sql.py')}
+
+
+def enabled():
+    return getattr(settings, 'QUERY_STATS', True)
+
+
+def slow_query_seconds():
+    return getattr(settings, 'SLOW_QUERY_MS', 100) / 1000
+
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))+\s*\)')
+
+
+def normalize_sql(sql):
+    """
+    Collapse a statement to its shape, so every run of a query logs the same
+    text: literals become ``?`` and ``IN (%s, %s, ...)`` lists become ``(...)``.
+    """
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    return _PLACEHOLDER_LIST.sub('(...)', sql)
+
+
+def query_source():
+    """
+    The method that ran the current query: the innermost ``*Manager.*``
+    method on the stack, or else the innermost frame outside Django and the
+    database plumbing, as ``module.qualname``.
+    """
+    fallback = None
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename not in _SKIP_FILES and not filename.startswith(_SKIP_DIRS):
+            name = getattr(frame.f_code, 'co_qualname', frame.f_code.co_name)
+            source = f"{frame.f_globals.get('__name__', '?')}.{name}"
+            if 'Manager.' in name:
+                return source
+            fallback = fallback or source
+        frame = frame.f_back
+    return _caller.get() or fallback or '?'
+
+
+@contextmanager
+def caller(source):
+    """Attribute statements run on another thread, e.g. through ``sync_to_async``, to ``source``"""
+    token = _caller.set(source)
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+class RequestQueries:
+    """What one request spent on the database"""
+    def __init__(self, path=None, keep_slowest=3):
+        self.path = path
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = []
+        self._keep = keep_slowest
+        self._lock = threading.Lock()
+
+    def record(self, sql, duration, alias, source=None):
+        with self._lock:
+            self.count += 1
+            self.duration += duration
+            if len(self.slowest) >= self._keep and duration <= self.slowest[-1]['ms'] / 1000:
+                return
+        # Only statements that make the list pay for the stack walk
+        entry = {
+            'ms': round(duration * 1000, 2),
+            'alias': alias,
+            'source': source or query_source(),
+            'sql': normalize_sql(sql),
+        }
+        with self._lock:
+            self.slowest.append(entry)
+            self.slowest.sort(key=lambda item: item['ms'], reverse=True)
+            del self.slowest[self._keep:]
+
+
+def record(sql, duration, alias):
+    """Count one statement against the current request, and log it if it was slow"""
+    metrics.db_queries.inc(alias)
+    metrics.db_query_duration.observe(duration, alias)
+    stats = _current.get()
+    source = None
+    if duration >= slow_query_seconds():
+        source = query_source()
+        slow_logger.warning(json.dumps({
+            'ms': round(duration * 1000, 2),
+            'alias': alias,
+            'source': source,
+            'path': stats.path if stats is not None else None,
+            'sql': normalize_sql(sql),
+        }))
+    if stats is not None:
+        stats.record(sql, duration, alias, source)
+
+
+@contextmanager
+def measure(sql, alias):
+    """Time a statement run outside Django's cursors, such as on the aiomysql pool"""
+    if not enabled():
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(sql, time.perf_counter() - started, alias)
+
+
+class _ExecuteWrapper:
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            record(sql, time.perf_counter() - started, self.alias)
+
+
+def connection_created(sender, connection, **kwargs):
+    """``connection_created`` receiver that starts timing the new connection's statements"""
+    # Reconnecting reuses the wrapper object, so only add ours once
+    if enabled() and not any(isinstance(wrapper, _ExecuteWrapper) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.append(_ExecuteWrapper(connection.alias))
+
+
+class QueryStatsMiddleware:
+    """
+    Counts the queries behind each request and reports them in a
+    ``Server-Timing`` header and the ``api.queries`` log. Put it first so the
+    authentication middleware's queries are included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not enabled():
+            return self.get_response(request)
+        stats, token, started = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        if not enabled():
+            return await self.get_response(request)
+        stats, token, started = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, stats, started)
+        return response
+
+    def _start(self, request):
+        stats = RequestQueries(request.path, getattr(settings, 'QUERY_STATS_SLOWEST', 3))
+        return stats, _current.set(stats), time.perf_counter()
+
+    def _finish(self, request, response, stats, started):
+        elapsed = time.perf_counter() - started
+        timings = [
+            f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"',
+            f'total;dur={elapsed * 1000:.2f}',
+        ]
+        if stats.slowest:
+            slowest = stats.slowest[0]
+            timings.append(f'db-slowest;dur={slowest["ms"]:.2f};desc="{slowest["source"]}"')
+        response['Server-Timing'] = ', '.join(timings)
+
+        level = logging.DEBUG
+        if stats.count >= getattr(settings, 'QUERY_COUNT_WARNING', 20):
+            level = logging.WARNING
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'ms': round(elapsed * 1000, 2),
+                'queries': stats.count,
+                'db_ms': round(stats.duration * 1000, 2),
+                'slowest': stats.slowest,
+            }))
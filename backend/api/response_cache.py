@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+from .cache import TTLCache
+from .metrics import cache_requests
+from .routing import primary
+
+logger = logging.getLogger('django')
+
+# Clients must revalidate, which is what turns repeat loads into 304s
+CACHE_CONTROL = 'private, no-cache'
+
+
+class LocalBackend:
+    """
+    In-process LRU. Each worker keeps its own copy, so an invalidation only
+    reaches the worker that made the change; the others catch up after ``ttl``.
+    """
+    def __init__(self, maxsize=256, ttl=300):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, entry):
+        self._cache.set(key, entry)
+
+    def delete(self, *keys):
+        for key in keys:
+            self._cache.delete(key)
+
+
+class RedisBackend:
+    """
+    Shared backend for multi-worker deployments. Works with any client that
+    speaks redis-py's ``get``/``set(ex=)``/``delete``, so a local stand-in can
+    be passed as ``client`` where no Redis server is available.
+    """
+    def __init__(self, url=None, ttl=300, client=None, prefix='upeer:response:'):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ImproperlyConfigured("RESPONSE_CACHE_BACKEND 'redis' requires the redis package")
+            client = redis.Redis.from_url(url)
+        self._client = client
+        self._ttl = ttl
+        self._prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(self._prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, entry):
+        self._client.set(self._prefix + key, json.dumps(entry), ex=self._ttl)
+
+    def delete(self, *keys):
+        if keys:
+            self._client.delete(*(self._prefix + key for key in keys))
+
+
+def _backend_from_settings():
+    name = getattr(settings, 'RESPONSE_CACHE_BACKEND', 'local')
+    ttl = getattr(settings, 'RESPONSE_CACHE_TTL', 300)
+    if name == 'local':
+        return LocalBackend(maxsize=getattr(settings, 'RESPONSE_CACHE_SIZE', 256), ttl=ttl)
+    if name == 'redis':
+        return RedisBackend(url=getattr(settings, 'RESPONSE_CACHE_URL', None), ttl=ttl)
+    # Anything else is the dotted path of a backend class
+    return import_string(name)(ttl=ttl)
+
+
+class ResponseCache:
+    """
+    Caches serialized response bodies for read-mostly endpoints together with
+    the ``ETag`` and ``Last-Modified`` validators that let clients revalidate.
+
+    Entries are only dropped by ``invalidate`` (called by the managers that
+    change the underlying rows) or by the backend's TTL.
+    """
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = _backend_from_settings()
+        return self._backend
+
+    def use_backend(self, backend):
+        """Swap in another backend, e.g. a stand-in during local development"""
+        with self._lock:
+            self._backend = backend
+
+    def get_or_build(self, key, build):
+        """Return the entry for ``key``, calling ``build()`` for the body on a miss"""
+        try:
+            entry = self.backend.get(key)
+        except Exception as e:
+            # A cache outage shouldn't take the endpoint down with it
+            logger.warning(f"Response cache read failed for {key}: {str(e)}")
+            entry = None
+        cache_requests.inc('responses', 'miss' if entry is None else 'hit')
+        if entry is not None:
+            return entry
+
+        # Cached until the next invalidation, so don't let a lagging replica fill it
+        with primary():
+            data = build()
+        body = json.dumps(data, sort_keys=True, separators=(',', ':'))
+        entry = {
+            'data': data,
+            'etag': quote_etag(hashlib.sha1(body.encode()).hexdigest()),
+            'last_modified': int(time.time())
+        }
+        try:
+            self.backend.set(key, entry)
+        except Exception as e:
+            logger.warning(f"Response cache write failed for {key}: {str(e)}")
+        return entry
+
+    def invalidate(self, *keys):
+        try:
+            self.backend.delete(*keys)
+        except Exception as e:
+            logger.error(f"Response cache invalidation failed for {keys}: {str(e)}")
+
+    def respond(self, request, key, build):
+        """
+        Serve ``key`` as a DRF response, answering ``304 Not Modified`` when the
+        client's ``If-None-Match`` or ``If-Modified-Since`` is still current.
+        """
+        entry = self.get_or_build(key, build)
+        headers = {
+            'ETag': entry['etag'],
+            'Last-Modified': http_date(entry['last_modified']),
+            'Cache-Control': CACHE_CONTROL
+        }
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            # If-None-Match wins over If-Modified-Since when both are sent
+            etags = parse_etags(if_none_match)
+            not_modified = '*' in etags or entry['etag'] in etags
+        else:
+            since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+            not_modified = since is not None and entry['last_modified'] <= since
+
+        if not_modified:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(entry['data'], status=status.HTTP_200_OK, headers=headers)
+
+
+response_cache = ResponseCache()
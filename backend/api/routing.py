@@ -0,0 +1,149 @@
+"""
+Read-replica routing for the raw-SQL managers.
+
+Read-only manager methods take their cursor from ``read_connection()`` instead
+of ``django.db.connection``. That is the replica named by
+``READ_REPLICA_ALIAS``, except when the primary has to answer:
+
+* during unsafe requests (POST, PUT, PATCH, DELETE), so a view reading back
+  what it just wrote sees it;
+* inside a transaction on the primary, so reads see its uncommitted rows;
+* for ``READ_REPLICA_STICKY_SECONDS`` after a user's last successful write,
+  so their next page load isn't served from a replica that hasn't caught up
+  (read-your-writes);
+* inside ``with primary():``.
+
+Stickiness is tracked per process like the other in-process caches, so with
+several workers keep the window comfortably above the replication lag.
+"""
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from .cache import TTLCache
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_use_primary = ContextVar('use_primary', default=False)
+_sticky_users = None
+_sticky_lock = threading.Lock()
+
+
+def _sticky():
+    global _sticky_users
+    if _sticky_users is None:
+        with _sticky_lock:
+            if _sticky_users is None:
+                _sticky_users = TTLCache(
+                    maxsize=getattr(settings, 'READ_REPLICA_STICKY_USERS', 10000),
+                    ttl=getattr(settings, 'READ_REPLICA_STICKY_SECONDS', 5),
+                    name='sticky_users'
+                )
+    return _sticky_users
+
+
+def read_alias():
+    """The database alias read-only queries should use right now"""
+    replica = getattr(settings, 'READ_REPLICA_ALIAS', None)
+    if not replica or _use_primary.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return replica
+
+
+def read_connection():
+    """Connection for read-only manager methods; see the module docstring"""
+    return connections[read_alias()]
+
+
+@contextmanager
+def primary():
+    """Send every read in the block to the primary"""
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+def stick_to_primary(user_id):
+    """Read ``user_id``'s requests from the primary until the replica has caught up"""
+    _sticky().set(user_id, True)
+
+
+def is_sticky(user_id):
+    return _sticky().get(user_id, False)
+
+
+class ReplicaRouter:
+    """
+    ``DATABASE_ROUTERS`` entry so ORM queries (sessions, admin, auth) follow
+    the same rules as the managers: writes and migrations on the primary,
+    reads wherever ``read_alias`` says.
+    """
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pins unsafe requests and recently-writing users to the primary, and
+    starts a user's sticky window when one of their writes succeeds.
+
+    Goes after ``JWTMiddleware``, which identifies the user.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _use_primary.set(self._needs_primary(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+        self._track_write(request, response)
+        return response
+
+    async def __acall__(self, request):
+        token = _use_primary.set(self._needs_primary(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _use_primary.reset(token)
+        self._track_write(request, response)
+        return response
+
+    def _user_id(self, request):
+        jwt_auth = getattr(request, 'jwt_auth', None)
+        return getattr(jwt_auth[0], 'user_id', None) if jwt_auth else None
+
+    def _needs_primary(self, request):
+        if request.method not in SAFE_METHODS:
+            return True
+        user_id = self._user_id(request)
+        return user_id is not None and is_sticky(user_id)
+
+    def _track_write(self, request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400:
+            return
+        user_id = self._user_id(request)
+        if user_id is not None:
+            stick_to_primary(user_id)
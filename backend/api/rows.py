@@ -0,0 +1,45 @@
+"""
+Map raw cursor rows to dicts using the cursor's own column names.
+
+Managers select exactly the columns (and ``AS`` aliases) they want to return,
+so the SELECT list is the single place a result's shape is defined.
+"""
+
+
+def columns(cursor):
+    """Column names of the current result set"""
+    return tuple(column[0] for column in cursor.description)
+
+
+def fetch_dicts(cursor, converters=None):
+    """
+    Fetch every remaining row as a dict keyed by column name.
+
+    ``converters`` maps a column name to a callable applied to non-NULL values,
+    e.g. ``{'is_admin': bool}`` for TINYINT flags.
+    """
+    return to_dicts(columns(cursor), cursor.fetchall(), converters)
+
+
+def fetch_dict(cursor, converters=None):
+    """Fetch the next row as a dict, or ``None`` when there are no more rows"""
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    record = dict(zip(columns(cursor), row))
+    return _convert(record, converters) if converters else record
+
+
+def to_dicts(names, rows, converters=None):
+    """Zip already fetched rows with their column names, as ``fetch_dicts`` does"""
+    if not converters:
+        return [dict(zip(names, row)) for row in rows]
+    return [_convert(dict(zip(names, row)), converters) for row in rows]
+
+
+def _convert(record, converters):
+    for name, convert in converters.items():
+        value = record.get(name)
+        if value is not None:
+            record[name] = convert(value)
+    return record
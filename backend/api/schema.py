@@ -0,0 +1,86 @@
+import logging
+import threading
+from asgiref.sync import sync_to_async
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+logger = logging.getLogger('django')
+
+
+class SchemaRegistry:
+    """
+    Which tables, columns and indexes the connected database actually has.
+
+    Probed once per process, as soon as the first connection to the primary
+    opens (wired up in ``ApiConfig.ready``), so managers can pick the query that
+    fits the schema up front instead of trying one and falling back on error.
+    Always read from the primary: a replica may not have replayed a migration
+    yet. If the probe fails it is retried on first use. The result is never
+    re-read on its own, so restart the server (or call ``refresh``) after
+    applying one of the ``add_*.sql`` migrations.
+    """
+    def __init__(self):
+        self._columns = None
+        self._indexes = None
+        self._lock = threading.Lock()
+
+    def probe(self):
+        """Read the schema from the primary, replacing anything cached"""
+        using = connections[DEFAULT_DB_ALIAS]
+        columns, indexes = {}, {}
+        introspection = using.introspection
+        with using.cursor() as cursor:
+            for table in introspection.table_names(cursor):
+                columns[table] = frozenset(
+                    column.name for column in introspection.get_table_description(cursor, table)
+                )
+                indexes[table] = frozenset(
+                    name for name, info in introspection.get_constraints(cursor, table).items()
+                    if info['index']
+                )
+        with self._lock:
+            self._columns, self._indexes = columns, indexes
+        logger.debug(f"Schema probed: {len(columns)} tables")
+
+    def connection_created(self, sender, connection, **kwargs):
+        """``connection_created`` receiver that probes once the primary is first connected"""
+        if self._columns is not None or connection.alias != DEFAULT_DB_ALIAS:
+            return
+        try:
+            self.probe()
+        except DatabaseError as e:
+            logger.warning(f"Schema probe failed, will retry on first use: {str(e)}")
+
+    def refresh(self):
+        """Forget the probed schema so the next check reads it again"""
+        with self._lock:
+            self._columns = self._indexes = None
+
+    def _ensure_probed(self):
+        if self._columns is None:
+            self.probe()
+
+    async def aensure_probed(self):
+        """Probe from async code, where the ``has_*`` checks can't hit the database themselves"""
+        if self._columns is None:
+            await sync_to_async(self.probe)()
+
+    def has_table(self, table):
+        self._ensure_probed()
+        return table in self._columns
+
+    def columns(self, table):
+        """Column names of ``table`` (empty if the table doesn't exist)"""
+        self._ensure_probed()
+        return self._columns.get(table, frozenset())
+
+    def has_column(self, table, column):
+        self._ensure_probed()
+        return column in self._columns.get(table, ())
+
+    def has_index(self, table, index):
+        self._ensure_probed()
+        return index in self._indexes.get(table, ())
+
+
+schema = SchemaRegistry()
@@ -0,0 +1,53 @@
+from rest_framework.fields import empty
+
+
+class FastSerializer:
+    """
+    Read-only, flat-dict fast path for a DRF ``Serializer`` class.
+
+    The serializer's fields are resolved once; each row is then rendered with a
+    single dict comprehension over the fields' own ``to_representation`` methods,
+    so the output matches ``Serializer(rows, many=True).data`` without DRF's
+    per-row attribute lookup, ``SkipField`` handling and ``ReturnDict`` wrapping.
+    Only suitable for serializers whose fields read a top-level key of the same name.
+    """
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self._fields = None
+
+    @property
+    def fields(self):
+        if self._fields is None:
+            fields = []
+            for name, field in self.serializer_class().fields.items():
+                if field.write_only:
+                    continue
+                if field.source != name:
+                    raise ValueError(f"{self.serializer_class.__name__}.{name} uses a custom source")
+                fields.append((name, field.to_representation, field))
+            self._fields = fields
+        return self._fields
+
+    def one(self, row):
+        data = {}
+        for name, represent, field in self.fields:
+            if name in row:
+                value = row[name]
+            elif field.default is not empty:
+                value = field.get_default()
+            elif field.allow_null:
+                value = None
+            else:
+                continue
+            data[name] = None if value is None else represent(value)
+        return data
+
+    def many(self, rows):
+        fields = self.fields
+        # Every manager row carries every field, so the common case skips the fallback checks
+        if rows and all(name in rows[0] for name, _, _ in fields):
+            return [
+                {name: None if row[name] is None else represent(row[name]) for name, represent, _ in fields}
+                for row in rows
+            ]
+        return [self.one(row) for row in rows]
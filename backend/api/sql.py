@@ -0,0 +1,64 @@
+from django.db import connection, transaction
+
+
+def _values_sql(columns, row_count):
+    row = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    return ", ".join([row] * row_count)
+
+
+def insert_many_sql(table, columns, row_count=1):
+    """Build a multi-row INSERT for ``row_count`` rows of ``columns``"""
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES {_values_sql(columns, row_count)}"
+
+
+def _insert_ignore(table, columns, source):
+    column_list = ", ".join(columns)
+    if connection.vendor == 'mysql':
+        return f"INSERT IGNORE INTO {table} ({column_list}) {source}"
+    if connection.vendor == 'sqlite':
+        return f"INSERT OR IGNORE INTO {table} ({column_list}) {source}"
+    return f"INSERT INTO {table} ({column_list}) {source} ON CONFLICT DO NOTHING"
+
+
+def insert_ignore_sql(table, columns, row_count=1):
+    """
+    Build a multi-row INSERT that silently skips rows hitting a unique key,
+    in the dialect of the active database.
+    """
+    return _insert_ignore(table, columns, f"VALUES {_values_sql(columns, row_count)}")
+
+
+def insert_ignore_select_sql(table, columns, select):
+    """``INSERT ... SELECT`` counterpart of ``insert_ignore_sql``"""
+    return _insert_ignore(table, columns, select)
+
+
+def for_update_sql(of=None):
+    """Row-locking suffix for a SELECT, or an empty string where unsupported"""
+    if not connection.features.has_select_for_update:
+        return ""
+    if of and connection.features.has_select_for_update_of:
+        return f"FOR UPDATE OF {of}"
+    return "FOR UPDATE"
+
+
+def update_in_id_batches(table, id_column, query, batch_size=10000):
+    """
+    Run ``query`` once per ``id_column`` range of ``batch_size`` ids, each in its
+    own transaction, so a table-wide repair never holds locks on the whole table.
+    ``query`` takes the range bounds as its two ``%s`` placeholders.
+
+    Returns the total number of rows updated.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT MIN({id_column}), MAX({id_column}) FROM {table}")
+        low, high = cursor.fetchone()
+    if low is None:
+        return 0
+    
+    updated = 0
+    for start in range(low, high + 1, batch_size):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(query, [start, start + batch_size - 1])
+            updated += cursor.rowcount
+    return updated
@@ -1,3 +1,249 @@
-from django.test import TestCase
+import datetime
+import sqlite3
+import threading
+import time
+from django.test import SimpleTestCase
+from .db_pool import ConnectionPool, PoolTimeout
+from .pagination import (
+    InvalidCursor, decode_cursor, encode_cursor, keyset_condition, multi_keyset_condition, paginate, parse_limit,
+    MAX_PAGE_SIZE
+)
 
 # Create your tests here.
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def make_pool(self, connect=None, check=None, **options):
+        self.opened = []
+        self.checked = []
+
+        def open_connection():
+            connection = FakeConnection(len(self.opened))
+            self.opened.append(connection)
+            return connection
+
+        def check_connection(connection):
+            self.checked.append(connection)
+
+        options.setdefault('clock', FakeClock())
+        return ConnectionPool(
+            connect or open_connection, check=check or check_connection,
+            close=FakeConnection.close, **options
+        )
+
+    def test_reuses_released_connection(self):
+        pool = self.make_pool()
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(pool.stats()['created'], 1)
+
+    def test_times_out_at_max_size(self):
+        pool = self.make_pool(max_size=2, timeout=0.05, clock=time.monotonic)
+        pool.acquire()
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['timeouts'], stats['waits']), (2, 1, 1))
+
+    def test_waiter_gets_released_connection(self):
+        pool = self.make_pool(max_size=1, timeout=5, clock=time.monotonic)
+        held = pool.acquire()
+        timer = threading.Timer(0.05, pool.release, [held])
+        timer.start()
+        try:
+            self.assertIs(pool.acquire(), held)
+        finally:
+            timer.join()
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_failed_connect_frees_its_slot(self):
+        def refuse():
+            raise OSError('connection refused')
+        pool = self.make_pool(connect=refuse, max_size=1, timeout=0)
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                pool.acquire()
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_failed_reconnect_frees_its_slot(self):
+        clock = FakeClock()
+        pool = self.make_pool(max_size=1, timeout=0, max_lifetime=10, clock=clock)
+        pool.release(pool.acquire())
+        clock.now = 10
+
+        def refuse():
+            raise OSError('connection refused')
+        pool._connect = refuse
+        with self.assertRaises(OSError):
+            pool.acquire()
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertTrue(self.opened[0].closed)
+
+    def test_recycles_at_max_lifetime(self):
+        clock = FakeClock()
+        pool = self.make_pool(max_lifetime=10, clock=clock)
+        first = pool.acquire()
+        pool.release(first)
+        clock.now = 10
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        # Released past its lifetime, a connection is closed rather than kept
+        clock.now = 20
+        pool.release(second)
+        self.assertTrue(second.closed)
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['idle'], stats['recycled']), (0, 0, 2))
+
+    def test_reaps_idle_down_to_min_size(self):
+        clock = FakeClock()
+        pool = self.make_pool(min_size=1, max_idle=60, clock=clock)
+        connections = [pool.acquire() for _ in range(3)]
+        for connection in connections:
+            pool.release(connection)
+        clock.now = 60
+        # The most recently used connection is handed out; the reaper runs first
+        pool.acquire()
+        self.assertEqual([c.closed for c in connections], [True, True, False])
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_failed_health_check_reconnects(self):
+        clock = FakeClock()
+
+        def check(connection):
+            raise OSError('server has gone away')
+        pool = self.make_pool(check=check, check_after=30, clock=clock)
+        first = pool.acquire()
+        pool.release(first)
+        clock.now = 29
+        self.assertIs(pool.acquire(), first)
+        pool.release(first)
+        clock.now = 60
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['check_failures']), (1, 1))
+
+    def test_checks_only_after_idle_period(self):
+        clock = FakeClock()
+        pool = self.make_pool(check_after=30, clock=clock)
+        connection = pool.acquire()
+        pool.release(connection)
+        pool.release(pool.acquire())
+        self.assertEqual(self.checked, [])
+        clock.now = 30
+        pool.acquire()
+        self.assertEqual(self.checked, [connection])
+
+    def test_release_twice_or_foreign_keeps_size(self):
+        pool = self.make_pool(max_size=2)
+        connection = pool.acquire()
+        pool.release(connection)
+        pool.release(connection)
+        self.assertFalse(connection.closed)
+        foreign = FakeConnection(-1)
+        pool.release(foreign)
+        self.assertTrue(foreign.closed)
+        stats = pool.stats()
+        self.assertEqual((stats['size'], stats['idle'], stats['in_use']), (1, 1, 0))
+
+    def test_discard_frees_slot(self):
+        pool = self.make_pool(max_size=1, timeout=0)
+        connection = pool.acquire()
+        pool.release(connection, discard=True)
+        self.assertTrue(connection.closed)
+        self.assertIsNot(pool.acquire(), connection)
+        self.assertEqual(pool.stats()['size'], 1)
+
+
+class CursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        when = datetime.datetime(2024, 5, 1, 12, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+        token = encode_cursor(when, 42)
+        self.assertNotIn('=', token)
+        self.assertEqual(decode_cursor(token), ['2024-05-01 10:30:00', 42])
+
+    def test_missing_cursor(self):
+        self.assertIsNone(decode_cursor(None))
+        self.assertIsNone(decode_cursor(''))
+
+    def test_rejects_malformed_cursor(self):
+        for token in ('not-a-cursor', '!!!!', encode_cursor(1), encode_cursor(1, 2, 3), 'eyJhIjoxfQ', '_w'):
+            with self.subTest(token=token), self.assertRaises(InvalidCursor):
+                decode_cursor(token)
+
+    def test_cursor_size(self):
+        self.assertEqual(decode_cursor(encode_cursor(1, 2, 3), size=3), [1, 2, 3])
+
+    def test_parse_limit(self):
+        self.assertEqual(parse_limit(None, default=7), 7)
+        self.assertEqual(parse_limit('5'), 5)
+        self.assertEqual(parse_limit(str(MAX_PAGE_SIZE + 1)), MAX_PAGE_SIZE)
+        for value in ('0', '-1', 'ten'):
+            with self.subTest(value=value), self.assertRaises(InvalidCursor):
+                parse_limit(value)
+
+    def test_keyset_condition(self):
+        clause, params = keyset_condition('p.date_created', 'p.post_id', ['2024-05-01 10:30:00', 42])
+        self.assertEqual(clause, '(p.date_created < %s OR (p.date_created = %s AND p.post_id < %s))')
+        self.assertEqual(params, ['2024-05-01 10:30:00', '2024-05-01 10:30:00', 42])
+
+    def test_paginate(self):
+        rows = [{'id': i} for i in (5, 4, 3)]
+        self.assertEqual(paginate(rows, None, lambda row: (row['id'],)), (rows, None))
+        self.assertEqual(paginate(rows, 3, lambda row: (row['id'],)), (rows, None))
+        page, next_cursor = paginate(rows, 2, lambda row: (row['id'],))
+        self.assertEqual(page, rows[:2])
+        self.assertEqual(decode_cursor(next_cursor, size=1), [4])
+
+
+class MultiKeysetConditionTests(SimpleTestCase):
+    def test_single_column(self):
+        self.assertEqual(multi_keyset_condition(['p.post_id'], [9]), ('p.post_id < %s', [9]))
+
+    def test_nests_columns(self):
+        clause, params = multi_keyset_condition(['a', 'b', 'c'], [3, 2, 1])
+        self.assertEqual(clause, '(a < %s OR (a = %s AND (b < %s OR (b = %s AND c < %s))))')
+        self.assertEqual(params, [3, 3, 2, 2, 1])
+
+    def test_pages_visit_every_row_once(self):
+        # Ties on the leading columns are what the id column has to break
+        rows = [(count, day, post_id) for post_id, (count, day) in enumerate(
+            [(count, day) for count in (1, 2, 3) for day in ('2024-01-01', '2024-01-02')] * 2, start=1
+        )]
+        database = sqlite3.connect(':memory:')
+        database.execute('CREATE TABLE posts (report_count INT, reported TEXT, post_id INT)')
+        database.executemany('INSERT INTO posts VALUES (?, ?, ?)', rows)
+        columns = ('report_count', 'reported', 'post_id')
+        seen, after = [], None
+        while True:
+            where, params = ('1 = 1', []) if after is None else multi_keyset_condition(columns, after)
+            page = database.execute(
+                f"SELECT {', '.join(columns)} FROM posts WHERE {where.replace('%s', '?')} "
+                "ORDER BY report_count DESC, reported DESC, post_id DESC LIMIT 5", params
+            ).fetchall()
+            if not page:
+                break
+            seen.extend(page)
+            after = page[-1]
+        self.assertEqual(seen, sorted(rows, reverse=True))
@@ -1,3 +1,16 @@
-from django.shortcuts import render
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+from . import metrics
 
-# Create your views here.
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@require_GET
+def metrics_view(request):
+    """
+    This process's metrics, for a Prometheus scrape sending ``METRICS_TOKEN``
+    as its bearer token or for an admin's JWT. Anyone else gets a 403.
+    """
+    if not (metrics.scrape_token_valid(request) or getattr(request.user, 'is_admin', False)):
+        return HttpResponse('Forbidden\n', status=403, content_type=CONTENT_TYPE)
+    return HttpResponse(metrics.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+Move deleted posts and old chat messages out of the hot tables.
+
+Posts deleted (or hidden by a moderator) more than --post-grace-days ago go to
+posts_archive together with their comments and reports; chat messages older
+than --message-days go to messages_archive. Work is done in batches of
+--batch-size rows, one transaction each, so it is safe to run on a live
+database, e.g. nightly from cron. Archived posts stay readable through
+GET /api/posts/{post_id}/archived/ and archived messages through the chat
+history endpoint's ``before`` paging.
+
+Usage: python archive_data.py [--post-grace-days 30] [--message-days 365] [--batch-size 1000]
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'upeer_project.settings')
+
+import django
+django.setup()
+
+from api.schema import schema
+from posts.models import PostManager
+from chat.models import MessageManager
+
+
+def days_ago(days):
+    # Timestamps are stored as naive UTC
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return now - datetime.timedelta(days=days)
+
+
+def archive(post_grace_days=30, message_days=365, batch_size=1000, pause=0.0):
+    """Run both archival passes; returns ``(posts_archived, messages_archived)``"""
+    posts = PostManager.archive_deleted_posts(days_ago(post_grace_days), batch_size, pause)
+    messages = MessageManager.archive_messages(days_ago(message_days), batch_size, pause) if message_days else 0
+    return posts, messages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--post-grace-days', type=float, default=30,
+                        help='keep deleted posts restorable for this many days')
+    parser.add_argument('--message-days', type=float, default=365,
+                        help='archive chat messages older than this many days (0 keeps them all)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='rows per transaction')
+    parser.add_argument('--pause', type=float, default=0.0, help='seconds to sleep between batches')
+    args = parser.parse_args()
+
+    if not schema.has_table('posts_archive') or not schema.has_column('posts', 'deleted_at'):
+        sys.exit("❌  Archive tables not found; run add_archive_tables.sql first")
+
+    started = time.perf_counter()
+    posts, messages = archive(args.post_grace_days, args.message_days, args.batch_size, args.pause)
+    print(f"✅  Archived {posts} post(s) and {messages} message(s) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
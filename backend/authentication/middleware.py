@@ -1,8 +1,8 @@
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
-import jwt
-from django.conf import settings
+from api.metrics import scrape_token_valid
 from .models import UserManager
+from .tokens import ACCESS, USER_CLAIMS, decode_token
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 import logging
@@ -25,49 +25,64 @@ class CustomUser:
         return getattr(self, key, default)
 
 
+def parse_bearer_token(auth_header):
+    """Return the token from a ``Bearer <token>`` header, or ``None`` if it isn't one"""
+    try:
+        prefix, token = auth_header.split(' ')
+    except ValueError:
+        return None
+    if prefix.lower() != 'bearer':
+        return None
+    return token
+
+
+def authenticate_token(token):
+    """
+    Verify a JWT and build its user. Access tokens carry the claims
+    ``request.user`` needs, so no query is made; tokens issued before they
+    did are looked up with ``UserManager.get_cached_user``.
+
+    Returns a ``CustomUser`` or raises ``AuthenticationFailed``.
+    """
+    payload = decode_token(token, ACCESS)
+    if payload.get('type') == ACCESS:
+        return CustomUser({key: payload[key] for key in USER_CLAIMS})
+    
+    user_dict = UserManager.get_cached_user(payload['user_id'])
+    if not user_dict:
+        raise AuthenticationFailed('User not found')
+    return CustomUser(user_dict)
+
+
+def get_user_for_token(token):
+    """
+    Like ``authenticate_token`` but returns ``None`` instead of raising. Used by
+    transports that can't return a DRF error response, such as the chat WebSocket.
+    """
+    try:
+        return authenticate_token(token)
+    except AuthenticationFailed:
+        return None
+
+
 class JWTAuthentication(BaseAuthentication):
     def authenticate(self, request):
+        # JWTMiddleware has usually authenticated this request already
+        jwt_auth = getattr(request._request, 'jwt_auth', None)
+        if jwt_auth is not None:
+            return jwt_auth
+        
         auth_header = request.META.get('HTTP_AUTHORIZATION')
         if not auth_header:
             return None
         
-        try:
-            # Check if the header has the Bearer prefix
-            prefix, token = auth_header.split(' ')
-            if prefix.lower() != 'bearer':
-                return None
-        except ValueError:
+        token = parse_bearer_token(auth_header)
+        if token is None:
             return None
         
-        try:
-            # Decode the JWT token
-            # First try without validation for detailed debugging
-            try:
-                decoded_payload = jwt.decode(token, options={"verify_signature": False})
-                logger.debug(f"Token payload (unverified): {decoded_payload}")
-            except Exception as e:
-                logger.error(f"Token is completely malformed: {str(e)}")
-            
-            # Now properly decode with validation
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            logger.debug(f"Token decoded successfully: {payload}")
-            
-            user_id = payload.get('user_id')
-            if not user_id:
-                raise AuthenticationFailed('Invalid token payload')
-            
-            # Get the user from database
-            user_dict = UserManager.get_user_by_id(user_id)
-            if not user_dict:
-                raise AuthenticationFailed('User not found')
-            
-            # Convert dict to CustomUser object
-            user = CustomUser(user_dict)
-            return (user, token)
-        except jwt.ExpiredSignatureError:
-            raise AuthenticationFailed('Token has expired')
-        except jwt.InvalidTokenError:
-            raise AuthenticationFailed('Invalid token')
+        user = authenticate_token(token)
+        request._request.jwt_auth = (user, token)
+        return (user, token)
         
     def authenticate_header(self, request):
         return 'Bearer'
@@ -75,13 +90,16 @@ class JWTAuthentication(BaseAuthentication):
 class JWTMiddleware(MiddlewareMixin):
     """
     Django middleware that processes JWT authentication for regular Django views
-    This is used in addition to the DRF authentication classes
+    This is used in addition to the DRF authentication classes, which reuse the
+    result stored on ``request.jwt_auth`` instead of decoding the token again
     """
     def process_request(self, request):
         # Skip authentication for paths that don't need it
         exempt_paths = [
             '/api/auth/login/', 
             '/api/auth/register/',
+            '/api/auth/refresh/',
+            '/api/auth/logout/',
             '/admin/', 
             '/api/docs/',
             '/static/'
@@ -92,6 +110,10 @@ class JWTMiddleware(MiddlewareMixin):
             logger.debug(f"Path exempt from HTTP authentication: {request.path}")
             return None
             
+        # Prometheus sends METRICS_TOKEN rather than a JWT; metrics_view lets admins in too
+        if request.path == '/api/metrics' and scrape_token_valid(request):
+            return None
+            
         # Skip OPTIONS requests (for CORS preflight)
         if request.method == 'OPTIONS':
             return None
@@ -101,44 +123,20 @@ class JWTMiddleware(MiddlewareMixin):
         if not auth_header:
             return JsonResponse({'error': 'Authentication required'}, status=401)
             
-        try:
-            # Check if the header has the Bearer prefix
-            prefix, token = auth_header.split(' ')
-            if prefix.lower() != 'bearer':
-                return JsonResponse({'error': 'Invalid authorization format'}, status=401)
-        except ValueError:
+        token = parse_bearer_token(auth_header)
+        if token is None:
             return JsonResponse({'error': 'Invalid authorization format'}, status=401)
             
         try:
-            # Decode the JWT token
-            # First try without validation for detailed debugging
-            try:
-                decoded_payload = jwt.decode(token, options={"verify_signature": False})
-                logger.debug(f"Token payload (unverified): {decoded_payload}")
-            except Exception as e:
-                logger.error(f"Token is completely malformed: {str(e)}")
-            
-            # Now properly decode with validation
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
-            logger.debug(f"Token decoded successfully: {payload}")
-            
-            user_id = payload.get('user_id')
-            if not user_id:
-                return JsonResponse({'error': 'Invalid token payload'}, status=401)
-                
-            # Get the user from database
-            user_dict = UserManager.get_user_by_id(user_id)
-            if not user_dict:
-                return JsonResponse({'error': 'User not found'}, status=401)
-                
-            # Convert dict to CustomUser object and set on request
-            request.user = CustomUser(user_dict)
-            return None
-            
-        except jwt.ExpiredSignatureError:
-            return JsonResponse({'error': 'Token has expired'}, status=401)
-        except jwt.InvalidTokenError:
-            return JsonResponse({'error': 'Invalid token'}, status=401)
+            user = authenticate_token(token)
+        except AuthenticationFailed as e:
+            return JsonResponse({'error': str(e.detail)}, status=401)
         except Exception as e:
             # Log the error in production
-            return JsonResponse({'error': 'An error occurred during authentication'}, status=500) 
\ No newline at end of file
+            logger.exception(f"Error during authentication: {str(e)}")
+            return JsonResponse({'error': 'An error occurred during authentication'}, status=500)
+        
+        # Hand the result to DRF's JWTAuthentication and to plain Django views
+        request.user = user
+        request.jwt_auth = (user, token)
+        return None
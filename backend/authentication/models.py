@@ -1,19 +1,30 @@
 from django.db import models
 from django.db import connection
-import hashlib
+from django.conf import settings
+from api.cache import TTLCache
+from api.rows import fetch_dict
+from .passwords import hash_password
+from .tokens import revocations
 import logging
 
 # Get logger for this module
 logger = logging.getLogger('channels')
 
+# Users looked up by the auth pipeline, keyed by user_id. Password hashes are never cached.
+_user_cache = TTLCache(
+    maxsize=getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL', 60),
+    name='auth_users'
+)
+
 # Create your models here.
 
 class UserManager:
     @staticmethod
     def create_user(name, email, password, is_admin=0):
+        # Hash before taking a connection; it's the slow part
+        hashed_password = hash_password(password)
         with connection.cursor() as cursor:
-            # Hash the password with SHA2
-            hashed_password = hashlib.sha256(password.encode()).hexdigest()
             query = "INSERT INTO users (name, email, password, is_admin) VALUES (%s, %s, %s, %s)"
             cursor.execute(query, [name, email, hashed_password, is_admin])
             return cursor.lastrowid
@@ -23,17 +34,7 @@ class UserManager:
         with connection.cursor() as cursor:
             query = "SELECT user_id, name, email, password, is_admin, created_at FROM users WHERE email = %s"
             cursor.execute(query, [email])
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'user_id': row[0],
-                    'name': row[1],
-                    'email': row[2],
-                    'password': row[3],
-                    'is_admin': bool(row[4]),
-                    'created_at': row[5]
-                }
-            return None
+            return fetch_dict(cursor, {'is_admin': bool})
     
     @staticmethod
     def get_user_by_id(user_id):
@@ -45,28 +46,49 @@ class UserManager:
                     WHERE user_id = %s
                 """
                 cursor.execute(query, [user_id])
-                user = cursor.fetchone()
+                user = fetch_dict(cursor, {'is_admin': bool})
                 
                 if user:
-                    return {
-                        'user_id': user[0],
-                        'name': user[1],
-                        'email': user[2],
-                        'password': user[3],
-                        'is_admin': bool(user[4]),
-                        'created_at': user[5]
-                    }
+                    return user
                 logger.warning(f"No user found with ID: {user_id}")
                 return None
         except Exception as e:
             logger.exception(f"Error retrieving user {user_id}: {str(e)}")
             return None
     
+    @staticmethod
+    def get_cached_user(user_id):
+        """
+        Get a user for authentication, served from the per-process cache when possible.
+        The returned dict has no ``password`` key.
+        """
+        user = _user_cache.get(user_id)
+        if user is None:
+            user = UserManager.get_user_by_id(user_id)
+            if not user:
+                return None
+            user = {key: value for key, value in user.items() if key != 'password'}
+            _user_cache.set(user_id, user)
+        return dict(user)
+    
+    @staticmethod
+    def invalidate_cached_user(user_id):
+        _user_cache.delete(user_id)
+    
     @staticmethod
     def update_user(user_id, name, email):
         with connection.cursor() as cursor:
             query = "UPDATE users SET name = %s, email = %s WHERE user_id = %s"
             cursor.execute(query, [name, email, user_id])
+            UserManager.invalidate_cached_user(user_id)
+            return cursor.rowcount > 0
+    
+    @staticmethod
+    def replace_password_hash(user_id, old_hash, new_hash):
+        """Swap in a re-hashed password, unless the password was changed since ``old_hash`` was read"""
+        with connection.cursor() as cursor:
+            query = "UPDATE users SET password = %s WHERE user_id = %s AND password = %s"
+            cursor.execute(query, [new_hash, user_id, old_hash])
             return cursor.rowcount > 0
     
     @staticmethod
@@ -74,4 +96,7 @@ class UserManager:
         with connection.cursor() as cursor:
             query = "DELETE FROM users WHERE user_id = %s"
             cursor.execute(query, [user_id])
+            UserManager.invalidate_cached_user(user_id)
+            # Access tokens carry their claims, so they'd keep working until they expire
+            revocations.revoke_user(user_id)
             return cursor.rowcount > 0
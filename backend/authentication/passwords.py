@@ -0,0 +1,173 @@
+"""
+Password hashing.
+
+Hashes are stored as ``algorithm$cost$salt$hash`` so every hash records how
+expensive it was to make, e.g. ``pbkdf2_sha256$600000$<salt>$<hash>``. The
+cost is the iteration count for ``pbkdf2_sha256`` and the CPU/memory cost
+``N`` for ``scrypt``. Hashes made before this module are bare hex SHA-256
+digests; they still verify, and like any hash whose algorithm or cost differs
+from the current settings they are re-hashed on the user's next login.
+
+Hashing is deliberately slow, so it runs on a small pool of
+``PASSWORD_HASH_WORKERS`` threads (the KDFs release the GIL) rather than on
+the request threads. A burst of logins then queues for those workers and
+leaves the remaining cores to every other endpoint; once
+``PASSWORD_HASH_QUEUE`` logins are waiting, further ones fail fast with
+``PasswordHashBusy``.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from api import metrics
+
+DEFAULT_COSTS = {
+    'pbkdf2_sha256': 600000,
+    'scrypt': 2 ** 14,
+}
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+_LEGACY_SHA256 = re.compile(r'[0-9a-f]{64}')
+
+
+class PasswordHashBusy(Exception):
+    """Raised when too many password hashes are already waiting for a worker"""
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _derive(password, algorithm, cost, salt):
+    if algorithm == 'pbkdf2_sha256':
+        return hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), cost)
+    if algorithm == 'scrypt':
+        return hashlib.scrypt(password.encode(), salt=salt.encode(), n=cost, r=SCRYPT_R, p=SCRYPT_P,
+                              maxmem=256 * SCRYPT_R * cost, dklen=32)
+    raise ValueError(f"Unknown password hash algorithm {algorithm!r}")
+
+
+def configured():
+    """The ``(algorithm, cost)`` new hashes are made with"""
+    algorithm = getattr(settings, 'PASSWORD_HASH_ALGORITHM', 'pbkdf2_sha256')
+    if algorithm not in DEFAULT_COSTS:
+        raise ValueError(f"PASSWORD_HASH_ALGORITHM must be one of: {', '.join(DEFAULT_COSTS)}")
+    return algorithm, getattr(settings, 'PASSWORD_HASH_COST', 0) or DEFAULT_COSTS[algorithm]
+
+
+def make_hash(password, algorithm=None, cost=None):
+    """Hash ``password`` on the calling thread; ``hash_password`` is the pooled version"""
+    if algorithm is None:
+        algorithm, default_cost = configured()
+        cost = cost or default_cost
+    cost = cost or DEFAULT_COSTS[algorithm]
+    salt = secrets.token_urlsafe(16)
+    return f"{algorithm}${cost}${salt}${_b64(_derive(password, algorithm, cost, salt))}"
+
+
+def verify_hash(password, encoded):
+    """Check ``password`` against a stored hash of any supported format, on the calling thread"""
+    if _LEGACY_SHA256.fullmatch(encoded or ''):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), encoded)
+    try:
+        algorithm, cost, salt, digest = encoded.split('$')
+        derived = _derive(password, algorithm, int(cost), salt)
+    except ValueError:
+        return False
+    return hmac.compare_digest(_b64(derived), digest)
+
+
+def needs_rehash(encoded):
+    """Whether a stored hash was made with anything other than the current algorithm and cost"""
+    algorithm, cost = configured()
+    return not encoded.startswith(f"{algorithm}${cost}$")
+
+
+def _check(password, encoded):
+    if not verify_hash(password, encoded):
+        return False, None
+    return True, make_hash(password) if needs_rehash(encoded) else None
+
+
+# A hash of nothing anyone can log in with, checked when the email is unknown
+# so those logins take as long as ones with a wrong password
+_dummy_hash = None
+
+
+def _check_unknown(password):
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = make_hash(secrets.token_urlsafe(16))
+    verify_hash(password, _dummy_hash)
+    return False, None
+
+
+class HashPool:
+    """A fixed number of hashing threads with a cap on how many hashes may wait for them"""
+    def __init__(self, workers, max_waiting):
+        self.workers = workers
+        self.max_waiting = max_waiting
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def submit(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.workers + self.max_waiting:
+                raise PasswordHashBusy('Too many logins in progress')
+            self._pending += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def run(self, fn, *args):
+        return self.submit(fn, *args).result()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashPool(
+                    getattr(settings, 'PASSWORD_HASH_WORKERS', 0) or max(1, (os.cpu_count() or 2) // 2),
+                    getattr(settings, 'PASSWORD_HASH_QUEUE', 64),
+                )
+    return _pool
+
+
+@metrics.collector
+def _hash_pool_metrics():
+    waiting = _pool._pending if _pool is not None else 0
+    return [('password_hash_pending', 'gauge', 'Password hashes running or waiting for a hashing thread.',
+             [({}, waiting)])]
+
+
+def hash_password(password):
+    """Hash a new password with the current settings"""
+    return pool().run(make_hash, password)
+
+
+def check_password(password, encoded):
+    """
+    Verify ``password`` against ``encoded``, the user's stored hash or ``None``
+    for an unknown user. Returns ``(valid, new_hash)``; ``new_hash`` is set when
+    the password was right but its hash is out of date and should be replaced.
+    """
+    if encoded is None:
+        return pool().run(_check_unknown, password)
+    return pool().run(_check, password, encoded)
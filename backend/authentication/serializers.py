@@ -10,6 +10,12 @@ class UserLoginSerializer(serializers.Serializer):
     email = serializers.EmailField(max_length=100)
     password = serializers.CharField(max_length=255, write_only=True)
 
+class TokenRefreshSerializer(serializers.Serializer):
+    refresh_token = serializers.CharField()
+
+class LogoutSerializer(serializers.Serializer):
+    refresh_token = serializers.CharField(required=False)
+
 class UserProfileSerializer(serializers.Serializer):
     user_id = serializers.IntegerField(read_only=True)
     name = serializers.CharField(max_length=100)
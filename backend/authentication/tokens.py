@@ -0,0 +1,211 @@
+"""
+JWT access and refresh tokens.
+
+Access tokens live for ``JWT_ACCESS_TOKEN_LIFETIME`` seconds and carry the
+user's email, name and ``is_admin``, so authenticating a request needs no
+query. Refresh tokens live for ``JWT_REFRESH_TOKEN_LIFETIME`` and can be
+exchanged once, at ``POST /api/auth/refresh/``, for a new pair.
+
+Revoking a token (logout, a used refresh token, a deleted user) writes a row
+to ``revoked_tokens``. Every process keeps those rows in memory in
+``revocations`` and reads new ones at most every
+``TOKEN_REVOCATION_SYNC_SECONDS``, so checking a token is two dict lookups.
+Rows are dropped once the tokens they revoke would have expired anyway.
+Without ``add_revoked_tokens.sql`` revocations only reach the process that
+made them.
+"""
+import datetime
+import heapq
+import threading
+import time
+import uuid
+import jwt
+from django.conf import settings
+from django.db import connection
+from rest_framework.exceptions import AuthenticationFailed
+from api.schema import schema
+from api.sql import insert_ignore_sql
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+# Claims an access token carries for ``request.user``
+USER_CLAIMS = ('user_id', 'email', 'name', 'is_admin')
+
+# How far back each sync re-reads, for rows committed out of order or stamped by a slower clock
+SYNC_OVERLAP = datetime.timedelta(seconds=60)
+
+
+def access_lifetime():
+    return getattr(settings, 'JWT_ACCESS_TOKEN_LIFETIME', 900)
+
+
+def refresh_lifetime():
+    return getattr(settings, 'JWT_REFRESH_TOKEN_LIFETIME', 14 * 86400)
+
+
+def _utc(timestamp):
+    # Stored as naive UTC, like every other timestamp
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).replace(tzinfo=None)
+
+
+def _timestamp(value):
+    return value.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+def _encode(claims):
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm='HS256')
+
+
+def issue_tokens(user):
+    """A new access and refresh token for ``user``, as returned by login, register and refresh"""
+    now = int(time.time())
+    access = {key: user[key] for key in USER_CLAIMS}
+    access.update(type=ACCESS, jti=uuid.uuid4().hex, iat=now, exp=now + access_lifetime())
+    refresh = {'type': REFRESH, 'jti': uuid.uuid4().hex, 'user_id': user['user_id'],
+               'iat': now, 'exp': now + refresh_lifetime()}
+    return {
+        'token': _encode(access),
+        'refresh_token': _encode(refresh),
+        'expires_in': access_lifetime(),
+    }
+
+
+def decode_token(token, token_type=ACCESS, verify_exp=True):
+    """
+    Verify a token of ``token_type`` and return its claims, or raise
+    ``AuthenticationFailed`` if it is invalid, expired or revoked.
+    """
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'],
+                             options={'verify_exp': verify_exp})
+    except jwt.ExpiredSignatureError:
+        raise AuthenticationFailed('Token has expired')
+    except jwt.InvalidTokenError:
+        raise AuthenticationFailed('Invalid token')
+    # Tokens issued before refresh tokens existed have no type; they are 24-hour access tokens
+    if payload.get('type', ACCESS) != token_type:
+        raise AuthenticationFailed('Invalid token')
+    if not payload.get('user_id'):
+        raise AuthenticationFailed('Invalid token payload')
+    if revocations.is_revoked(payload):
+        raise AuthenticationFailed('Token has been revoked')
+    return payload
+
+
+class RevocationList:
+    """
+    Revoked token ids with their expiry, and per-user "nothing issued before"
+    times, mirrored from ``revoked_tokens``. A heap ordered by expiry lets
+    expired entries be dropped without scanning the whole set.
+    """
+    def __init__(self, timer=time.monotonic):
+        self._timer = timer
+        self._tokens = {}
+        self._expiry = []
+        self._users = {}
+        self._lock = threading.Lock()
+        self._synced_at = None
+        self._read_until = None
+
+    def is_revoked(self, payload):
+        self.sync()
+        if payload.get('jti') in self._tokens:
+            return True
+        revoked_before = self._users.get(payload['user_id'])
+        return revoked_before is not None and payload.get('iat', 0) <= revoked_before[0]
+
+    def _add(self, jti, user_id, revoked_at, expires_at):
+        if jti is None:
+            current = self._users.get(user_id)
+            if current is None or current[0] < revoked_at:
+                self._users[user_id] = (revoked_at, expires_at)
+            return True
+        if jti in self._tokens:
+            return False
+        self._tokens[jti] = expires_at
+        heapq.heappush(self._expiry, (expires_at, jti))
+        return True
+
+    def _purge(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry)
+            self._tokens.pop(jti, None)
+        expired = [user_id for user_id, (_, expires_at) in self._users.items() if expires_at <= now]
+        for user_id in expired:
+            del self._users[user_id]
+
+    def sync(self, force=False):
+        """Read revocations made by other processes, if the last read is older than the sync interval"""
+        interval = getattr(settings, 'TOKEN_REVOCATION_SYNC_SECONDS', 5)
+        if not force and self._synced_at is not None and self._timer() - self._synced_at < interval:
+            return
+        # A thread that finds another one syncing carries on with what is already loaded
+        if not self._lock.acquire(blocking=force):
+            return
+        try:
+            now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+            if schema.has_table('revoked_tokens'):
+                with connection.cursor() as cursor:
+                    if self._read_until is None:
+                        cursor.execute("""
+                            SELECT jti, user_id, revoked_at, expires_at FROM revoked_tokens
+                            WHERE expires_at > %s
+                        """, [now])
+                    else:
+                        cursor.execute("""
+                            SELECT jti, user_id, revoked_at, expires_at FROM revoked_tokens
+                            WHERE revoked_at >= %s
+                        """, [self._read_until - SYNC_OVERLAP])
+                    for jti, user_id, revoked_at, expires_at in cursor.fetchall():
+                        self._add(jti, user_id, _timestamp(revoked_at), _timestamp(expires_at))
+                self._read_until = now
+            self._purge(_timestamp(now))
+            self._synced_at = self._timer()
+        finally:
+            self._lock.release()
+
+    def revoke(self, payload):
+        """
+        Revoke one token until it expires. Returns False if it already was, so
+        a refresh token can only be exchanged once even across processes.
+        """
+        return self._record(payload['jti'], payload['user_id'], payload['exp'])
+
+    def revoke_user(self, user_id):
+        """Revoke every token issued to ``user_id`` so far"""
+        self._record(None, user_id, time.time() + refresh_lifetime())
+
+    def _record(self, jti, user_id, expires_at):
+        revoked_at = time.time()
+        stored = True
+        if schema.has_table('revoked_tokens'):
+            columns = ('jti', 'user_id', 'revoked_at', 'expires_at')
+            with connection.cursor() as cursor:
+                cursor.execute("DELETE FROM revoked_tokens WHERE expires_at <= %s", [_utc(revoked_at)])
+                cursor.execute(insert_ignore_sql('revoked_tokens', columns),
+                               [jti, user_id, _utc(revoked_at), _utc(expires_at)])
+                stored = cursor.rowcount == 1
+        with self._lock:
+            added = self._add(jti, user_id, revoked_at, expires_at)
+        return stored and added
+
+
+revocations = RevocationList()
+
+
+def rotate(refresh_token, load_user):
+    """
+    Exchange a refresh token for a new pair. ``load_user(user_id)`` supplies
+    the current user row, so changed names or admin rights are picked up.
+    Returns ``(user, tokens)`` or raises ``AuthenticationFailed``.
+    """
+    # Another process may have just used this token
+    revocations.sync(force=True)
+    payload = decode_token(refresh_token, REFRESH)
+    user = load_user(payload['user_id'])
+    if not user:
+        raise AuthenticationFailed('User not found')
+    if not revocations.revoke(payload):
+        raise AuthenticationFailed('Token has been revoked')
+    return user, issue_tokens(user)
@@ -4,15 +4,34 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from authentication.permissions import IsAuthenticated, IsAdmin
-from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserProfileSerializer, UserUpdateSerializer
+from rest_framework.exceptions import AuthenticationFailed
+from .serializers import (
+    UserRegistrationSerializer,
+    UserLoginSerializer,
+    TokenRefreshSerializer,
+    LogoutSerializer,
+    UserProfileSerializer,
+    UserUpdateSerializer,
+)
 from .models import UserManager
-import hashlib
-import jwt
-import datetime
-from django.conf import settings
+from .middleware import parse_bearer_token
+from .passwords import PasswordHashBusy, check_password
+from .tokens import ACCESS, REFRESH, decode_token, issue_tokens, revocations, rotate
 
 # Create your views here.
 
+def _session_response(user, tokens=None):
+    """The body login, register and refresh return: the user and a new token pair"""
+    return {
+        'user': {
+            'user_id': user['user_id'], 
+            'name': user['name'], 
+            'email': user['email'], 
+            'is_admin': user['is_admin']
+        },
+        **(tokens or issue_tokens(user)),
+    }
+
 class RegisterView(APIView):
     permission_classes = [AllowAny]
     
@@ -25,33 +44,21 @@ class RegisterView(APIView):
                 return Response({'error': 'User with this email already exists'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Create user
-            user_id = UserManager.create_user(
-                name=serializer.validated_data['name'],
-                email=serializer.validated_data['email'],
-                password=serializer.validated_data['password'],
-                is_admin=serializer.validated_data.get('is_admin', False)
-            )
+            try:
+                user_id = UserManager.create_user(
+                    name=serializer.validated_data['name'],
+                    email=serializer.validated_data['email'],
+                    password=serializer.validated_data['password'],
+                    is_admin=serializer.validated_data.get('is_admin', False)
+                )
+            except PasswordHashBusy:
+                return Response({'error': 'Too many sign-ups in progress, please retry'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
             
             # Get the created user
             user = UserManager.get_user_by_id(user_id)
             
-            # Generate JWT token
-            token = jwt.encode({
-                'user_id': user_id,
-                'email': serializer.validated_data['email'],
-                'is_admin': user['is_admin'],
-                'exp': datetime.datetime.utcnow() + datetime.timedelta(days=1)
-            }, settings.SECRET_KEY, algorithm='HS256')
-            
-            return Response({
-                'user': {
-                    'user_id': user['user_id'], 
-                    'name': user['name'], 
-                    'email': user['email'], 
-                    'is_admin': user['is_admin']
-                },
-                'token': token
-            }, status=status.HTTP_201_CREATED)
+            return Response(_session_response(user), status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -62,34 +69,67 @@ class LoginView(APIView):
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
             user = UserManager.get_user_by_email(serializer.validated_data['email'])
-            if not user:
-                return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+            password = serializer.validated_data['password']
             
-            # Verify password
-            hashed_password = hashlib.sha256(serializer.validated_data['password'].encode()).hexdigest()
-            if user['password'] != hashed_password:
+            # Verify password; unknown emails are checked against a dummy hash so they take as long
+            try:
+                valid, new_hash = check_password(password, user['password'] if user else None)
+            except PasswordHashBusy:
+                return Response({'error': 'Too many login attempts in progress, please retry'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+            if not valid:
                 return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
             
-            # Generate JWT token
-            token = jwt.encode({
-                'user_id': user['user_id'],
-                'email': user['email'],
-                'is_admin': user['is_admin'],
-                'exp': datetime.datetime.utcnow() + datetime.timedelta(days=1)
-            }, settings.SECRET_KEY, algorithm='HS256')
+            # Legacy SHA-256 hashes and ones made at an old cost are upgraded while we have the password
+            if new_hash:
+                UserManager.replace_password_hash(user['user_id'], user['password'], new_hash)
             
-            return Response({
-                'user': {
-                    'user_id': user['user_id'], 
-                    'name': user['name'], 
-                    'email': user['email'], 
-                    'is_admin': user['is_admin']
-                },
-                'token': token
-            }, status=status.HTTP_200_OK)
+            return Response(_session_response(user), status=status.HTTP_200_OK)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class TokenRefreshView(APIView):
+    permission_classes = [AllowAny]
+    # The access token is usually expired by now; don't let DRF reject the request for it
+    authentication_classes = []
+    
+    def post(self, request):
+        serializer = TokenRefreshSerializer(data=request.data)
+        if serializer.is_valid():
+            try:
+                user, tokens = rotate(serializer.validated_data['refresh_token'], UserManager.get_user_by_id)
+            except AuthenticationFailed as e:
+                return Response({'error': str(e.detail)}, status=status.HTTP_401_UNAUTHORIZED)
+            
+            return Response(_session_response(user, tokens), status=status.HTTP_200_OK)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class LogoutView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    
+    def post(self, request):
+        """Revoke the refresh token in the body and the access token in the header, whichever are still valid"""
+        serializer = LogoutSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        tokens = [(serializer.validated_data.get('refresh_token'), REFRESH),
+                  (parse_bearer_token(request.META.get('HTTP_AUTHORIZATION', '')), ACCESS)]
+        for token, token_type in tokens:
+            if not token:
+                continue
+            try:
+                payload = decode_token(token, token_type)
+            except AuthenticationFailed:
+                continue
+            # Tokens from before refresh tokens have no id to revoke; they expire within a day
+            if 'jti' in payload:
+                revocations.revoke(payload)
+        
+        return Response({'message': 'Logged out'}, status=status.HTTP_200_OK)
+
 class ProfileView(APIView):
     permission_classes = [IsAuthenticated]
     
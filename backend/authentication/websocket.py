@@ -0,0 +1,33 @@
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from .middleware import get_user_for_token
+import logging
+
+# Get logger for this module
+logger = logging.getLogger('channels')
+
+
+class AnonymousWebSocketUser:
+    is_authenticated = False
+    is_admin = False
+
+
+class JWTWebSocketMiddleware(BaseMiddleware):
+    """
+    Channels middleware that authenticates WebSocket connections with the same
+    JWT used by the REST API. Browsers can't set headers on a WebSocket, so the
+    token is read from the ``token`` query string parameter.
+    """
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        token = query.get('token', [None])[0]
+        
+        user = None
+        if token:
+            user = await database_sync_to_async(get_user_for_token)(token)
+            if user is None:
+                logger.info(f"Rejected WebSocket token for {scope.get('path')}")
+        
+        scope['user'] = user or AnonymousWebSocketUser()
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""
+Concurrent-connection capacity of the polling and feed endpoints.
+
+Opens ``--levels`` worth of simultaneous keep-alive connections, one client
+each, and has every client poll chat history and the post feeds back to back
+for ``--duration`` seconds per level. Reports throughput, p50/p99 latency and
+failed requests at each level, which shows where the server stops keeping up.
+
+Run it once against a server started with ASYNC_VIEWS=1 and once with
+ASYNC_VIEWS=0 (same --label convention as workload.py), then pass the first
+result to ``--compare``:
+
+    ASYNC_VIEWS=0 python manage.py runserver   # then: python benchmarks/concurrency.py --label sync
+    ASYNC_VIEWS=1 python manage.py runserver   # then: python benchmarks/concurrency.py --label async --compare benchmarks/results/<sync run>.json
+
+Usage: python benchmarks/concurrency.py --url http://localhost:8000 --levels 16,64,256 --duration 15
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import time
+import urllib.parse
+
+from workload import BENCH_EMAIL, BENCH_PASSWORD, RESULTS_DIR, Session, current_commit, percentile
+
+ENDPOINTS = ('chat', 'feed', 'enrolled')
+
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection, reopened whenever the server drops it"""
+    def __init__(self, host, port, timeout):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._reader = self._writer = None
+
+    async def get(self, path, token):
+        """GET ``path`` and return the status code, or 0 when the request failed"""
+        try:
+            return await asyncio.wait_for(self._get(path, token), self.timeout)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            await self.close()
+            return 0
+
+    async def _get(self, path, token):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._writer.write((
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}\r\nAuthorization: Bearer {token}\r\n"
+            f"Accept: application/json\r\nConnection: keep-alive\r\n\r\n"
+        ).encode())
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self._reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await self._reader.readline()).split(b';')[0], 16)
+                await self._reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in headers:
+            await self._reader.readexactly(int(headers['content-length']))
+        else:
+            await self._reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return status
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except OSError:
+                pass
+        self._reader = self._writer = None
+
+
+def paths_for(session, endpoints):
+    paths = []
+    if 'chat' in endpoints:
+        # Chat history the way StudyGroups.jsx polls it
+        paths += [f"/api/chat/{group_id}/messages/?since=0&limit=50" for group_id in session.group_ids]
+    if 'feed' in endpoints:
+        paths.append('/api/posts/?limit=20')
+    if 'enrolled' in endpoints:
+        paths.append('/api/posts/enrolled/?limit=20')
+    return paths
+
+
+async def run_client(host, port, timeout, token, paths, deadline, rng, samples):
+    connection = Connection(host, port, timeout)
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status = await connection.get(rng.choice(paths), token)
+            samples.append((time.perf_counter() - started, status))
+    finally:
+        await connection.close()
+
+
+async def run_level(url, clients, level, duration, timeout, seed):
+    parsed = urllib.parse.urlsplit(url)
+    host, port = parsed.hostname, parsed.port or 80
+    samples = []
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        run_client(host, port, timeout, *clients[n % len(clients)], deadline, random.Random(seed + n), samples)
+        for n in range(level)
+    ))
+    return samples, time.perf_counter() - started
+
+
+def summarise(samples, elapsed):
+    latencies = sorted(latency for latency, status in samples if 200 <= status < 400)
+    errors = sum(1 for _, status in samples if not 200 <= status < 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+def print_level(level, stats, before=None):
+    line = (f"{level:>11} {stats['requests']:>8} {stats['errors']:>6} {stats['throughput_rps']:>9.1f} "
+            f"{stats['p50_ms'] or 0:>9.2f} {stats['p99_ms'] or 0:>9.2f}")
+    if before and before.get('throughput_rps') and before.get('p99_ms') and stats['p99_ms']:
+        line += (f"   rps {(stats['throughput_rps'] - before['throughput_rps']) / before['throughput_rps'] * 100:+6.1f}%"
+                 f"  p99 {(stats['p99_ms'] - before['p99_ms']) / before['p99_ms'] * 100:+6.1f}%")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--users', type=int, default=20, help='bench users to log in as')
+    parser.add_argument('--levels', default='16,64,256', help='comma-separated connection counts')
+    parser.add_argument('--duration', type=float, default=15, help='seconds per level')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds before a request counts as failed')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help=f"any of {', '.join(ENDPOINTS)}")
+    parser.add_argument('--label', default='', help='free-form note stored with the results, e.g. async or sync')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(',')]
+    endpoints = [name for name in args.endpoints.split(',') if name]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+
+    clients = []
+    for n in range(1, args.users + 1):
+        session = Session(args.url, BENCH_EMAIL.format(n), BENCH_PASSWORD)
+        status, body = session.request('GET', '/api/groups/')
+        if status == 200 and isinstance(body, list):
+            session.group_ids = [group['group_id'] for group in body]
+        paths = paths_for(session, endpoints)
+        if paths:
+            clients.append((session.token, paths))
+    if not clients:
+        parser.error('none of the bench users has anything to request; run benchmarks/seed.py first')
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} ({baseline.get('label') or 'no label'}, commit {baseline.get('commit')})")
+
+    print(f"{'connections':>11} {'reqs':>8} {'errs':>6} {'rps':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    results = {}
+    for level in levels:
+        samples, elapsed = asyncio.run(run_level(args.url, clients, level, args.duration, args.timeout, args.seed))
+        results[str(level)] = summarise(samples, elapsed)
+        before = baseline['levels'].get(str(level)) if baseline else None
+        print_level(level, results[str(level)], before)
+
+    if not args.no_save:
+        commit = current_commit()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        result = {
+            'benchmark': 'concurrency',
+            'commit': commit,
+            'label': args.label,
+            'timestamp': now.isoformat(),
+            'config': {key: value for key, value in vars(args).items() if key not in ('compare', 'no_save')},
+            'levels': results,
+        }
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{now:%Y%m%d-%H%M%S}-{commit or 'nocommit'}-concurrency.json")
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+Microbenchmark: login throughput at each password hashing cost.
+
+For every cost in ``--costs`` it stores a hash of the bench password, then has
+``--clients`` threads log in against it back to back for ``--duration``
+seconds, all through an ``authentication.passwords.HashPool`` of ``--workers``
+threads (the login path's pool). It reports the time one hash takes, logins
+per second, p50/p99 login latency and logins turned away because the queue was
+full. Meanwhile another thread keeps serializing a feed-sized JSON payload, and
+its p99 shows how much a login burst slows the rest of the server. No database
+is needed.
+
+Pick the highest cost whose throughput still covers the expected peak of
+logins per second per server, then set PASSWORD_HASH_COST to it.
+
+Usage: python benchmarks/passwords.py [--algorithm pbkdf2_sha256] [--costs 200000,600000,1000000] [--workers 2]
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+    django.setup()
+
+from authentication.passwords import DEFAULT_COSTS, HashPool, PasswordHashBusy, make_hash, verify_hash
+from workload import BENCH_PASSWORD, percentile
+
+DEFAULT_COST_LEVELS = {
+    'pbkdf2_sha256': '200000,600000,1000000',
+    'scrypt': '8192,16384,32768',
+}
+
+PROBE_PAYLOAD = [
+    {'post_id': n, 'content': f"Looking for a study partner, post {n}", 'author': f"Student {n % 97}",
+     'comment_count': n % 7}
+    for n in range(200)
+]
+
+
+def run_probe(stop, latencies):
+    """Stand-in for the other endpoints: a small CPU-bound job every few milliseconds"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        json.dumps(PROBE_PAYLOAD)
+        latencies.append(time.perf_counter() - started)
+        time.sleep(0.005)
+
+
+def run_client(hash_pool, encoded, deadline, latencies, rejected):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            hash_pool.run(verify_hash, BENCH_PASSWORD, encoded)
+        except PasswordHashBusy:
+            rejected.append(1)
+            time.sleep(0.01)
+            continue
+        latencies.append(time.perf_counter() - started)
+
+
+def run_level(hash_pool, algorithm, cost, clients, duration):
+    encoded = make_hash(BENCH_PASSWORD, algorithm, cost)
+    started = time.perf_counter()
+    verify_hash(BENCH_PASSWORD, encoded)
+    single = time.perf_counter() - started
+
+    logins, rejected, probe = [], [], []
+    stop = threading.Event()
+    probe_thread = threading.Thread(target=run_probe, args=(stop, probe))
+    probe_thread.start()
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=run_client, args=(hash_pool, encoded, started + duration, logins, rejected))
+        for _ in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    probe_thread.join()
+
+    logins.sort()
+    probe.sort()
+    return {
+        'hash_ms': single * 1000,
+        'logins_per_s': len(logins) / elapsed,
+        'p50_ms': percentile(logins, 50) * 1000 if logins else 0,
+        'p99_ms': percentile(logins, 99) * 1000 if logins else 0,
+        'rejected': len(rejected),
+        'probe_p99_ms': percentile(probe, 99) * 1000 if probe else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--algorithm', choices=sorted(DEFAULT_COSTS), default='pbkdf2_sha256')
+    parser.add_argument('--costs', help='comma-separated costs (PBKDF2 iterations or scrypt N)')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help='hashing threads, as PASSWORD_HASH_WORKERS')
+    parser.add_argument('--queue', type=int, default=64, help='logins allowed to wait, as PASSWORD_HASH_QUEUE')
+    parser.add_argument('--clients', type=int, default=32, help='concurrent logins')
+    parser.add_argument('--duration', type=float, default=5, help='seconds per cost')
+    args = parser.parse_args()
+
+    costs = [int(cost) for cost in (args.costs or DEFAULT_COST_LEVELS[args.algorithm]).split(',')]
+    hash_pool = HashPool(args.workers, args.queue)
+
+    print(f"{args.algorithm}, {args.workers} worker(s), {args.clients} concurrent logins")
+    print(f"{'cost':>10} {'hash ms':>9} {'logins/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'rejected':>9} {'other p99 ms':>13}")
+    for cost in costs:
+        stats = run_level(hash_pool, args.algorithm, cost, args.clients, args.duration)
+        print(f"{cost:>10} {stats['hash_ms']:>9.1f} {stats['logins_per_s']:>9.1f} {stats['p50_ms']:>9.1f} "
+              f"{stats['p99_ms']:>9.1f} {stats['rejected']:>9} {stats['probe_p99_ms']:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
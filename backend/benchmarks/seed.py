@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+"""
+Bulk seeder for benchmark runs.
+
+Appends synthetic users, courses, enrollments, posts, comments, study groups and
+messages to the database configured in settings (create the schema with
+init_db.sql first). Rows are streamed through ``api.bulk_import.BulkImporter``
+with primary keys assigned up front, so nothing has to be read back.
+
+Activity is skewed like a real deployment: a few users, courses, posts and groups
+get most of the traffic, following a Zipf distribution with exponent ``--skew``
+(0 gives a uniform spread). Every seeded user can log in as
+``bench<n>@example.com`` with ``BENCH_PASSWORD``, which is what workload.py does.
+
+Usage: python benchmarks/seed.py --users 50000 --posts 1000000 --messages 2000000 --groups 5000
+"""
+import argparse
+import bisect
+import datetime
+import itertools
+import os
+import random
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'upeer_project.settings')
+
+import django
+django.setup()
+
+from django.db import connection
+from api.bulk_import import BulkImporter
+from authentication.passwords import make_hash
+from reconcile_counters import reconcile
+
+BENCH_PASSWORD = 'password123'
+BENCH_EMAIL = 'bench{}@example.com'
+
+WORDS = (
+    'algorithm', 'assignment', 'calculus', 'compiler', 'database', 'derivative',
+    'exam', 'final', 'graph', 'homework', 'integral', 'lab', 'lecture', 'matrix',
+    'midterm', 'notes', 'pointer', 'project', 'proof', 'quiz', 'recursion',
+    'review', 'session', 'sorting', 'study', 'theorem', 'tree', 'tutorial',
+)
+
+
+class ZipfChooser:
+    """Picks ids so that the n-th most popular one is chosen in proportion to 1 / n**skew"""
+    def __init__(self, ids, skew, rng):
+        self._ids = list(ids)
+        # Shuffle so popularity isn't tied to insertion order
+        rng.shuffle(self._ids)
+        self._cumulative = list(itertools.accumulate(1 / rank ** skew for rank in range(1, len(self._ids) + 1)))
+        self._rng = rng
+
+    def __call__(self):
+        point = self._rng.random() * self._cumulative[-1]
+        return self._ids[min(bisect.bisect(self._cumulative, point), len(self._ids) - 1)]
+
+
+def next_id(table, column):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+        return cursor.fetchone()[0] + 1
+
+
+def timestamp(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def sentence(rng, low=6, high=20):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def spread(start, end, count):
+    """Evenly spaced times from ``start`` to ``end`` so ids and dates grow together"""
+    step = (end - start) / max(count, 1)
+    return (start + step * i for i in range(count))
+
+
+def spread_at(start, end, count, index):
+    """The ``index``-th time produced by ``spread``, without keeping them all in memory"""
+    return start + (end - start) / max(count, 1) * index
+
+
+def seed(args, importer):
+    rng = random.Random(args.seed)
+    end = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    start = end - datetime.timedelta(days=args.days)
+    # One hash shared by every bench user; hashing each at login cost would take hours
+    password = make_hash(BENCH_PASSWORD)
+
+    def load(table, columns, rows):
+        print(importer.load_rows(table, columns, rows))
+
+    first_user = next_id('users', 'user_id')
+    user_ids = range(first_user, first_user + args.users)
+    load('users', ('user_id', 'name', 'email', 'password', 'is_admin'), (
+        (user_id, f"Bench User {n}", BENCH_EMAIL.format(n), password, 0)
+        for n, user_id in enumerate(user_ids, start=1)
+    ))
+
+    first_course = next_id('courses', 'course_id')
+    course_ids = range(first_course, first_course + args.courses)
+    load('courses', ('course_id', 'course_name', 'description'), (
+        (course_id, f"BENCH {course_id}", sentence(rng)) for course_id in course_ids
+    ))
+
+    pick_user = ZipfChooser(user_ids, args.skew, rng)
+    pick_course = ZipfChooser(course_ids, args.skew, rng)
+
+    load('user_courses', ('user_id', 'course_id'), (
+        (user_id, course_id)
+        for user_id in user_ids
+        for course_id in {pick_course() for _ in range(args.enrollments)}
+    ))
+
+    first_post = next_id('posts', 'post_id')
+
+    def posts():
+        for post_id, created in zip(range(first_post, first_post + args.posts), spread(start, end, args.posts)):
+            # One post in ten isn't tied to a course
+            course_id = pick_course() if rng.random() > 0.1 else None
+            post_type = 'seeking' if rng.random() < 0.7 else 'offering'
+            yield (post_id, pick_user(), course_id, sentence(rng), post_type, timestamp(created))
+
+    load('posts', ('post_id', 'user_id', 'course_id', 'content', 'post_type', 'date_created'), posts())
+
+    def comments():
+        pick_post = ZipfChooser(range(first_post, first_post + args.posts), args.skew, rng)
+        last_comment = {}
+        comment_id = next_id('comments', 'comment_id')
+        for _ in range(args.comments):
+            post_id = pick_post()
+            if post_id in last_comment:
+                created = last_comment[post_id][1]
+            else:
+                created = spread_at(start, end, args.posts, post_id - first_post)
+            created = min(created + datetime.timedelta(minutes=rng.randint(1, 600)), end)
+            # About a third of comments reply to the previous comment on the post
+            parent_id = None
+            if post_id in last_comment and rng.random() < 0.35:
+                parent_id = last_comment[post_id][0]
+            yield (comment_id, post_id, pick_user(), sentence(rng, 3, 12), timestamp(created), parent_id)
+            last_comment[post_id] = (comment_id, created)
+            comment_id += 1
+
+    if args.comments and args.posts:
+        load('comments', ('comment_id', 'post_id', 'user_id', 'content', 'date_created', 'parent_id'), comments())
+
+    first_group = next_id('study_groups', 'group_id')
+    group_ids = range(first_group, first_group + args.groups)
+    load('study_groups', ('group_id', 'title', 'date_created'), (
+        (group_id, f"Bench Group {group_id}", timestamp(created))
+        for group_id, created in zip(group_ids, spread(start, start + (end - start) / 2, args.groups))
+    ))
+
+    members = {}
+
+    def group_members():
+        for group_id in group_ids:
+            members[group_id] = sorted({pick_user() for _ in range(rng.randint(2, args.group_size))})
+            for user_id in members[group_id]:
+                yield (group_id, user_id)
+
+    load('study_group_members', ('group_id', 'user_id'), group_members())
+
+    def messages():
+        pick_group = ZipfChooser(group_ids, args.skew, rng)
+        first_message = next_id('messages', 'message_id')
+        message_ids = range(first_message, first_message + args.messages)
+        for message_id, sent in zip(message_ids, spread(start + (end - start) / 2, end, args.messages)):
+            group_id = pick_group()
+            yield (message_id, group_id, rng.choice(members[group_id]), sentence(rng, 2, 15), timestamp(sent))
+
+    if args.messages and args.groups:
+        load('messages', ('message_id', 'group_id', 'user_id', 'content', 'timestamp'), messages())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--courses', type=int, default=200)
+    parser.add_argument('--enrollments', type=int, default=4, help='courses tried per user')
+    parser.add_argument('--posts', type=int, default=100000)
+    parser.add_argument('--comments', type=int, default=200000)
+    parser.add_argument('--groups', type=int, default=2000)
+    parser.add_argument('--group-size', type=int, default=8, help='largest group seeded')
+    parser.add_argument('--messages', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=365, help='history the dates are spread over')
+    parser.add_argument('--skew', type=float, default=1.1, help='Zipf exponent; 0 is uniform')
+    parser.add_argument('--chunk', type=int, default=1000, help='rows per INSERT statement')
+    parser.add_argument('--transaction-rows', type=int, default=50000, help='rows per transaction')
+    parser.add_argument('--method', choices=('insert', 'load-data'), default='insert',
+                        help="multi-row INSERTs, or MySQL's LOAD DATA LOCAL INFILE")
+    parser.add_argument('--seed', type=int, default=42, help='random seed, for repeatable datasets')
+    args = parser.parse_args()
+    if args.users < 1 or args.courses < 1:
+        parser.error('--users and --courses must be at least 1')
+
+    started = time.perf_counter()
+    # Rows are generated parents first, so foreign-key checks only slow the load down
+    with BulkImporter(args.method, args.chunk, args.transaction_rows) as importer:
+        seed(args, importer)
+    # Seeded rows bypass the managers, so fill in the counters and feed inboxes
+    posts_fixed, groups_fixed, inbox_fixed = reconcile()
+    print(f"{'counters':>24}: {posts_fixed:,} posts, {groups_fixed:,} groups")
+    print(f"{'feed inbox':>24}: {inbox_fixed:,} rows")
+    print(f"{'total':>24}: {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
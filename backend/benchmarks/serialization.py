@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Microbenchmark: building and serializing a post feed page.
+
+Compares the old path (hand-built dicts from tuples, then a DRF ``Serializer``
+with ``many=True``) against ``api.rows.fetch_dicts`` plus ``api.serialization.FastSerializer``.
+No database is needed; rows come from an in-memory stand-in cursor.
+
+Usage: python benchmarks/serialization.py [--rows 500] [--repeat 20]
+"""
+import argparse
+import datetime
+import os
+import sys
+import timeit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import django
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure(
+        USE_TZ=True,
+        TIME_ZONE='UTC',
+        INSTALLED_APPS=['rest_framework'],
+    )
+    django.setup()
+
+from api.rows import fetch_dicts
+from api.serialization import FastSerializer
+from posts.serializers import PostSerializer
+
+COLUMNS = ('post_id', 'content', 'date_created', 'post_type', 'author', 'course_name',
+           'comment_count', 'group_member_count')
+
+
+class StandInCursor:
+    """Replays a fixed result set the way a DB-API cursor would"""
+    def __init__(self, rows):
+        self.description = [(name, None, None, None, None, None, None) for name in COLUMNS]
+        self._rows = rows
+
+    def fetchall(self):
+        return list(self._rows)
+
+
+def make_rows(count):
+    start = datetime.datetime(2025, 1, 1, 12, 0, 0)
+    return [
+        (
+            post_id,
+            f"Looking for a study partner for the midterm, post number {post_id}",
+            start + datetime.timedelta(minutes=post_id),
+            'seeking' if post_id % 2 else 'offering',
+            f"Student {post_id % 97}",
+            None if post_id % 5 == 0 else f"CPSC {300 + post_id % 50}",
+            post_id % 7,
+            None if post_id % 3 else post_id % 9 + 2,
+        )
+        for post_id in range(1, count + 1)
+    ]
+
+
+def old_path(rows):
+    cursor = StandInCursor(rows)
+    posts = []
+    for row in cursor.fetchall():
+        posts.append({
+            'post_id': row[0],
+            'content': row[1],
+            'date_created': row[2],
+            'post_type': row[3],
+            'author': row[4],
+            'course_name': row[5],
+            'comment_count': row[6],
+            'group_member_count': row[7]
+        })
+    return PostSerializer(posts, many=True).data
+
+
+fast_serializer = FastSerializer(PostSerializer)
+
+
+def new_path(rows):
+    return fast_serializer.many(fetch_dicts(StandInCursor(rows)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--rows', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    assert [dict(item) for item in old_path(rows)] == new_path(rows), "fast path output differs"
+
+    results = {}
+    for name, func in (('DRF Serializer', old_path), ('FastSerializer', new_path)):
+        timings = timeit.repeat(lambda: func(rows), number=1, repeat=args.repeat)
+        results[name] = min(timings)
+        print(f"{name:>16}: {results[name] * 1000:8.2f} ms / {args.rows} rows "
+              f"({args.rows / results[name]:,.0f} rows/s)")
+    print(f"{'speedup':>16}: {results['DRF Serializer'] / results['FastSerializer']:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+"""
+Scripted REST workload for a running server.
+
+Logs in as the users created by seed.py. Then, from ``--concurrency`` threads,
+it replays a weighted mix of the endpoints students hit most (post feeds,
+search, course lists, group lists and chat history) for ``--duration`` seconds.
+It reports p50/p99 latency and throughput per endpoint.
+
+Each run is saved as JSON under benchmarks/results/, tagged with the current
+commit. Pass ``--compare`` with an earlier result file to print the change.
+
+Usage: python benchmarks/workload.py --url http://localhost:8000 --duration 30 --concurrency 8
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+BENCH_PASSWORD = 'password123'
+BENCH_EMAIL = 'bench{}@example.com'
+SEARCH_TERMS = ('midterm', 'recursion', 'database proof', 'calculus review', 'graph tree')
+
+
+class Session:
+    """One logged-in bench user and what the workload has learned about them"""
+    def __init__(self, base_url, email, password):
+        self.base_url = base_url.rstrip('/')
+        self.token = None
+        self.group_ids = []
+        self.feed_cursor = None
+        status, body = self.request('POST', '/api/auth/login/', {'email': email, 'password': password})
+        if status != 200:
+            raise RuntimeError(f"Login failed for {email} ({status}); run benchmarks/seed.py first")
+        self.token = body['token']
+
+    def request(self, method, path, data=None):
+        headers = {'Accept': 'application/json'}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        payload = None
+        if data is not None:
+            payload = json.dumps(data).encode()
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=payload, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                raw = response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            raw = e.read()
+            status = e.code
+        except (urllib.error.URLError, OSError):
+            # Refused or timed out; counted as an error with no status
+            return 0, None
+        try:
+            return status, json.loads(raw) if raw else None
+        except ValueError:
+            return status, None
+
+
+# Scenario functions return the path to GET and an optional callback for the parsed body
+def posts_feed(session, rng):
+    return '/api/posts/?limit=20', None
+
+
+def posts_feed_next_page(session, rng):
+    if session.feed_cursor is None:
+        path = '/api/posts/?limit=20'
+    else:
+        path = '/api/posts/?limit=20&cursor=' + urllib.parse.quote(session.feed_cursor)
+
+    def remember(body):
+        session.feed_cursor = (body or {}).get('next')
+    return path, remember
+
+
+def enrolled_posts(session, rng):
+    return '/api/posts/enrolled/?limit=20', None
+
+
+def search_posts(session, rng):
+    return '/api/posts/search/?q=' + urllib.parse.quote(rng.choice(SEARCH_TERMS)), None
+
+
+def courses(session, rng):
+    return '/api/courses/', None
+
+
+def my_courses(session, rng):
+    return '/api/courses/mine/', None
+
+
+def my_groups(session, rng):
+    def remember(body):
+        if isinstance(body, list):
+            session.group_ids = [group['group_id'] for group in body]
+    return '/api/groups/', remember
+
+
+def group_messages(session, rng):
+    if not session.group_ids:
+        return my_groups(session, rng)
+    return f"/api/chat/{rng.choice(session.group_ids)}/messages/?before=2147483647&limit=50", None
+
+
+SCENARIOS = {
+    'posts_feed': (posts_feed, 25),
+    'posts_feed_next_page': (posts_feed_next_page, 10),
+    'enrolled_posts': (enrolled_posts, 15),
+    'search_posts': (search_posts, 10),
+    'courses': (courses, 5),
+    'my_courses': (my_courses, 10),
+    'my_groups': (my_groups, 10),
+    'group_messages': (group_messages, 15),
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_worker(sessions, deadline, seed, samples, lock):
+    rng = random.Random(seed)
+    names = list(SCENARIOS)
+    weights = [SCENARIOS[name][1] for name in names]
+    local = defaultdict(list)
+    while time.perf_counter() < deadline:
+        session = rng.choice(sessions)
+        name = rng.choices(names, weights)[0]
+        path, callback = SCENARIOS[name][0](session, rng)
+        started = time.perf_counter()
+        status, body = session.request('GET', path)
+        elapsed = time.perf_counter() - started
+        local[name].append((elapsed, status))
+        if callback and status == 200:
+            callback(body)
+    with lock:
+        for name, values in local.items():
+            samples[name].extend(values)
+
+
+def summarise(samples, elapsed):
+    endpoints = {}
+    for name, values in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in values)
+        errors = sum(1 for _, status in values if not 200 <= status < 400)
+        endpoints[name] = {
+            'requests': len(values),
+            'errors': errors,
+            'throughput_rps': round(len(values) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+        }
+    all_latencies = sorted(latency for values in samples.values() for latency, _ in values)
+    total = {
+        'requests': len(all_latencies),
+        'errors': sum(endpoint['errors'] for endpoint in endpoints.values()),
+        'throughput_rps': round(len(all_latencies) / elapsed, 2),
+        'p50_ms': round(percentile(all_latencies, 50) * 1000, 2) if all_latencies else None,
+        'p99_ms': round(percentile(all_latencies, 99) * 1000, 2) if all_latencies else None,
+    }
+    return endpoints, total
+
+
+def print_report(endpoints, total, baseline=None):
+    print(f"{'endpoint':<22} {'reqs':>7} {'errs':>5} {'rps':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    rows = list(endpoints.items()) + [('TOTAL', total)]
+    for name, stats in rows:
+        line = (f"{name:<22} {stats['requests']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+                f"{stats['p50_ms'] or 0:>9.2f} {stats['p99_ms'] or 0:>9.2f}")
+        before = None
+        if baseline is not None:
+            before = baseline['total'] if name == 'TOTAL' else baseline['endpoints'].get(name)
+        if before and before.get('p50_ms') and before.get('p99_ms'):
+            line += (f"   p50 {_change(before['p50_ms'], stats['p50_ms'])}"
+                     f"  p99 {_change(before['p99_ms'], stats['p99_ms'])}")
+        print(line)
+
+
+def _change(before, after):
+    return f"{(after - before) / before * 100:+6.1f}%"
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://localhost:8000')
+    parser.add_argument('--users', type=int, default=20, help='bench users to log in as')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='seconds')
+    parser.add_argument('--label', default='', help='free-form note stored with the results')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    sessions = [Session(args.url, BENCH_EMAIL.format(n), BENCH_PASSWORD) for n in range(1, args.users + 1)]
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        workers = [
+            pool.submit(run_worker, sessions, deadline, args.seed + worker, samples, lock)
+            for worker in range(args.concurrency)
+        ]
+        for worker in workers:
+            worker.result()
+    elapsed = time.perf_counter() - started
+
+    endpoints, total = summarise(samples, elapsed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with {args.compare} (commit {baseline.get('commit')})")
+    print_report(endpoints, total, baseline)
+
+    if not args.no_save:
+        commit = current_commit()
+        now = datetime.datetime.now(datetime.timezone.utc)
+        result = {
+            'commit': commit,
+            'label': args.label,
+            'timestamp': now.isoformat(),
+            'config': {key: value for key, value in vars(args).items() if key not in ('compare', 'no_save')},
+            'endpoints': endpoints,
+            'total': total,
+        }
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{now:%Y%m%d-%H%M%S}-{commit or 'nocommit'}.json")
+        with open(path, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from .serializers import MessageSerializer
+import logging
+
+# Get logger for this module
+logger = logging.getLogger('channels')
+
+
+def group_channel_name(group_id):
+    """Name of the channel layer group every socket for a study group joins"""
+    return f"chat_{group_id}"
+
+
+def broadcast_message(message):
+    """Push a saved message (as returned by ``get_message_by_id``) to connected members"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None or message is None:
+        return
+    
+    try:
+        async_to_sync(channel_layer.group_send)(
+            group_channel_name(message['group_id']),
+            {
+                'type': 'chat.message',
+                'message': MessageSerializer(message).data,
+            }
+        )
+    except Exception as e:
+        # Delivery is best effort; clients still catch up through ?since=
+        logger.exception(f"Failed to broadcast message {message.get('message_id')}: {str(e)}")
@@ -0,0 +1,64 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from api import metrics
+from groups.models import GroupManager
+from .broadcast import group_channel_name
+from .models import MessageManager
+import logging
+
+# Get logger for this module
+logger = logging.getLogger('channels')
+
+# Close codes in the 4000-4999 range are reserved for applications
+CLOSE_UNAUTHENTICATED = 4001
+CLOSE_FORBIDDEN = 4003
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Real-time chat for one study group.
+
+    Members receive every message created through ``MessageManager.create_message``,
+    whether it was sent over this socket or through the REST endpoint.
+    """
+    async def connect(self):
+        self.group_id = int(self.scope['url_route']['kwargs']['group_id'])
+        self.group_name = group_channel_name(self.group_id)
+        user = self.scope.get('user')
+        
+        if not user or not user.is_authenticated:
+            await self.close(code=CLOSE_UNAUTHENTICATED)
+            return
+        
+        is_member = await database_sync_to_async(GroupManager.is_member)(self.group_id, user.user_id)
+        if not is_member:
+            await self.close(code=CLOSE_FORBIDDEN)
+            return
+        
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+        self.opened = True
+        metrics.chat_sockets.inc()
+        logger.debug(f"User {user.user_id} connected to chat group {self.group_id}")
+    
+    async def disconnect(self, code):
+        if getattr(self, 'opened', False):
+            metrics.chat_sockets.dec()
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+    
+    async def receive_json(self, content, **kwargs):
+        text = content.get('content') if isinstance(content, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            await self.send_json({'error': 'Message content is required'})
+            return
+        
+        # The manager broadcasts the saved message to the group, including this socket
+        message_id = await database_sync_to_async(MessageManager.create_message)(
+            self.group_id, self.scope['user'].user_id, text.strip()
+        )
+        if not message_id:
+            await self.send_json({'error': 'Failed to create message'})
+    
+    async def chat_message(self, event):
+        await self.send_json(event['message'])
@@ -0,0 +1,65 @@
+"""
+Streaming export of a group's chat history as NDJSON or CSV.
+
+Messages are read from ``MessageManager.iter_group_history`` one batch at a
+time and each batch is encoded into a single chunk of the response, so a
+request holds one batch in memory however long the history is.
+"""
+import csv
+import io
+import json
+from api.serialization import FastSerializer
+from .serializers import MessageExportSerializer
+
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+export_serializer = FastSerializer(MessageExportSerializer)
+
+
+class ExportEncoder:
+    """Turns batches of message rows into chunks of an export file"""
+    def __init__(self, export_format):
+        if export_format not in EXPORT_CONTENT_TYPES:
+            raise ValueError(f"Unsupported export format {export_format!r}")
+        self.export_format = export_format
+        self.names = [name for name, _, _ in export_serializer.fields]
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def header(self):
+        if self.export_format == 'csv':
+            return self._csv_rows([self.names])
+        return ''
+
+    def encode(self, rows):
+        items = export_serializer.many(rows)
+        if self.export_format == 'ndjson':
+            return ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in items)
+        return self._csv_rows([item[name] for name in self.names] for item in items)
+
+    def _csv_rows(self, rows):
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._writer.writerows(rows)
+        return self._buffer.getvalue()
+
+
+def stream_export(batches, export_format):
+    encoder = ExportEncoder(export_format)
+    header = encoder.header()
+    if header:
+        yield header
+    for rows in batches:
+        yield encoder.encode(rows)
+
+
+async def astream_export(batches, export_format):
+    encoder = ExportEncoder(export_format)
+    header = encoder.header()
+    if header:
+        yield header
+    async for rows in batches:
+        yield encoder.encode(rows)
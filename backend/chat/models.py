@@ -1,15 +1,102 @@
 from django.db import models
-from django.db import connection
+from django.db import connection, transaction
+from api.archive import archive_in_batches, copy_rows, leading_ids
+from api.async_db import async_db
+from api.routing import read_connection
+from api.rows import fetch_dict, fetch_dicts
+from api.schema import schema
+from .broadcast import broadcast_message
 
 # Create your models here.
 
+# Messages per query when walking a group's whole history
+HISTORY_BATCH_SIZE = 1000
+
+_LATEST_MESSAGE_QUERY = "SELECT MAX(message_id) FROM messages WHERE group_id = %s"
+
+def _group_messages_query(group_id, since, before, limit, table='messages'):
+    """SQL and params for ``get_group_messages``, and whether rows come back newest first"""
+    params = [group_id]
+    conditions = ["m.group_id = %s"]
+    
+    if since is not None:
+        conditions.append("m.message_id > %s")
+        params.append(since)
+        
+    if before is not None:
+        conditions.append("m.message_id < %s")
+        params.append(before)
+        
+    where_clause = " AND ".join(conditions)
+    
+    # Paging backwards through history walks the index in reverse
+    newest_first = before is not None and since is None and limit is not None
+    order = "DESC" if newest_first else "ASC"
+    limit_clause = ""
+    if limit is not None:
+        limit_clause = "LIMIT %s"
+        params.append(limit)
+    
+    query = f"""
+        SELECT m.message_id, m.content, m.timestamp, u.name AS sender
+        FROM {table} m
+        JOIN users u ON m.user_id = u.user_id
+        WHERE {where_clause}
+        ORDER BY m.message_id {order}
+        {limit_clause}
+    """
+    return query, params, newest_first
+
+def _history_tables():
+    # Archived messages are all older than the live ones
+    if schema.has_table('messages_archive'):
+        return ('messages_archive', 'messages')
+    return ('messages',)
+
+def _history_batch_query(table, group_id, after, batch_size):
+    # One (group_id, message_id) index range per batch, so no cursor stays open between batches
+    query = f"""
+        SELECT m.message_id, m.user_id, m.content, m.timestamp, u.name AS sender
+        FROM {table} m
+        JOIN users u ON m.user_id = u.user_id
+        WHERE m.group_id = %s AND m.message_id > %s
+        ORDER BY m.message_id
+        LIMIT %s
+    """
+    return query, [group_id, after, batch_size]
+
+def _archive_remainder(group_id, messages, before, limit, newest_first):
+    """
+    Query for the rest of a backwards page from ``messages_archive``, or None
+    when the hot table filled it (or there is no archive)
+    """
+    if not newest_first or len(messages) >= limit or not schema.has_table('messages_archive'):
+        return None
+    oldest = messages[-1]['message_id'] if messages else before
+    query, params, _ = _group_messages_query(group_id, None, oldest, limit - len(messages), table='messages_archive')
+    return query, params
+
 class MessageManager:
     @staticmethod
     def create_message(group_id, user_id, content):
         with connection.cursor() as cursor:
             query = "INSERT INTO messages (group_id, user_id, content) VALUES (%s, %s, %s)"
             cursor.execute(query, [group_id, user_id, content])
-            return cursor.lastrowid
+            message_id = cursor.lastrowid
+            # The sender has read up to their own message, so it doesn't show as unread to them
+            if schema.has_column('study_group_members', 'last_read_message_id'):
+                cursor.execute(
+                    "UPDATE study_group_members SET last_read_message_id = %s WHERE group_id = %s AND user_id = %s",
+                    [message_id, group_id, user_id]
+                )
+        
+        # Push to WebSocket subscribers once the row is visible to other connections
+        transaction.on_commit(lambda: MessageManager.broadcast(message_id))
+        return message_id
+    
+    @staticmethod
+    def broadcast(message_id):
+        broadcast_message(MessageManager.get_message_by_id(message_id))
     
     @staticmethod
     def get_message_by_id(message_id):
@@ -21,35 +108,99 @@ class MessageManager:
                 WHERE m.message_id = %s
             """
             cursor.execute(query, [message_id])
+            return fetch_dict(cursor)
+    
+    @staticmethod
+    def get_group_messages(group_id, since=None, before=None, limit=None):
+        """
+        Get a group's messages in send order.
+
+        ``since`` returns only messages newer than that message_id, ``before``
+        returns the most recent messages older than it. ``limit`` caps the window
+        size; with ``before`` the newest ``limit`` messages of the window are kept,
+        continuing into ``messages_archive`` once the live table runs out.
+        """
+        query, params, newest_first = _group_messages_query(group_id, since, before, limit)
+        with read_connection().cursor() as cursor:
+            cursor.execute(query, params)
+            messages = fetch_dicts(cursor)
+            archive_query = _archive_remainder(group_id, messages, before, limit, newest_first)
+            if archive_query:
+                cursor.execute(*archive_query)
+                messages += fetch_dicts(cursor)
+        if newest_first:
+            messages.reverse()
+        return messages
+    
+    @staticmethod
+    async def aget_group_messages(group_id, since=None, before=None, limit=None):
+        """Async ``get_group_messages`` for the async chat view"""
+        await schema.aensure_probed()
+        query, params, newest_first = _group_messages_query(group_id, since, before, limit)
+        messages = await async_db.fetch_dicts(query, params)
+        archive_query = _archive_remainder(group_id, messages, before, limit, newest_first)
+        if archive_query:
+            messages += await async_db.fetch_dicts(*archive_query)
+        if newest_first:
+            messages.reverse()
+        return messages
+    
+    @staticmethod
+    def iter_group_history(group_id, batch_size=HISTORY_BATCH_SIZE):
+        """
+        Yield a group's whole history, archived messages included, in send
+        order as lists of at most ``batch_size`` messages. Only one batch is
+        held in memory at a time.
+        """
+        for table in _history_tables():
+            after = 0
+            while True:
+                with read_connection().cursor() as cursor:
+                    cursor.execute(*_history_batch_query(table, group_id, after, batch_size))
+                    batch = fetch_dicts(cursor)
+                if not batch:
+                    break
+                yield batch
+                after = batch[-1]['message_id']
+    
+    @staticmethod
+    async def aiter_group_history(group_id, batch_size=HISTORY_BATCH_SIZE):
+        """Async ``iter_group_history`` for responses streamed under ASGI"""
+        await schema.aensure_probed()
+        for table in _history_tables():
+            after = 0
+            while True:
+                batch = await async_db.fetch_dicts(*_history_batch_query(table, group_id, after, batch_size))
+                if not batch:
+                    break
+                yield batch
+                after = batch[-1]['message_id']
+    
+    @staticmethod
+    def archive_messages(sent_before, batch_size=1000, pause=0.0):
+        """
+        Move messages sent before ``sent_before`` into ``messages_archive`` in
+        batches. Returns the number of messages archived.
+        """
+        if not schema.has_table('messages_archive'):
+            return 0
+        
+        def move(cursor, message_ids, placeholders):
+            copy_rows(cursor, 'messages', 'messages_archive', f"message_id IN ({placeholders})", message_ids)
+            cursor.execute(f"DELETE FROM messages WHERE message_id IN ({placeholders})", message_ids)
+        
+        # Message ids grow with time, so the old messages are the ones at the start of the primary key
+        select_ids = leading_ids('messages', 'message_id', "timestamp < %s", [sent_before], batch_size)
+        return archive_in_batches(select_ids, move, pause)
+    
+    @staticmethod
+    def get_latest_message_id(group_id):
+        """Get the newest message_id in a group (0 if empty); an index-only lookup"""
+        with read_connection().cursor() as cursor:
+            cursor.execute(_LATEST_MESSAGE_QUERY, [group_id])
             row = cursor.fetchone()
-            if row:
-                return {
-                    'message_id': row[0],
-                    'group_id': row[1],
-                    'user_id': row[2],
-                    'content': row[3],
-                    'timestamp': row[4],
-                    'sender': row[5]
-                }
-            return None
-    
-    @staticmethod
-    def get_group_messages(group_id):
-        with connection.cursor() as cursor:
-            query = """
-                SELECT m.message_id, m.content, m.timestamp, u.name AS sender
-                FROM messages m
-                JOIN users u ON m.user_id = u.user_id
-                WHERE m.group_id = %s
-                ORDER BY m.timestamp ASC
-            """
-            cursor.execute(query, [group_id])
-            messages = []
-            for row in cursor.fetchall():
-                messages.append({
-                    'message_id': row[0],
-                    'content': row[1],
-                    'timestamp': row[2],
-                    'sender': row[3]
-                })
-            return messages
+            return row[0] or 0
+    
+    @staticmethod
+    async def aget_latest_message_id(group_id):
+        return await async_db.fetch_value(_LATEST_MESSAGE_QUERY, [group_id]) or 0
@@ -6,5 +6,8 @@ class MessageSerializer(serializers.Serializer):
     timestamp = serializers.DateTimeField(read_only=True)
     sender = serializers.CharField(read_only=True)
 
+class MessageExportSerializer(MessageSerializer):
+    user_id = serializers.IntegerField(read_only=True)
+
 class MessageCreateSerializer(serializers.Serializer):
     content = serializers.CharField() 
\ No newline at end of file
@@ -1,6 +1,11 @@
+from django.conf import settings
 from django.urls import path
-from .views import ChatMessageListView
+from .views import AsyncChatMessageListView, ChatExportView, ChatMessageListView
+
+# ASYNC_VIEWS picks the event-loop or thread-pool version of the polling endpoint
+message_list_view = AsyncChatMessageListView if settings.ASYNC_VIEWS else ChatMessageListView
 
 urlpatterns = [
-    path('<int:group_id>/messages/', ChatMessageListView.as_view(), name='chat-messages'),
-] 
\ No newline at end of file
+    path('<int:group_id>/messages/', message_list_view.as_view(), name='chat-messages'),
+    path('<int:group_id>/messages/export.<str:export_format>', ChatExportView.as_view(), name='chat-export'),
+]
@@ -1,14 +1,44 @@
+import hashlib
 from django.shortcuts import render
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.negotiation import BaseContentNegotiation
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
 from authentication.permissions import IsAuthenticated, IsAdmin
 from .serializers import MessageSerializer
 from .models import MessageManager
+from .export import EXPORT_CONTENT_TYPES, astream_export, stream_export
 from groups.models import GroupManager
+from api import metrics
+from api.serialization import FastSerializer
+from api.async_views import AsyncAPIView, json_response
+from api.pagination import InvalidCursor, parse_limit, DEFAULT_PAGE_SIZE
 
 # Create your views here.
 
+message_list_serializer = FastSerializer(MessageSerializer)
+
+def _message_id_param(query_params, name):
+    value = query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidCursor(f'{name} must be a message id')
+
+def _window_etag(group_id, latest_id, since, before, limit):
+    """
+    Validator for one window of a group's messages. Messages are append-only,
+    so the newest id identifies the group's state; the window parameters keep a
+    validator from one window from matching another.
+    """
+    window = f"{group_id}:{latest_id}:{since}:{before}:{limit}"
+    return quote_etag(hashlib.sha1(window.encode()).hexdigest()[:20])
+
 class ChatMessageListView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -21,10 +51,30 @@ class ChatMessageListView(APIView):
         # Verify user is a member of the group
         if not GroupManager.is_member(group_id, request.user.user_id):
             return Response({'error': 'You are not a member of this group'}, status=status.HTTP_403_FORBIDDEN)
+        metrics.chat_poll(request.user.user_id)
+        
+        try:
+            since = _message_id_param(request.query_params, 'since')
+            before = _message_id_param(request.query_params, 'before')
+            # History windows default to one page; deltas and full fetches are unbounded
+            default_limit = DEFAULT_PAGE_SIZE if before is not None else None
+            limit = parse_limit(request.query_params.get('limit'), default=default_limit)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        messages = MessageManager.get_group_messages(group_id)
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        latest_id = MessageManager.get_latest_message_id(group_id)
+        etag = _window_etag(group_id, latest_id, since, before, limit)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        if since is not None and since >= latest_id:
+            # Nothing newer than what the client already has
+            return Response([], status=status.HTTP_200_OK, headers=headers)
+        
+        messages = MessageManager.get_group_messages(group_id, since=since, before=before, limit=limit)
+        return Response(message_list_serializer.many(messages), status=status.HTTP_200_OK, headers=headers)
         
     def post(self, request, group_id):
         # Verify group exists
@@ -52,3 +102,72 @@ class ChatMessageListView(APIView):
         serializer = MessageSerializer(message)
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+class AsyncChatMessageListView(AsyncAPIView):
+    """``ChatMessageListView`` with the polling GET served on the event loop"""
+    sync_view = ChatMessageListView
+    
+    async def get(self, request, group_id):
+        group = await GroupManager.aget_group_by_id(group_id)
+        if not group:
+            return json_response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if not await GroupManager.ais_member(group_id, request.user.user_id):
+            return json_response({'error': 'You are not a member of this group'}, status=status.HTTP_403_FORBIDDEN)
+        metrics.chat_poll(request.user.user_id)
+        
+        try:
+            since = _message_id_param(request.GET, 'since')
+            before = _message_id_param(request.GET, 'before')
+            default_limit = DEFAULT_PAGE_SIZE if before is not None else None
+            limit = parse_limit(request.GET.get('limit'), default=default_limit)
+        except InvalidCursor as e:
+            return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        latest_id = await MessageManager.aget_latest_message_id(group_id)
+        etag = _window_etag(group_id, latest_id, since, before, limit)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return json_response(None, status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        if since is not None and since >= latest_id:
+            return json_response([], headers=headers)
+        
+        messages = await MessageManager.aget_group_messages(group_id, since=since, before=before, limit=limit)
+        return json_response(message_list_serializer.many(messages), headers=headers)
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """The export format comes from the URL, so errors render as JSON whatever ``Accept`` says"""
+    def select_parser(self, request, parsers):
+        return parsers[0]
+    
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+class ChatExportView(APIView):
+    permission_classes = [IsAuthenticated]
+    content_negotiation_class = ExportContentNegotiation
+    
+    def get(self, request, group_id, export_format):
+        """Stream a group's whole history, archived messages included, as NDJSON or CSV"""
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return Response({'error': f"Export format must be one of: {', '.join(EXPORT_CONTENT_TYPES)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        group = GroupManager.get_group_by_id(group_id)
+        if not group:
+            return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        if not GroupManager.is_member(group_id, request.user.user_id):
+            return Response({'error': 'You are not a member of this group'}, status=status.HTTP_403_FORBIDDEN)
+        
+        # Under ASGI a synchronous iterator would be read to the end before sending anything
+        if isinstance(request._request, ASGIRequest):
+            content = astream_export(MessageManager.aiter_group_history(group_id), export_format)
+        else:
+            content = stream_export(MessageManager.iter_group_history(group_id), export_format)
+        return StreamingHttpResponse(content, content_type=EXPORT_CONTENT_TYPES[export_format], headers={
+            'Content-Disposition': f'attachment; filename="group-{group_id}-messages.{export_format}"',
+            'Cache-Control': 'private, no-store',
+        })
@@ -1,74 +1,80 @@
 from django.db import models
-from django.db import connection
+from django.db import connection, transaction
+from api.async_db import async_db
+from api.routing import read_connection
+from api.response_cache import response_cache
+from api.rows import fetch_dict, fetch_dicts
+from posts import inbox
+
+# Response cache keys for the course lists; see CourseListView and UserCourseListView
+ALL_COURSES_KEY = 'courses:all'
+
+def user_courses_key(user_id):
+    return f'courses:user:{user_id}'
+
+def _invalidate_after_commit(*keys):
+    transaction.on_commit(lambda: response_cache.invalidate(*keys))
+
+_USER_COURSES_QUERY = """
+    SELECT c.course_id, c.course_name, c.description
+    FROM courses c 
+    JOIN user_courses uc ON c.course_id = uc.course_id 
+    WHERE uc.user_id = %s
+"""
 
 class CourseManager:
     @staticmethod
     def get_all_courses():
-        with connection.cursor() as cursor:
+        with read_connection().cursor() as cursor:
             query = "SELECT course_id, course_name, description FROM courses ORDER BY course_name"
             cursor.execute(query)
-            courses = []
-            for row in cursor.fetchall():
-                courses.append({
-                    'course_id': row[0],
-                    'course_name': row[1],
-                    'description': row[2]
-                })
-            return courses
+            return fetch_dicts(cursor)
     
     @staticmethod
     def get_course_by_id(course_id):
-        with connection.cursor() as cursor:
+        with read_connection().cursor() as cursor:
             query = "SELECT course_id, course_name, description FROM courses WHERE course_id = %s"
             cursor.execute(query, [course_id])
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'course_id': row[0],
-                    'course_name': row[1],
-                    'description': row[2]
-                }
-            return None
+            return fetch_dict(cursor)
     
     @staticmethod
     def create_course(course_name, description=None):
         with connection.cursor() as cursor:
             query = "INSERT INTO courses (course_name, description) VALUES (%s, %s)"
             cursor.execute(query, [course_name, description])
+            _invalidate_after_commit(ALL_COURSES_KEY)
             return cursor.lastrowid
     
     @staticmethod
     def enroll_user(user_id, course_id):
-        with connection.cursor() as cursor:
-            query = "INSERT INTO user_courses (user_id, course_id) VALUES (%s, %s)"
-            try:
+        query = "INSERT INTO user_courses (user_id, course_id) VALUES (%s, %s)"
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
                 cursor.execute(query, [user_id, course_id])
+                # The course's existing posts join the user's enrolled feed
+                inbox.add_course(cursor, user_id, course_id)
+                _invalidate_after_commit(user_courses_key(user_id))
                 return True
-            except:
-                return False
+        except:
+            return False
     
     @staticmethod
     def unenroll_user(user_id, course_id):
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             query = "DELETE FROM user_courses WHERE user_id = %s AND course_id = %s"
             cursor.execute(query, [user_id, course_id])
-            return cursor.rowcount > 0
+            if cursor.rowcount > 0:
+                inbox.remove_course(cursor, user_id, course_id)
+                _invalidate_after_commit(user_courses_key(user_id))
+                return True
+            return False
     
     @staticmethod
     def get_user_courses(user_id):
-        with connection.cursor() as cursor:
-            query = """
-                SELECT c.course_id, c.course_name, c.description
-                FROM courses c 
-                JOIN user_courses uc ON c.course_id = uc.course_id 
-                WHERE uc.user_id = %s
-            """
-            cursor.execute(query, [user_id])
-            courses = []
-            for row in cursor.fetchall():
-                courses.append({
-                    'course_id': row[0],
-                    'course_name': row[1],
-                    'description': row[2]
-                })
-            return courses
+        with read_connection().cursor() as cursor:
+            cursor.execute(_USER_COURSES_QUERY, [user_id])
+            return fetch_dicts(cursor)
+    
+    @staticmethod
+    async def aget_user_courses(user_id):
+        return await async_db.fetch_dicts(_USER_COURSES_QUERY, [user_id])
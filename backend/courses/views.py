@@ -4,7 +4,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from authentication.permissions import IsAuthenticated, IsAdmin
 from .serializers import CourseSerializer, CourseCreateSerializer, CourseEnrollSerializer
-from .models import CourseManager
+from .models import CourseManager, ALL_COURSES_KEY, user_courses_key
+from api.response_cache import response_cache
 
 # Create your views here.
 
@@ -12,9 +13,11 @@ class CourseListView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        courses = CourseManager.get_all_courses()
-        serializer = CourseSerializer(courses, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Courses only change when an admin creates one, so serve the cached list
+        return response_cache.respond(
+            request, ALL_COURSES_KEY,
+            lambda: CourseSerializer(CourseManager.get_all_courses(), many=True).data
+        )
     
     def post(self, request):
         # Only admin users can create courses
@@ -36,9 +39,11 @@ class UserCourseListView(APIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        courses = CourseManager.get_user_courses(request.user.user_id)
-        serializer = CourseSerializer(courses, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        user_id = request.user.user_id
+        return response_cache.respond(
+            request, user_courses_key(user_id),
+            lambda: CourseSerializer(CourseManager.get_user_courses(user_id), many=True).data
+        )
 
 class CourseEnrollView(APIView):
     permission_classes = [IsAuthenticated]
@@ -1,7 +1,8 @@
 #!/usr/bin/env python
 import os
 import mysql.connector
-import hashlib
+# verify_hash doesn't read settings, so this works without setting Django up
+from authentication.passwords import verify_hash
 
 # Database credentials - match docker-compose.yml
 DB_NAME = "myproject"
@@ -47,8 +48,7 @@ def check_users():
             
             # Check if password matches 'password123'
             test_password = "password123"
-            hashed = hashlib.sha256(test_password.encode()).hexdigest()
-            matches = hashed == user["password"]
+            matches = verify_hash(test_password, user["password"])
             print(f"Password 'password123' matches: {matches}")
             
         cursor.close()
@@ -1,5 +1,84 @@
 from django.db import models
-from django.db import connection
+from django.db import connection, transaction
+from django.db.utils import DatabaseError
+from api.sql import insert_ignore_sql, for_update_sql, update_in_id_batches
+from api.async_db import async_db
+from api.routing import read_connection
+from api.rows import fetch_dict, fetch_dicts
+from api.schema import schema
+
+def _member_count_column(alias):
+    # member_count arrives with add_counter_columns.sql
+    if schema.has_column('study_groups', 'member_count'):
+        return f"{alias}.member_count"
+    return "NULL"
+
+def _group_query():
+    return f"""
+        SELECT g.group_id, g.title, g.date_created, {_member_count_column('g')} AS member_count
+        FROM study_groups g WHERE g.group_id = %s
+    """
+
+# Characters of the last message shown in the inbox
+INBOX_PREVIEW_LENGTH = 200
+
+def _has_read_cursor():
+    # last_read_message_id arrives with add_read_cursors.sql
+    return schema.has_column('study_group_members', 'last_read_message_id')
+
+def _inbox_query():
+    if _has_read_cursor():
+        # Counted with the (group_id, message_id) index. Members start at the newest message
+        # when they join, so NULL means they joined before the group had any
+        read_cursor = """sgm.last_read_message_id,
+               (SELECT COUNT(*) FROM messages um
+                WHERE um.group_id = sgm.group_id AND um.message_id > COALESCE(sgm.last_read_message_id, 0)
+               ) AS unread_count"""
+    else:
+        read_cursor = "NULL AS last_read_message_id, NULL AS unread_count"
+    return f"""
+        SELECT sg.group_id, sg.title, sg.date_created, {_member_count_column('sg')} AS member_count,
+               {read_cursor},
+               m.message_id, m.user_id, u.name AS sender, SUBSTR(m.content, 1, %s) AS content, m.timestamp
+        FROM study_group_members sgm
+        JOIN study_groups sg ON sg.group_id = sgm.group_id
+        LEFT JOIN messages m ON m.message_id = (
+            SELECT MAX(lm.message_id) FROM messages lm WHERE lm.group_id = sgm.group_id
+        )
+        LEFT JOIN users u ON u.user_id = m.user_id
+        WHERE sgm.user_id = %s
+        ORDER BY m.message_id IS NULL, m.message_id DESC, sg.group_id DESC
+    """
+
+_LAST_MESSAGE_FIELDS = ('message_id', 'user_id', 'sender', 'content', 'timestamp')
+
+_IS_MEMBER_QUERY = "SELECT 1 FROM study_group_members WHERE group_id = %s AND user_id = %s"
+
+def _add_members(cursor, group_id, user_ids):
+    """
+    Add ``user_ids`` to the group in order, skipping existing members, and
+    return how many were added. New members start with the history read, so
+    joining an established group doesn't bring a wall of unread messages.
+    """
+    columns = ["group_id", "user_id"]
+    rows = [[group_id, user_id] for user_id in user_ids]
+    if _has_read_cursor():
+        cursor.execute("SELECT MAX(message_id) FROM messages WHERE group_id = %s", [group_id])
+        latest = cursor.fetchone()[0]
+        columns.append("last_read_message_id")
+        rows = [row + [latest] for row in rows]
+    cursor.execute(
+        insert_ignore_sql("study_group_members", columns, len(rows)),
+        [value for row in rows for value in row]
+    )
+    return cursor.rowcount
+
+def _bump_member_count(cursor, group_id, delta):
+    if delta and schema.has_column('study_groups', 'member_count'):
+        cursor.execute(
+            "UPDATE study_groups SET member_count = member_count + %s WHERE group_id = %s",
+            [delta, group_id]
+        )
 
 class GroupManager:
     @staticmethod
@@ -12,57 +91,160 @@ class GroupManager:
     
     @staticmethod
     def get_group_by_id(group_id):
-        with connection.cursor() as cursor:
-            query = "SELECT group_id, title, date_created FROM study_groups WHERE group_id = %s"
-            cursor.execute(query, [group_id])
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'group_id': row[0],
-                    'title': row[1],
-                    'date_created': row[2]
-                }
-            return None
+        with read_connection().cursor() as cursor:
+            cursor.execute(_group_query(), [group_id])
+            return fetch_dict(cursor)
+    
+    @staticmethod
+    async def aget_group_by_id(group_id):
+        await schema.aensure_probed()
+        return await async_db.fetch_dict(_group_query(), [group_id])
     
     @staticmethod
     def join_group(group_id, user_id):
-        with connection.cursor() as cursor:
-            query = "INSERT INTO study_group_members (group_id, user_id) VALUES (%s, %s)"
-            try:
-                cursor.execute(query, [group_id, user_id])
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                if _add_members(cursor, group_id, [user_id]) == 0:
+                    return False  # Already a member
+                _bump_member_count(cursor, group_id, 1)
                 return True
-            except:
-                return False
+        except DatabaseError:
+            return False
+    
+    @staticmethod
+    def ensure_group_for_post(post_id, user_id):
+        """
+        Get or create the study group for a post and make sure both the post's
+        author and ``user_id`` are members, in one transaction.
+
+        The post row is locked first, so concurrent joins queue up behind it;
+        the association is then read with a locking read, which sees groups
+        created by transactions that committed while this one waited. Returns
+        the group dict, or ``None`` if the post doesn't exist or was deleted.
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f"""
+                    SELECT p.user_id, c.course_name
+                    FROM posts p
+                    LEFT JOIN courses c ON p.course_id = c.course_id
+                    WHERE p.post_id = %s AND p.is_active = 1
+                    {for_update_sql(of='p')}
+                """, [post_id])
+                row = cursor.fetchone()
+                if not row:
+                    return None
+                post_creator_id, course_name = row
+                
+                # A plain read would reuse the snapshot taken before the post lock was granted
+                cursor.execute(f"""
+                    SELECT g.group_id, g.title, g.date_created, {_member_count_column('g')} AS member_count
+                    FROM post_group_associations pga
+                    JOIN study_groups g ON pga.group_id = g.group_id
+                    WHERE pga.post_id = %s
+                    {for_update_sql()}
+                """, [post_id])
+                group = fetch_dict(cursor)
+                if group is not None:
+                    group_id = group['group_id']
+                else:
+                    title = f"Study Group for {course_name}" if course_name else "Study Group"
+                    cursor.execute("INSERT INTO study_groups (title) VALUES (%s)", [title])
+                    group_id = cursor.lastrowid
+                    cursor.execute(
+                        "INSERT INTO post_group_associations (post_id, group_id) VALUES (%s, %s)",
+                        [post_id, group_id]
+                    )
+                
+                # Add the post creator first so they are listed as the earliest member
+                member_ids = [post_creator_id]
+                if user_id != post_creator_id:
+                    member_ids.append(user_id)
+                joined = _add_members(cursor, group_id, member_ids)
+                _bump_member_count(cursor, group_id, joined)
+                if group is not None and group['member_count'] is not None:
+                    group['member_count'] += joined
+        
+        if group is None:
+            group = GroupManager.get_group_by_id(group_id)
+        return group
     
     @staticmethod
     def leave_group(group_id, user_id):
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             query = "DELETE FROM study_group_members WHERE group_id = %s AND user_id = %s"
             cursor.execute(query, [group_id, user_id])
-            return cursor.rowcount > 0
+            left = cursor.rowcount
+            _bump_member_count(cursor, group_id, -left)
+            return left > 0
+    
+    @staticmethod
+    def reconcile_member_counts(batch_size=10000):
+        """Recompute ``member_count`` for every group; returns how many were wrong"""
+        if not schema.has_column('study_groups', 'member_count'):
+            return 0
+        members = "(SELECT COUNT(*) FROM study_group_members m WHERE m.group_id = study_groups.group_id)"
+        query = f"""
+            UPDATE study_groups SET member_count = {members}
+            WHERE group_id BETWEEN %s AND %s AND member_count <> {members}
+        """
+        return update_in_id_batches('study_groups', 'group_id', query, batch_size)
     
     @staticmethod
     def get_user_groups(user_id):
-        with connection.cursor() as cursor:
-            query = """
-                SELECT sg.group_id, sg.title, sg.date_created
+        with read_connection().cursor() as cursor:
+            query = f"""
+                SELECT sg.group_id, sg.title, sg.date_created, {_member_count_column('sg')} AS member_count
                 FROM study_groups sg
                 JOIN study_group_members sgm ON sg.group_id = sgm.group_id
                 WHERE sgm.user_id = %s
             """
             cursor.execute(query, [user_id])
-            groups = []
-            for row in cursor.fetchall():
-                groups.append({
-                    'group_id': row[0],
-                    'title': row[1],
-                    'date_created': row[2]
-                })
-            return groups
+            return fetch_dicts(cursor)
     
     @staticmethod
-    def get_group_members(group_id):
+    def get_user_inbox(user_id):
+        """
+        Every group ``user_id`` belongs to with its newest message (or ``None``)
+        and how many messages arrived after the user's read cursor, newest
+        conversation first. Archived messages count as read.
+        """
+        with read_connection().cursor() as cursor:
+            cursor.execute(_inbox_query(), [INBOX_PREVIEW_LENGTH, user_id])
+            groups = fetch_dicts(cursor)
+        for group in groups:
+            last_message = {field: group.pop(field) for field in _LAST_MESSAGE_FIELDS}
+            group['last_message'] = last_message if last_message['message_id'] is not None else None
+        return groups
+    
+    @staticmethod
+    def mark_read(group_id, user_id, message_id=None):
+        """
+        Move ``user_id``'s read cursor in ``group_id`` up to ``message_id``, or
+        to the newest message. It never moves back, nor past the newest
+        message. Returns the cursor, or ``None`` without ``add_read_cursors.sql``.
+        """
+        if not _has_read_cursor():
+            return None
         with connection.cursor() as cursor:
+            cursor.execute("SELECT MAX(message_id) FROM messages WHERE group_id = %s", [group_id])
+            latest = cursor.fetchone()[0] or 0
+            target = latest if message_id is None else min(message_id, latest)
+            cursor.execute("""
+                UPDATE study_group_members SET last_read_message_id = %s
+                WHERE group_id = %s AND user_id = %s
+                  AND (last_read_message_id IS NULL OR last_read_message_id < %s)
+            """, [target, group_id, user_id, target])
+            cursor.execute(
+                "SELECT last_read_message_id FROM study_group_members WHERE group_id = %s AND user_id = %s",
+                [group_id, user_id]
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+    
+    @staticmethod
+    def get_group_members(group_id):
+        with read_connection().cursor() as cursor:
             query = """
                 SELECT u.user_id, u.name, sgm.joined_at
                 FROM users u
@@ -71,21 +253,17 @@ class GroupManager:
                 ORDER BY sgm.joined_at
             """
             cursor.execute(query, [group_id])
-            members = []
-            for row in cursor.fetchall():
-                members.append({
-                    'user_id': row[0],
-                    'name': row[1],
-                    'joined_at': row[2]
-                })
-            return members
+            return fetch_dicts(cursor)
     
     @staticmethod
     def is_member(group_id, user_id):
-        with connection.cursor() as cursor:
-            query = "SELECT 1 FROM study_group_members WHERE group_id = %s AND user_id = %s"
-            cursor.execute(query, [group_id, user_id])
+        with read_connection().cursor() as cursor:
+            cursor.execute(_IS_MEMBER_QUERY, [group_id, user_id])
             return cursor.fetchone() is not None
+    
+    @staticmethod
+    async def ais_member(group_id, user_id):
+        return await async_db.fetch_value(_IS_MEMBER_QUERY, [group_id, user_id]) is not None
 
     @staticmethod
     def invite_by_email(group_id, email):
@@ -98,9 +276,6 @@ class GroupManager:
             cursor.execute(query, [email])
             user_row = cursor.fetchone()
             
-            # For debugging
-            print(f"Looking up user with email: {email}, found: {user_row is not None}")
-            
             if not user_row:
                 return {'success': False, 'message': 'User with this email not found'}
                 
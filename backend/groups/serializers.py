@@ -4,6 +4,22 @@ class GroupSerializer(serializers.Serializer):
     group_id = serializers.IntegerField(read_only=True)
     title = serializers.CharField()
     date_created = serializers.DateTimeField(read_only=True)
+    member_count = serializers.IntegerField(read_only=True, allow_null=True)
+
+class LastMessageSerializer(serializers.Serializer):
+    message_id = serializers.IntegerField(read_only=True)
+    user_id = serializers.IntegerField(read_only=True)
+    sender = serializers.CharField(read_only=True)
+    content = serializers.CharField(read_only=True)
+    timestamp = serializers.DateTimeField(read_only=True)
+
+class GroupInboxSerializer(GroupSerializer):
+    last_message = LastMessageSerializer(read_only=True, allow_null=True)
+    last_read_message_id = serializers.IntegerField(read_only=True, allow_null=True)
+    unread_count = serializers.IntegerField(read_only=True, allow_null=True)
+
+class GroupReadSerializer(serializers.Serializer):
+    message_id = serializers.IntegerField(required=False, min_value=1)
 
 class GroupCreateSerializer(serializers.Serializer):
     title = serializers.CharField(max_length=150)
@@ -1,10 +1,12 @@
 from django.urls import path
-from .views import GroupListView, GroupDetailView, GroupJoinView, GroupLeaveView, GroupInviteView
+from .views import GroupListView, GroupInboxView, GroupDetailView, GroupJoinView, GroupLeaveView, GroupReadView, GroupInviteView
 
 urlpatterns = [
     path('', GroupListView.as_view(), name='group-list'),
+    path('inbox/', GroupInboxView.as_view(), name='group-inbox'),
     path('<int:group_id>/', GroupDetailView.as_view(), name='group-detail'),
     path('join/', GroupJoinView.as_view(), name='group-join'),
     path('<int:group_id>/leave/', GroupLeaveView.as_view(), name='group-leave'),
+    path('<int:group_id>/read/', GroupReadView.as_view(), name='group-read'),
     path('<int:group_id>/invite/', GroupInviteView.as_view(), name='group-invite'),
 ] 
\ No newline at end of file
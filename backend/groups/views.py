@@ -3,8 +3,19 @@ from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from authentication.permissions import IsAuthenticated, IsAdmin
-from .serializers import GroupSerializer, GroupCreateSerializer, GroupMemberSerializer, GroupJoinSerializer, GroupInviteSerializer
+from .serializers import (
+    GroupSerializer,
+    GroupInboxSerializer,
+    GroupReadSerializer,
+    GroupCreateSerializer,
+    GroupMemberSerializer,
+    GroupJoinSerializer,
+    GroupInviteSerializer,
+)
 from .models import GroupManager
+import logging
+
+logger = logging.getLogger('django')
 
 # Create your views here.
 
@@ -29,6 +40,14 @@ class GroupListView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class GroupInboxView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Every group the user is in with its last message and unread count, from one query"""
+        groups = GroupManager.get_user_inbox(request.user.user_id)
+        return Response(GroupInboxSerializer(groups, many=True).data, status=status.HTTP_200_OK)
+
 class GroupDetailView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -92,6 +111,27 @@ class GroupLeaveView(APIView):
         
         return Response({'message': 'Successfully left group'}, status=status.HTTP_200_OK)
 
+class GroupReadView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, group_id):
+        """Mark the group read up to ``message_id``, or up to its newest message"""
+        serializer = GroupReadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Verify group exists
+        group = GroupManager.get_group_by_id(group_id)
+        if not group:
+            return Response({'error': 'Group not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Verify user is a member
+        if not GroupManager.is_member(group_id, request.user.user_id):
+            return Response({'error': 'You are not a member of this group'}, status=status.HTTP_403_FORBIDDEN)
+        
+        last_read = GroupManager.mark_read(group_id, request.user.user_id, serializer.validated_data.get('message_id'))
+        return Response({'last_read_message_id': last_read}, status=status.HTTP_200_OK)
+
 class GroupInviteView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -109,10 +149,6 @@ class GroupInviteView(APIView):
         if serializer.is_valid():
             email = serializer.validated_data['email']
             
-            # Log info for debugging
-            print(f"Inviting user email: {email} to group: {group_id}")
-            print(f"Request data: {request.data}")
-            
             result = GroupManager.invite_by_email(group_id, email)
             
             if result['success']:
@@ -121,5 +157,5 @@ class GroupInviteView(APIView):
                 return Response({'error': result['message']}, status=status.HTTP_400_BAD_REQUEST)
         else:
             # Include more detailed validation errors
-            print(f"Validation errors: {serializer.errors}")
+            logger.debug(f"Rejected group invite: {serializer.errors}")
             return Response({'error': 'Invalid email format', 'details': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
@@ -37,10 +37,40 @@ CREATE TABLE IF NOT EXISTS posts (
   date_modified TIMESTAMP NULL,
   is_active     TINYINT(1) DEFAULT 1,
   is_reported   TINYINT(1) DEFAULT 0,
+  -- Maintained by the managers; reconcile_counters.py repairs drift
+  comment_count INT NOT NULL DEFAULT 0,
+  report_count  INT NOT NULL DEFAULT 0,
+  last_reported_at TIMESTAMP NULL DEFAULT NULL,
+  -- Set when is_active drops to 0; archive_data.py moves the post out after a grace period
+  deleted_at    TIMESTAMP NULL DEFAULT NULL,
+  -- Keyset pagination on (date_created, post_id) for the feed endpoints
+  INDEX idx_posts_feed (is_active, date_created, post_id),
+  INDEX idx_posts_course_feed (course_id, is_active, date_created, post_id),
+  INDEX idx_posts_type_feed (post_type, is_active, date_created, post_id),
+  -- Moderation queue: most reported first, then most recently reported
+  INDEX idx_posts_moderation (is_reported, report_count, last_reported_at, post_id),
+  FULLTEXT INDEX ft_posts_content (content),
   FOREIGN KEY (user_id)  REFERENCES users(user_id)   ON DELETE CASCADE,
   FOREIGN KEY (course_id)REFERENCES courses(course_id)ON DELETE SET NULL
 ) ENGINE=InnoDB;
 
+-- Each user's enrolled-courses feed, written when a post is created (fan-out on
+-- write) and when the user enrolls, so the feed reads one index range
+CREATE TABLE IF NOT EXISTS feed_inbox (
+  user_id      INT NOT NULL,
+  post_id      INT NOT NULL,
+  course_id    INT NOT NULL,
+  post_type    ENUM('seeking', 'offering') NOT NULL DEFAULT 'seeking',
+  date_created TIMESTAMP NOT NULL,
+  PRIMARY KEY (user_id, date_created, post_id),
+  INDEX idx_feed_inbox_type (user_id, post_type, date_created, post_id),
+  INDEX idx_feed_inbox_course (course_id, user_id),
+  INDEX idx_feed_inbox_post (post_id),
+  FOREIGN KEY (user_id)   REFERENCES users(user_id)     ON DELETE CASCADE,
+  FOREIGN KEY (post_id)   REFERENCES posts(post_id)     ON DELETE CASCADE,
+  FOREIGN KEY (course_id) REFERENCES courses(course_id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
 CREATE TABLE IF NOT EXISTS comments (
   comment_id    INT AUTO_INCREMENT PRIMARY KEY,
   post_id       INT NOT NULL,
@@ -48,6 +78,11 @@ CREATE TABLE IF NOT EXISTS comments (
   content       TEXT NOT NULL,
   parent_id     INT NULL,
   date_created  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  -- Flat comment lists, newest first (comment_id rides along as the primary key)
+  INDEX idx_comments_thread (post_id, date_created, parent_id),
+  -- Threaded pages: top-level comments (parent_id IS NULL) and each comment's replies, in date order
+  INDEX idx_comments_replies (post_id, parent_id, date_created),
+  FULLTEXT INDEX ft_comments_content (content),
   FOREIGN KEY (post_id)   REFERENCES posts(post_id)   ON DELETE CASCADE,
   FOREIGN KEY (user_id)   REFERENCES users(user_id)   ON DELETE CASCADE,
   FOREIGN KEY (parent_id) REFERENCES comments(comment_id) ON DELETE SET NULL
@@ -59,6 +94,8 @@ CREATE TABLE IF NOT EXISTS post_reports (
   user_id       INT NOT NULL,
   reason        TEXT NOT NULL,
   date_created  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  -- A user can report a post once; also serves the per-post reason lookup
+  UNIQUE KEY uq_post_reports_post_user (post_id, user_id),
   FOREIGN KEY (post_id) REFERENCES posts(post_id) ON DELETE CASCADE,
   FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 ) ENGINE=InnoDB;
@@ -66,7 +103,8 @@ CREATE TABLE IF NOT EXISTS post_reports (
 CREATE TABLE IF NOT EXISTS study_groups (
   group_id     INT AUTO_INCREMENT PRIMARY KEY,
   title        VARCHAR(150) NOT NULL,
-  date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+  date_created TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  member_count INT NOT NULL DEFAULT 0
 ) ENGINE=InnoDB;
 
 CREATE TABLE IF NOT EXISTS post_group_associations (
@@ -83,6 +121,8 @@ CREATE TABLE IF NOT EXISTS study_group_members (
   group_id INT NOT NULL,
   user_id  INT NOT NULL,
   joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  -- Read cursor behind the group inbox's unread counts; starts at the newest message on joining
+  last_read_message_id INT NULL,
   PRIMARY KEY (group_id,user_id),
   FOREIGN KEY (group_id) REFERENCES study_groups(group_id) ON DELETE CASCADE,
   FOREIGN KEY (user_id)  REFERENCES users(user_id)       ON DELETE CASCADE
@@ -94,15 +134,93 @@ CREATE TABLE IF NOT EXISTS messages (
   user_id    INT NOT NULL,
   content    TEXT NOT NULL,
   timestamp  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  -- Incremental chat sync reads (group_id, message_id) ranges
+  INDEX idx_messages_group (group_id, message_id),
   FOREIGN KEY (group_id) REFERENCES study_groups(group_id) ON DELETE CASCADE,
   FOREIGN KEY (user_id)  REFERENCES users(user_id)        ON DELETE CASCADE
 ) ENGINE=InnoDB;
 
--- Insert sample data for testing
+-- Archive tables filled by archive_data.py: soft-deleted posts (with their
+-- comments and reports) and old chat messages, still readable on demand
+CREATE TABLE IF NOT EXISTS posts_archive (
+  post_id          INT PRIMARY KEY,
+  user_id          INT NOT NULL,
+  course_id        INT NULL,
+  content          TEXT NOT NULL,
+  post_type        ENUM('seeking', 'offering') NOT NULL DEFAULT 'seeking',
+  date_created     TIMESTAMP NULL,
+  date_modified    TIMESTAMP NULL,
+  is_active        TINYINT(1) DEFAULT 0,
+  is_reported      TINYINT(1) DEFAULT 0,
+  comment_count    INT NOT NULL DEFAULT 0,
+  report_count     INT NOT NULL DEFAULT 0,
+  last_reported_at TIMESTAMP NULL DEFAULT NULL,
+  deleted_at       TIMESTAMP NULL DEFAULT NULL,
+  archived_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS comments_archive (
+  comment_id    INT PRIMARY KEY,
+  post_id       INT NOT NULL,
+  user_id       INT NOT NULL,
+  content       TEXT NOT NULL,
+  parent_id     INT NULL,
+  date_created  TIMESTAMP NULL,
+  INDEX idx_comments_archive_post (post_id, date_created),
+  FOREIGN KEY (post_id) REFERENCES posts_archive(post_id) ON DELETE CASCADE,
+  FOREIGN KEY (user_id) REFERENCES users(user_id)         ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS post_reports_archive (
+  report_id     INT PRIMARY KEY,
+  post_id       INT NOT NULL,
+  user_id       INT NOT NULL,
+  reason        TEXT NOT NULL,
+  date_created  TIMESTAMP NULL,
+  FOREIGN KEY (post_id) REFERENCES posts_archive(post_id) ON DELETE CASCADE,
+  FOREIGN KEY (user_id) REFERENCES users(user_id)         ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+CREATE TABLE IF NOT EXISTS messages_archive (
+  message_id INT PRIMARY KEY,
+  group_id   INT NOT NULL,
+  user_id    INT NOT NULL,
+  content    TEXT NOT NULL,
+  timestamp  TIMESTAMP NULL,
+  INDEX idx_messages_archive_group (group_id, message_id),
+  FOREIGN KEY (group_id) REFERENCES study_groups(group_id) ON DELETE CASCADE,
+  FOREIGN KEY (user_id)  REFERENCES users(user_id)         ON DELETE CASCADE
+) ENGINE=InnoDB;
+
+-- Revoked JWTs, mirrored in memory by authentication.tokens. A row revokes one
+-- token (jti), or every token issued to user_id up to revoked_at when jti is NULL.
+-- No foreign key: revoking a deleted user's tokens must outlive the user.
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+  revocation_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  jti           CHAR(32) NULL,
+  user_id       INT NOT NULL,
+  revoked_at    DATETIME(6) NOT NULL,
+  expires_at    DATETIME NOT NULL,
+  UNIQUE KEY uq_revoked_tokens_jti (jti),
+  INDEX idx_revoked_tokens_revoked (revoked_at),
+  INDEX idx_revoked_tokens_expires (expires_at)
+) ENGINE=InnoDB;
+
+-- Posts whose search text changed, read by every process's in-process search index
+-- (posts.search) when the FULLTEXT indexes are missing. Rows are kept for a day.
+CREATE TABLE IF NOT EXISTS search_index_changes (
+  change_id  BIGINT AUTO_INCREMENT PRIMARY KEY,
+  post_id    INT NOT NULL,
+  changed_at DATETIME(6) NOT NULL,
+  INDEX idx_search_index_changes_changed (changed_at)
+) ENGINE=InnoDB;
+
+-- Insert sample data for testing (every password is 'password123', hashed as authentication.passwords does)
 INSERT INTO users (name, email, password, is_admin) VALUES 
-('Admin User', 'admin@example.com', SHA2('password123', 256), 1),
-('John Doe', 'john@example.com', SHA2('password123', 256), 0),
-('Jane Smith', 'jane@example.com', SHA2('password123', 256), 0);
+('Admin User', 'admin@example.com', 'pbkdf2_sha256$600000$LC5f84WtI3qyoiFc2zE2NA$xpa10czlSlkX3J5dO2fxUkKiY4KNp97376/ElIL6MOU', 1),
+('John Doe', 'john@example.com', 'pbkdf2_sha256$600000$TDRlnduXP9cJS7evrKR0pg$1ZqI1fl2fB7mHW18iGI3Bm8XzsxA8swLg3966jUUpm0', 0),
+('Jane Smith', 'jane@example.com', 'pbkdf2_sha256$600000$xDXNG7UP3s5uQk932zhX-Q$gL3WgeMHljbcW17qqditACvsKSQXG10LGF6bFqT/cHo', 0);
 
 INSERT INTO courses (course_name, description) VALUES 
 ('CPSC 331 - Data Structures', 'Learn about data structures and algorithms for organizing and processing data.'),
@@ -145,4 +263,14 @@ INSERT INTO messages (group_id, user_id, content) VALUES
 (1, 2, 'Thanks for creating this group. When should we meet?'),
 (1, 1, 'How about Friday at 2 PM in the library?'),
 (2, 1, 'Welcome to the MATH 271 Study Group!'),
-(2, 3, 'Hi everyone! Looking forward to studying together.'); 
\ No newline at end of file
+(2, 3, 'Hi everyone! Looking forward to studying together.'); 
+
+-- Fill the denormalised counters for the sample data
+UPDATE posts p SET comment_count = (SELECT COUNT(*) FROM comments c WHERE c.post_id = p.post_id);
+UPDATE study_groups g SET member_count = (SELECT COUNT(*) FROM study_group_members m WHERE m.group_id = g.group_id);
+
+-- Fill the enrolled-courses feed for the sample data
+INSERT INTO feed_inbox (user_id, post_id, course_id, post_type, date_created)
+SELECT uc.user_id, p.post_id, p.course_id, p.post_type, p.date_created
+FROM posts p
+JOIN user_courses uc ON uc.course_id = p.course_id;
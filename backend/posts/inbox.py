@@ -0,0 +1,76 @@
+"""
+Fan-out-on-write storage for the enrolled-courses feed.
+
+A new post is copied into the ``feed_inbox`` of every user enrolled in its
+course, and enrolling (or unenrolling) adds (or removes) that course's posts
+for the user. Reading ``posts/enrolled/`` is then a single range scan of the
+``(user_id, date_created, post_id)`` key, however many courses the user takes,
+instead of a join across all of them followed by a filesort.
+
+The inbox holds a row for every (enrolled user, post in that course) pair;
+whether the post is still active is checked when the feed is read. Databases
+without ``add_feed_inbox.sql`` keep using the join.
+"""
+from api.schema import schema
+from api.sql import insert_ignore_select_sql, update_in_id_batches
+
+INBOX_COLUMNS = ('user_id', 'post_id', 'course_id', 'post_type', 'date_created')
+
+
+def enabled():
+    return schema.has_table('feed_inbox')
+
+
+def _deliveries(where):
+    # Databases created before post_type existed treat every post as 'seeking'
+    post_type = "p.post_type" if schema.has_column('posts', 'post_type') else "'seeking'"
+    select = f"""
+        SELECT uc.user_id, p.post_id, p.course_id, {post_type}, p.date_created
+        FROM posts p
+        JOIN user_courses uc ON uc.course_id = p.course_id
+        WHERE {where}
+    """
+    return insert_ignore_select_sql('feed_inbox', INBOX_COLUMNS, select)
+
+
+def fan_out(cursor, post_id):
+    """Deliver a new post to everyone enrolled in its course; returns the rows written"""
+    if not enabled():
+        return 0
+    cursor.execute(_deliveries("p.post_id = %s"), [post_id])
+    return cursor.rowcount
+
+
+def add_course(cursor, user_id, course_id):
+    """Backfill a course's posts into the inbox of a user who just enrolled"""
+    if not enabled():
+        return 0
+    cursor.execute(_deliveries("uc.user_id = %s AND uc.course_id = %s"), [user_id, course_id])
+    return cursor.rowcount
+
+
+def remove_course(cursor, user_id, course_id):
+    if not enabled():
+        return 0
+    cursor.execute("DELETE FROM feed_inbox WHERE user_id = %s AND course_id = %s", [user_id, course_id])
+    return cursor.rowcount
+
+
+def reconcile(batch_size=10000):
+    """
+    Add missing inbox rows and drop ones no enrollment accounts for, e.g. after
+    a bulk import. Runs in post id batches; returns the number of rows changed.
+    """
+    if not enabled():
+        return 0
+    added = update_in_id_batches('posts', 'post_id', _deliveries("p.post_id BETWEEN %s AND %s"), batch_size)
+    removed = update_in_id_batches('posts', 'post_id', """
+        DELETE FROM feed_inbox
+        WHERE post_id BETWEEN %s AND %s
+          AND NOT EXISTS (
+              SELECT 1 FROM posts p
+              JOIN user_courses uc ON uc.course_id = p.course_id
+              WHERE p.post_id = feed_inbox.post_id AND uc.user_id = feed_inbox.user_id
+          )
+    """, batch_size)
+    return added + removed
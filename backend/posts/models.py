@@ -1,112 +1,217 @@
 from django.db import models
-from django.db import connection
-from django.db.utils import DatabaseError
+from django.db import connection, transaction
+from api.archive import archive_in_batches, copy_rows, matching_ids
+from api.async_db import async_db
+from api.routing import read_connection
+from api.pagination import keyset_condition, multi_keyset_condition, encode_cursor, DEFAULT_PAGE_SIZE
+from api.rows import fetch_dict, fetch_dicts
+from api.schema import schema
+from api.sql import for_update_sql, insert_ignore_select_sql, update_in_id_batches
+from . import inbox
+from .search import InvertedIndex, has_fulltext_indexes, search_index, tokenize, COMMENT_WEIGHT, POST_WEIGHT
+from .threads import CommentThread, replies_token, DEFAULT_MAX_DEPTH, DEFAULT_REPLIES_LIMIT
+
+MODERATION_ACTIONS = ('hide', 'dismiss')
+# Latest report reasons shown per post in the moderation queue
+REPORT_REASONS_LIMIT = 5
+
+def _apply_page(conditions, params, after):
+    # Continue a (date_created, post_id) DESC scan after the given cursor key
+    if after is not None:
+        clause, cursor_params = keyset_condition("p.date_created", "p.post_id", after)
+        conditions.append(clause)
+        params.extend(cursor_params)
+
+def _post_type_column():
+    # Databases created before post_type existed treat every post as 'seeking'
+    if schema.has_column('posts', 'post_type'):
+        return "p.post_type"
+    return "'seeking'"
+
+def _filter_post_type(conditions, params, post_type):
+    if post_type is not None:
+        conditions.append(f"{_post_type_column()} = %s")
+        params.append(post_type)
+
+def _counter_column(table, alias, column, fallback="0"):
+    # Counter columns arrive with add_counter_columns.sql
+    if schema.has_column(table, column):
+        return f"{alias}.{column}"
+    return fallback
+
+def _post_summary_columns():
+    """SELECT list shared by the feed and search queries (needs ``u``, ``c`` and ``_GROUP_JOINS``)"""
+    return f"""p.post_id, p.content, p.date_created, {_post_type_column()} AS post_type, u.name AS author, c.course_name,
+               {_counter_column('posts', 'p', 'comment_count')} AS comment_count,
+               {_counter_column('study_groups', 'g', 'member_count', fallback="NULL")} AS group_member_count"""
+
+# Each post has at most one group, so these joins never multiply feed rows
+_GROUP_JOINS = """
+    LEFT JOIN post_group_associations pga ON p.post_id = pga.post_id
+    LEFT JOIN study_groups g ON pga.group_id = g.group_id
+"""
+
+def _bump_post_counter(cursor, post_id, column, delta):
+    if delta and schema.has_column('posts', column):
+        cursor.execute(f"UPDATE posts SET {column} = {column} + %s WHERE post_id = %s", [delta, post_id])
+
+def _moderation_sort_columns():
+    """``(report_count, last_reported_at, post_id)`` expressions the moderation queue is ordered by"""
+    report_count = _counter_column(
+        'posts', 'p', 'report_count', fallback="(SELECT COUNT(*) FROM post_reports r WHERE r.post_id = p.post_id)"
+    )
+    # Databases without add_moderation_queue.sql fall back to when the post was written,
+    # as do posts flagged before it with no report left to date them. A NULL would
+    # sort last and never satisfy the keyset comparisons, ending the queue early.
+    if schema.has_column('posts', 'last_reported_at'):
+        return report_count, "COALESCE(p.last_reported_at, p.date_created)", "p.post_id"
+    return report_count, "p.date_created", "p.post_id"
+
+# Replies to one comment, counted from the parent_id index
+_REPLY_COUNT = "(SELECT COUNT(*) FROM comments r WHERE r.parent_id = {comment}) AS reply_count"
+
+def _deactivate_assignments():
+    # deleted_at starts the archive grace period; it arrives with add_archive_tables.sql
+    if schema.has_column('posts', 'deleted_at'):
+        return "is_active = 0, deleted_at = CURRENT_TIMESTAMP"
+    return "is_active = 0"
+
+def _limit_clause(params, limit):
+    # Fetch one extra row so the caller can tell whether another page exists
+    if limit is None:
+        return ""
+    params.append(limit + 1)
+    return "LIMIT %s"
+
+def _feed_query(course_id, post_type, limit, after):
+    params = []
+    conditions = ["p.is_active = 1"]
+    
+    if course_id is not None:
+        conditions.append("p.course_id = %s")
+        params.append(course_id)
+        
+    _filter_post_type(conditions, params, post_type)
+    _apply_page(conditions, params, after)
+    where_clause = " AND ".join(conditions)
+    limit_clause = _limit_clause(params, limit)
+    
+    query = f"""
+        SELECT {_post_summary_columns()}
+        FROM posts p 
+        JOIN users u ON p.user_id = u.user_id 
+        LEFT JOIN courses c ON p.course_id = c.course_id 
+        {_GROUP_JOINS}
+        WHERE {where_clause}
+        ORDER BY p.date_created DESC, p.post_id DESC
+        {limit_clause}
+    """
+    return query, params
+
+def _inbox_feed_query(user_id, post_type, limit, after):
+    # One range of feed_inbox's (user_id, date_created, post_id) key, already in feed order
+    params = [user_id]
+    conditions = ["i.user_id = %s", "p.is_active = 1"]
+    
+    if post_type is not None:
+        conditions.append("i.post_type = %s")
+        params.append(post_type)
+    if after is not None:
+        clause, cursor_params = keyset_condition("i.date_created", "i.post_id", after)
+        conditions.append(clause)
+        params.extend(cursor_params)
+    where_clause = " AND ".join(conditions)
+    limit_clause = _limit_clause(params, limit)
+    
+    query = f"""
+        SELECT {_post_summary_columns()}
+        FROM feed_inbox i
+        JOIN posts p ON i.post_id = p.post_id
+        JOIN users u ON p.user_id = u.user_id 
+        JOIN courses c ON p.course_id = c.course_id 
+        {_GROUP_JOINS}
+        WHERE {where_clause}
+        ORDER BY i.date_created DESC, i.post_id DESC
+        {limit_clause}
+    """
+    return query, params
+
+def _enrolled_feed_query(user_id, post_type, limit, after):
+    if inbox.enabled():
+        return _inbox_feed_query(user_id, post_type, limit, after)
+    params = [user_id]
+    conditions = ["p.is_active = 1", "uc.user_id = %s"]
+    
+    _filter_post_type(conditions, params, post_type)
+    _apply_page(conditions, params, after)
+    where_clause = " AND ".join(conditions)
+    limit_clause = _limit_clause(params, limit)
+    
+    query = f"""
+        SELECT {_post_summary_columns()}
+        FROM posts p 
+        JOIN users u ON p.user_id = u.user_id 
+        JOIN courses c ON p.course_id = c.course_id 
+        JOIN user_courses uc ON p.course_id = uc.course_id
+        {_GROUP_JOINS}
+        WHERE {where_clause}
+        ORDER BY p.date_created DESC, p.post_id DESC
+        {limit_clause}
+    """
+    return query, params
 
 class PostManager:
     @staticmethod
-    def get_posts(course_id=None, post_type=None):
-        try:
-            with connection.cursor() as cursor:
-                params = []
-                conditions = ["p.is_active = 1"]
-                
-                if course_id is not None:
-                    conditions.append("p.course_id = %s")
-                    params.append(course_id)
-                    
-                if post_type is not None:
-                    conditions.append("p.post_type = %s")
-                    params.append(post_type)
-                    
-                where_clause = " AND ".join(conditions)
-                
-                query = f"""
-                    SELECT p.post_id, p.content, p.date_created, p.post_type, u.name AS author, c.course_name 
-                    FROM posts p 
-                    JOIN users u ON p.user_id = u.user_id 
-                    LEFT JOIN courses c ON p.course_id = c.course_id 
-                    WHERE {where_clause}
-                    ORDER BY p.date_created DESC
-                """
-                cursor.execute(query, params)
-                posts = []
-                for row in cursor.fetchall():
-                    posts.append({
-                        'post_id': row[0],
-                        'content': row[1],
-                        'date_created': row[2],
-                        'post_type': row[3],
-                        'author': row[4],
-                        'course_name': row[5]
-                    })
-                return posts
-        except DatabaseError as e:
-            # If there's an error related to the post_type column
-            if "Unknown column 'p.post_type'" in str(e):
-                # Fallback query without post_type
-                with connection.cursor() as cursor:
-                    params = []
-                    conditions = ["p.is_active = 1"]
-                    
-                    if course_id is not None:
-                        conditions.append("p.course_id = %s")
-                        params.append(course_id)
-                        
-                    where_clause = " AND ".join(conditions)
-                    
-                    # Use a default value for post_type since it doesn't exist
-                    query = f"""
-                        SELECT p.post_id, p.content, p.date_created, 'seeking' AS post_type, u.name AS author, c.course_name 
-                        FROM posts p 
-                        JOIN users u ON p.user_id = u.user_id 
-                        LEFT JOIN courses c ON p.course_id = c.course_id 
-                        WHERE {where_clause}
-                        ORDER BY p.date_created DESC
-                    """
-                    cursor.execute(query, params)
-                    posts = []
-                    for row in cursor.fetchall():
-                        posts.append({
-                            'post_id': row[0],
-                            'content': row[1],
-                            'date_created': row[2],
-                            'post_type': row[3],
-                            'author': row[4],
-                            'course_name': row[5]
-                        })
-                    return posts
-            else:
-                # For other database errors, re-raise
-                raise
+    def get_posts(course_id=None, post_type=None, limit=None, after=None):
+        """
+        Get active posts newest first. When ``limit`` is given, at most
+        ``limit + 1`` rows are returned, starting after the ``after`` key
+        ``(date_created, post_id)``.
+        """
+        query, params = _feed_query(course_id, post_type, limit, after)
+        with read_connection().cursor() as cursor:
+            cursor.execute(query, params)
+            return fetch_dicts(cursor)
     
     @staticmethod
-    def get_post_by_id(post_id):
-        with connection.cursor() as cursor:
-            query = """
+    async def aget_posts(course_id=None, post_type=None, limit=None, after=None):
+        """Async ``get_posts`` for the async feed view"""
+        await schema.aensure_probed()
+        return await async_db.fetch_dicts(*_feed_query(course_id, post_type, limit, after))
+    
+    @staticmethod
+    def get_post_by_id(post_id, include_deleted=False):
+        """Get a post, or None if it doesn't exist or was deleted (unless ``include_deleted``)"""
+        with read_connection().cursor() as cursor:
+            query = f"""
                 SELECT p.post_id, p.content, p.date_created, p.date_modified, p.user_id, p.course_id, 
-                       p.post_type, p.is_active, p.is_reported 
+                       {_post_type_column()} AS post_type, p.is_active, p.is_reported,
+                       {_counter_column('posts', 'p', 'comment_count')} AS comment_count,
+                       {_counter_column('posts', 'p', 'report_count')} AS report_count
                 FROM posts p 
-                WHERE p.post_id = %s
+                WHERE p.post_id = %s {"" if include_deleted else "AND p.is_active = 1"}
             """
             cursor.execute(query, [post_id])
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'post_id': row[0],
-                    'content': row[1],
-                    'date_created': row[2],
-                    'date_modified': row[3],
-                    'user_id': row[4],
-                    'course_id': row[5],
-                    'post_type': row[6],
-                    'is_active': bool(row[7]),
-                    'is_reported': bool(row[8])
-                }
-            return None
+            return fetch_dict(cursor, {'is_active': bool, 'is_reported': bool})
+    
+    @staticmethod
+    def get_post_summary(post_id):
+        """One active post with the fields the feed returns, or None"""
+        with read_connection().cursor() as cursor:
+            query = f"""
+                SELECT {_post_summary_columns()}
+                FROM posts p
+                JOIN users u ON p.user_id = u.user_id
+                LEFT JOIN courses c ON p.course_id = c.course_id
+                {_GROUP_JOINS}
+                WHERE p.post_id = %s AND p.is_active = 1
+            """
+            cursor.execute(query, [post_id])
+            return fetch_dict(cursor)
     
     @staticmethod
     def get_post_group(post_id):
-        with connection.cursor() as cursor:
+        with read_connection().cursor() as cursor:
             query = """
                 SELECT g.group_id, g.title 
                 FROM post_group_associations pga
@@ -114,18 +219,12 @@ class PostManager:
                 WHERE pga.post_id = %s
             """
             cursor.execute(query, [post_id])
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'group_id': row[0],
-                    'title': row[1]
-                }
-            return None
+            return fetch_dict(cursor)
     
     @staticmethod
     def get_posts_with_groups():
         """Get all posts that have associated study groups for debugging purposes"""
-        with connection.cursor() as cursor:
+        with read_connection().cursor() as cursor:
             query = """
                 SELECT p.post_id, p.content, p.user_id, u.name as author, c.course_name,
                        g.group_id, g.title as group_title
@@ -138,18 +237,7 @@ class PostManager:
                 ORDER BY p.date_created DESC
             """
             cursor.execute(query)
-            posts = []
-            for row in cursor.fetchall():
-                posts.append({
-                    'post_id': row[0],
-                    'content': row[1],
-                    'user_id': row[2],
-                    'author': row[3],
-                    'course_name': row[4],
-                    'group_id': row[5],
-                    'group_title': row[6]
-                })
-            return posts
+            return fetch_dicts(cursor)
     
     @staticmethod
     def associate_group_with_post(post_id, group_id):
@@ -167,182 +255,527 @@ class PostManager:
     
     @staticmethod
     def create_post(user_id, content, course_id=None, post_type='seeking'):
-        try:
-            with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
+            if schema.has_column('posts', 'post_type'):
                 query = "INSERT INTO posts (user_id, course_id, content, post_type) VALUES (%s, %s, %s, %s)"
                 cursor.execute(query, [user_id, course_id, content, post_type])
-                return cursor.lastrowid
-        except DatabaseError as e:
-            # If there's an error related to the post_type column
-            if "Unknown column 'post_type'" in str(e):
-                # Fallback: insert without post_type
-                with connection.cursor() as cursor:
-                    query = "INSERT INTO posts (user_id, course_id, content) VALUES (%s, %s, %s)"
-                    cursor.execute(query, [user_id, course_id, content])
-                    return cursor.lastrowid
             else:
-                # For other database errors, re-raise
-                raise
+                query = "INSERT INTO posts (user_id, course_id, content) VALUES (%s, %s, %s)"
+                cursor.execute(query, [user_id, course_id, content])
+            post_id = cursor.lastrowid
+            if course_id is not None:
+                inbox.fan_out(cursor, post_id)
+            search_index.changed(cursor, [post_id])
+            return post_id
     
     @staticmethod
     def update_post(post_id, user_id, content, is_admin=False):
         with connection.cursor() as cursor:
-            # Only the post owner or an admin can update a post
+            # Only the post owner or an admin can update a post, and not once it's deleted
             query = """
                 UPDATE posts 
                 SET content = %s, date_modified = CURRENT_TIMESTAMP 
-                WHERE post_id = %s AND (user_id = %s OR %s)
+                WHERE post_id = %s AND is_active = 1 AND (user_id = %s OR %s)
             """
             cursor.execute(query, [content, post_id, user_id, is_admin])
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+            if updated:
+                search_index.changed(cursor, [post_id])
+            return updated
     
     @staticmethod
     def delete_post(post_id, user_id, is_admin=False):
+        """
+        Soft-delete a post: it drops out of every feed straight away, and
+        archive_data.py later moves it and its comments to the archive tables,
+        off the request path.
+        """
         with connection.cursor() as cursor:
             # Only the post owner or an admin can delete a post
-            query = "DELETE FROM posts WHERE post_id = %s AND (user_id = %s OR %s)"
+            query = f"""
+                UPDATE posts SET {_deactivate_assignments()}
+                WHERE post_id = %s AND is_active = 1 AND (user_id = %s OR %s)
+            """
             cursor.execute(query, [post_id, user_id, is_admin])
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+            if deleted:
+                search_index.changed(cursor, [post_id])
+            return deleted
     
     @staticmethod
     def report_post(post_id, user_id, reason):
-        with connection.cursor() as cursor:
-            # Check if post exists
-            check_query = "SELECT post_id FROM posts WHERE post_id = %s"
-            cursor.execute(check_query, [post_id])
-            if not cursor.fetchone():
-                return False
-                
-            # Create report
-            report_query = "INSERT INTO post_reports (post_id, user_id, reason) VALUES (%s, %s, %s)"
-            cursor.execute(report_query, [post_id, user_id, reason])
-            
-            # Mark post as reported
-            update_query = "UPDATE posts SET is_reported = 1 WHERE post_id = %s"
-            cursor.execute(update_query, [post_id])
+        """
+        Record ``user_id``'s report of a post. Returns True for a new report,
+        False if the user already reported it and None if there is no such post.
+        """
+        # One statement checks the post exists and skips repeat reports; the
+        # unique (post_id, user_id) key settles two identical reports racing
+        select = """
+            SELECT p.post_id, %s, %s FROM posts p
+            WHERE p.post_id = %s AND p.is_active = 1
+              AND NOT EXISTS (SELECT 1 FROM post_reports r WHERE r.post_id = p.post_id AND r.user_id = %s)
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                insert_ignore_select_sql('post_reports', ('post_id', 'user_id', 'reason'), select),
+                [user_id, reason, post_id, user_id]
+            )
+            if cursor.rowcount == 0:
+                cursor.execute("SELECT 1 FROM posts WHERE post_id = %s AND is_active = 1", [post_id])
+                return False if cursor.fetchone() else None
             
+            # Mark post as reported and move it up the moderation queue
+            assignments = ["is_reported = 1"]
+            if schema.has_column('posts', 'report_count'):
+                assignments.append("report_count = report_count + 1")
+            if schema.has_column('posts', 'last_reported_at'):
+                assignments.append("last_reported_at = CURRENT_TIMESTAMP")
+            cursor.execute(f"UPDATE posts SET {', '.join(assignments)} WHERE post_id = %s", [post_id])
             return True
     
     @staticmethod
-    def get_reported_posts():
-        with connection.cursor() as cursor:
-            query = """
-                SELECT p.post_id, p.content, p.user_id, u.name AS author 
+    def get_reported_posts(limit=None, after=None):
+        """
+        The moderation queue: reported posts with the most reports first, then
+        the most recently reported, each with its latest report reasons. When
+        ``limit`` is given, at most ``limit + 1`` posts are returned, continuing
+        after the ``after`` key ``(report_count, last_reported_at, post_id)``.
+        """
+        sort_columns = _moderation_sort_columns()
+        report_count, last_reported_at, _ = sort_columns
+        params = []
+        # Deleted posts need no decision
+        conditions = ["p.is_reported = 1", "p.is_active = 1"]
+        if after is not None:
+            clause, cursor_params = multi_keyset_condition(sort_columns, after)
+            conditions.append(clause)
+            params.extend(cursor_params)
+        where_clause = " AND ".join(conditions)
+        limit_clause = _limit_clause(params, limit)
+        
+        with read_connection().cursor() as cursor:
+            query = f"""
+                SELECT p.post_id, p.content, p.user_id, u.name AS author,
+                       {report_count} AS report_count, {last_reported_at} AS last_reported_at
                 FROM posts p 
                 JOIN users u ON p.user_id = u.user_id 
-                WHERE p.is_reported = 1 
-                ORDER BY p.date_created DESC
+                WHERE {where_clause}
+                ORDER BY {report_count} DESC, {last_reported_at} DESC, p.post_id DESC
+                {limit_clause}
             """
-            cursor.execute(query)
-            posts = []
-            for row in cursor.fetchall():
-                posts.append({
-                    'post_id': row[0],
-                    'content': row[1],
-                    'user_id': row[2],
-                    'author': row[3]
-                })
-            return posts
+            cursor.execute(query, params)
+            posts = fetch_dicts(cursor)
+            reasons = PostManager._get_report_reasons(cursor, [post['post_id'] for post in posts])
+        for post in posts:
+            post['reasons'] = reasons.get(post['post_id'], [])
+        return posts
     
     @staticmethod
-    def get_posts_for_enrolled_courses(user_id, post_type=None):
-        """Get posts that are related to courses the user is enrolled in"""
-        try:
-            with connection.cursor() as cursor:
-                params = [user_id]
-                conditions = ["p.is_active = 1", "uc.user_id = %s"]
+    def _get_report_reasons(cursor, post_ids):
+        if not post_ids:
+            return {}
+        placeholders = ", ".join(["%s"] * len(post_ids))
+        cursor.execute(f"""
+            SELECT post_id, reason FROM post_reports
+            WHERE post_id IN ({placeholders})
+            ORDER BY post_id, report_id DESC
+        """, post_ids)
+        reasons = {}
+        for post_id, reason in cursor.fetchall():
+            post_reasons = reasons.setdefault(post_id, [])
+            if len(post_reasons) < REPORT_REASONS_LIMIT:
+                post_reasons.append(reason)
+        return reasons
+    
+    @staticmethod
+    def moderate_posts(post_ids, action):
+        """
+        Apply one moderator decision to many reported posts in a single
+        transaction. ``hide`` takes the posts out of every feed and keeps their
+        reports on record; ``dismiss`` deletes the reports and leaves the posts
+        up. Posts no longer in the queue are skipped. Returns how many were moderated.
+        """
+        if action not in MODERATION_ACTIONS:
+            raise ValueError(f"Unknown moderation action {action!r}")
+        if not post_ids:
+            return 0
+        with transaction.atomic(), connection.cursor() as cursor:
+            # Lock the queued posts in id order so concurrent moderators can't deadlock
+            placeholders = ", ".join(["%s"] * len(post_ids))
+            cursor.execute(f"""
+                SELECT post_id FROM posts
+                WHERE is_reported = 1 AND post_id IN ({placeholders})
+                ORDER BY post_id
+                {for_update_sql()}
+            """, list(post_ids))
+            queued = [row[0] for row in cursor.fetchall()]
+            if not queued:
+                return 0
+            
+            placeholders = ", ".join(["%s"] * len(queued))
+            if action == 'hide':
+                cursor.execute(
+                    f"UPDATE posts SET {_deactivate_assignments()}, is_reported = 0 WHERE post_id IN ({placeholders})",
+                    queued
+                )
+                search_index.changed(cursor, queued)
+            else:
+                assignments = ["is_reported = 0"]
+                if schema.has_column('posts', 'report_count'):
+                    assignments.append("report_count = 0")
+                if schema.has_column('posts', 'last_reported_at'):
+                    assignments.append("last_reported_at = NULL")
+                cursor.execute(f"UPDATE posts SET {', '.join(assignments)} WHERE post_id IN ({placeholders})", queued)
+                cursor.execute(f"DELETE FROM post_reports WHERE post_id IN ({placeholders})", queued)
+            return len(queued)
+    
+    @staticmethod
+    def archive_deleted_posts(deleted_before, batch_size=1000, pause=0.0):
+        """
+        Move posts deleted (or hidden) before ``deleted_before`` into
+        ``posts_archive``, with their comments and reports, in batches.
+        Deleting the originals cascades to their group links and feed inbox
+        rows. Returns the number of posts archived.
+        """
+        if not schema.has_table('posts_archive') or not schema.has_column('posts', 'deleted_at'):
+            return 0
+        
+        def move(cursor, post_ids, placeholders):
+            copy_rows(cursor, 'posts', 'posts_archive', f"post_id IN ({placeholders})", post_ids)
+            copy_rows(cursor, 'comments', 'comments_archive', f"post_id IN ({placeholders})", post_ids)
+            copy_rows(cursor, 'post_reports', 'post_reports_archive', f"post_id IN ({placeholders})", post_ids)
+            cursor.execute(f"DELETE FROM posts WHERE post_id IN ({placeholders})", post_ids)
+        
+        select_ids = matching_ids('posts', 'post_id', "is_active = 0 AND deleted_at < %s", [deleted_before], batch_size)
+        return archive_in_batches(select_ids, move, pause)
+    
+    @staticmethod
+    def get_archived_post(post_id):
+        """An archived post with its comments (oldest first), or None"""
+        if not schema.has_table('posts_archive'):
+            return None
+        with read_connection().cursor() as cursor:
+            cursor.execute("""
+                SELECT a.post_id, a.content, a.date_created, a.post_type, a.user_id, u.name AS author,
+                       a.course_id, a.deleted_at, a.archived_at
+                FROM posts_archive a
+                JOIN users u ON a.user_id = u.user_id
+                WHERE a.post_id = %s
+            """, [post_id])
+            post = fetch_dict(cursor)
+            if post is None:
+                return None
+            cursor.execute("""
+                SELECT c.comment_id, c.content, c.date_created, c.user_id, u.name AS author, c.post_id, c.parent_id
+                FROM comments_archive c
+                JOIN users u ON c.user_id = u.user_id
+                WHERE c.post_id = %s
+                ORDER BY c.date_created, c.comment_id
+            """, [post_id])
+            post['comments'] = fetch_dicts(cursor)
+        return post
+    
+    @staticmethod
+    def reconcile_counters(batch_size=10000):
+        """
+        Recompute ``comment_count`` and ``report_count`` from the rows they
+        summarise, repairing drift from cascading deletes or bulk imports.
+        Returns the number of posts that were wrong.
+        """
+        if not schema.has_column('posts', 'comment_count'):
+            return 0
+        comments = "(SELECT COUNT(*) FROM comments c WHERE c.post_id = posts.post_id)"
+        reports = "(SELECT COUNT(*) FROM post_reports r WHERE r.post_id = posts.post_id)"
+        query = f"""
+            UPDATE posts SET comment_count = {comments}, report_count = {reports}
+            WHERE post_id BETWEEN %s AND %s
+              AND (comment_count <> {comments} OR report_count <> {reports})
+        """
+        return update_in_id_batches('posts', 'post_id', query, batch_size)
+    
+    @staticmethod
+    def get_posts_for_enrolled_courses(user_id, post_type=None, limit=None, after=None):
+        """
+        Get posts that are related to courses the user is enrolled in, paged like
+        ``get_posts``. Read from the user's ``feed_inbox`` when it exists.
+        """
+        query, params = _enrolled_feed_query(user_id, post_type, limit, after)
+        with read_connection().cursor() as cursor:
+            cursor.execute(query, params)
+            return fetch_dicts(cursor)
+    
+    @staticmethod
+    async def aget_posts_for_enrolled_courses(user_id, post_type=None, limit=None, after=None):
+        await schema.aensure_probed()
+        return await async_db.fetch_dicts(*_enrolled_feed_query(user_id, post_type, limit, after))
+
+    @staticmethod
+    def search_posts(query, course_id=None, post_type=None, limit=20, after=None):
+        """
+        Search active posts and their comments, best match first.
+
+        Returns up to ``limit + 1`` posts with a ``score`` field, continuing after
+        the ``after`` key ``(score, post_id)``. Uses the FULLTEXT indexes on MySQL
+        when they exist and an in-process inverted index otherwise.
+        """
+        if not tokenize(query):
+            return []
+        if has_fulltext_indexes():
+            return PostManager._search_posts_fulltext(query, course_id, post_type, limit, after)
+        return PostManager._search_posts_inverted(query, course_id, post_type, limit, after)
+    
+    @staticmethod
+    def _search_posts_fulltext(query, course_id, post_type, limit, after):
+        with read_connection().cursor() as cursor:
+            match = "MATCH(content) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+            # Placeholders in order: post score, post filter, comment weight, comment score, comment filter
+            params = [query, query, COMMENT_WEIGHT, query, query]
+            conditions = ["p.is_active = 1"]
+            
+            if course_id is not None:
+                conditions.append("p.course_id = %s")
+                params.append(course_id)
                 
-                if post_type is not None:
-                    conditions.append("p.post_type = %s")
-                    params.append(post_type)
-                    
-                where_clause = " AND ".join(conditions)
+            _filter_post_type(conditions, params, post_type)
+            
+            if after is not None:
+                clause, cursor_params = keyset_condition("ranked.score", "p.post_id", after)
+                conditions.append(clause)
+                params.extend(cursor_params)
                 
-                query = f"""
-                    SELECT p.post_id, p.content, p.date_created, p.post_type, u.name AS author, c.course_name 
-                    FROM posts p 
-                    JOIN users u ON p.user_id = u.user_id 
-                    JOIN courses c ON p.course_id = c.course_id 
-                    JOIN user_courses uc ON p.course_id = uc.course_id
-                    WHERE {where_clause}
-                    ORDER BY p.date_created DESC
-                """
-                cursor.execute(query, params)
-                posts = []
-                for row in cursor.fetchall():
-                    posts.append({
-                        'post_id': row[0],
-                        'content': row[1],
-                        'date_created': row[2],
-                        'post_type': row[3],
-                        'author': row[4],
-                        'course_name': row[5]
-                    })
-                return posts
-        except DatabaseError as e:
-            # If there's an error related to the post_type column
-            if "Unknown column 'p.post_type'" in str(e):
-                # Fallback query without post_type
-                with connection.cursor() as cursor:
-                    params = [user_id]
-                    conditions = ["p.is_active = 1", "uc.user_id = %s"]
+            where_clause = " AND ".join(conditions)
+            params.append(limit + 1)
+            
+            # Each branch is answered from its own FULLTEXT index before the join
+            query_sql = f"""
+                SELECT {_post_summary_columns()},
+                       ranked.score
+                FROM (
+                    SELECT hits.post_id, ROUND(SUM(hits.score), 6) AS score
+                    FROM (
+                        SELECT post_id, {match} AS score
+                        FROM posts WHERE {match}
+                        UNION ALL
+                        SELECT post_id, %s * {match} AS score
+                        FROM comments WHERE {match}
+                    ) hits
+                    GROUP BY hits.post_id
+                ) ranked
+                JOIN posts p ON p.post_id = ranked.post_id
+                JOIN users u ON p.user_id = u.user_id
+                LEFT JOIN courses c ON p.course_id = c.course_id
+                {_GROUP_JOINS}
+                WHERE {where_clause}
+                ORDER BY ranked.score DESC, p.post_id DESC
+                LIMIT %s
+            """
+            cursor.execute(query_sql, params)
+            return fetch_dicts(cursor, {'score': float})
+    
+    @staticmethod
+    def _build_search_index():
+        index = InvertedIndex()
+        # Kept for the life of the process, so build from the primary, not a lagging replica
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT post_id, content FROM posts WHERE is_active = 1")
+            for post_id, content in cursor.fetchall():
+                index.add(post_id, content)
+            cursor.execute("""
+                SELECT c.post_id, c.content
+                FROM comments c
+                JOIN posts p ON c.post_id = p.post_id
+                WHERE p.is_active = 1
+            """)
+            for post_id, content in cursor.fetchall():
+                index.add(post_id, content, weight=COMMENT_WEIGHT)
+        return index
+    
+    @staticmethod
+    def _load_search_documents(post_ids):
+        """``{post_id: [(text, weight), ...]}`` for the active posts among ``post_ids``"""
+        documents = {}
+        placeholders = ", ".join(["%s"] * len(post_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT post_id, content FROM posts WHERE is_active = 1 AND post_id IN ({placeholders})",
+                list(post_ids)
+            )
+            for post_id, content in cursor.fetchall():
+                documents[post_id] = [(content, POST_WEIGHT)]
+            if documents:
+                placeholders = ", ".join(["%s"] * len(documents))
+                cursor.execute(
+                    f"SELECT post_id, content FROM comments WHERE post_id IN ({placeholders})",
+                    list(documents)
+                )
+                for post_id, content in cursor.fetchall():
+                    documents[post_id].append((content, COMMENT_WEIGHT))
+        return documents
+    
+    @staticmethod
+    def _search_posts_inverted(query, course_id, post_type, limit, after):
+        scores = search_index.search(query, PostManager._build_search_index, PostManager._load_search_documents)
+        ranked = sorted(
+            ((round(score, 6), post_id) for post_id, score in scores.items()),
+            reverse=True
+        )
+        if after is not None:
+            after_key = (after[0], after[1])
+            ranked = [key for key in ranked if key < after_key]
+        if not ranked:
+            return []
+        
+        # Filters are applied in SQL, so keep reading ranked ids until the page is full
+        posts = []
+        batch_size = limit + 1
+        for start in range(0, len(ranked), batch_size):
+            batch = ranked[start:start + batch_size]
+            score_by_id = {post_id: score for score, post_id in batch}
+            with read_connection().cursor() as cursor:
+                params = list(score_by_id)
+                placeholders = ", ".join(["%s"] * len(params))
+                conditions = ["p.is_active = 1", f"p.post_id IN ({placeholders})"]
+                
+                if course_id is not None:
+                    conditions.append("p.course_id = %s")
+                    params.append(course_id)
                     
-                    where_clause = " AND ".join(conditions)
+                _filter_post_type(conditions, params, post_type)
                     
-                    # Use a default value for post_type since it doesn't exist
-                    query = f"""
-                        SELECT p.post_id, p.content, p.date_created, 'seeking' AS post_type, u.name AS author, c.course_name 
-                        FROM posts p 
-                        JOIN users u ON p.user_id = u.user_id 
-                        JOIN courses c ON p.course_id = c.course_id 
-                        JOIN user_courses uc ON p.course_id = uc.course_id
-                        WHERE {where_clause}
-                        ORDER BY p.date_created DESC
-                    """
-                    cursor.execute(query, params)
-                    posts = []
-                    for row in cursor.fetchall():
-                        posts.append({
-                            'post_id': row[0],
-                            'content': row[1],
-                            'date_created': row[2],
-                            'post_type': row[3],
-                            'author': row[4],
-                            'course_name': row[5]
-                        })
-                    return posts
-            else:
-                # For other database errors, re-raise
-                raise
+                where_clause = " AND ".join(conditions)
+                cursor.execute(f"""
+                    SELECT {_post_summary_columns()}
+                    FROM posts p
+                    JOIN users u ON p.user_id = u.user_id
+                    LEFT JOIN courses c ON p.course_id = c.course_id
+                    {_GROUP_JOINS}
+                    WHERE {where_clause}
+                """, params)
+                for post in fetch_dicts(cursor):
+                    post['score'] = score_by_id[post['post_id']]
+                    posts.append(post)
+            if len(posts) > limit:
+                break
+        
+        posts.sort(key=lambda post: (post['score'], post['post_id']), reverse=True)
+        return posts[:limit + 1]
 
 class CommentManager:
     @staticmethod
     def get_comments_for_post(post_id):
-        with connection.cursor() as cursor:
+        with read_connection().cursor() as cursor:
             query = """
-                SELECT c.comment_id, c.content, c.date_created, c.user_id, u.name AS author 
+                SELECT c.comment_id, c.content, c.date_created, c.user_id, u.name AS author, c.post_id, c.parent_id 
                 FROM comments c 
                 JOIN users u ON c.user_id = u.user_id 
                 WHERE c.post_id = %s
                 ORDER BY c.date_created DESC
             """
             cursor.execute(query, [post_id])
-            comments = []
-            for row in cursor.fetchall():
-                comments.append({
-                    'comment_id': row[0],
-                    'content': row[1],
-                    'date_created': row[2],
-                    'user_id': row[3],
-                    'author': row[4]
-                })
-            return comments
+            return fetch_dicts(cursor)
+    
+    @staticmethod
+    def get_comment_thread(post_id, limit=DEFAULT_PAGE_SIZE, after=None, max_depth=DEFAULT_MAX_DEPTH,
+                           replies_limit=DEFAULT_REPLIES_LIMIT, replies_to=None):
+        """
+        Get a post's comments as a tree.
+
+        Without ``replies_to`` this is one page of top-level comments (newest
+        first, continuing after the ``after`` key). With a decoded ``more_replies``
+        token it is the next page of replies to that comment instead. Returns
+        ``(nodes, next_token)``.
+        """
+        thread = CommentThread()
+        with read_connection().cursor() as cursor:
+            # Every query here is a range of idx_comments_replies, so the work is bounded by what is shown
+            if replies_to is None:
+                conditions, params = ["c.post_id = %s", "c.parent_id IS NULL"], [post_id]
+                if after is not None:
+                    clause, cursor_params = keyset_condition("c.date_created", "c.comment_id", after)
+                    conditions.append(clause)
+                    params.extend(cursor_params)
+                order = "c.date_created DESC, c.comment_id DESC"
+            else:
+                parent_id, after_date, after_id = replies_to
+                conditions, params = ["c.post_id = %s", "c.parent_id = %s"], [post_id, parent_id]
+                if after_date is not None:
+                    conditions.append("(c.date_created > %s OR (c.date_created = %s AND c.comment_id > %s))")
+                    params.extend([after_date, after_date, after_id])
+                order = "c.date_created, c.comment_id"
+            params.append(limit + 1)
+            cursor.execute(f"""
+                SELECT c.comment_id, c.parent_id, c.date_created, {_REPLY_COUNT.format(comment='c.comment_id')}
+                FROM comments c
+                WHERE {" AND ".join(conditions)}
+                ORDER BY {order}
+                LIMIT %s
+            """, params)
+            rows = cursor.fetchall()
+            has_more = len(rows) > limit
+            rows = rows[:limit]
+            # The page is recorded under no parent, in the order it is shown
+            roots = [(date_created, comment_id, parent) for comment_id, parent, date_created, _ in rows]
+            thread.reply_counts.update((row[0], row[3]) for row in rows)
+            
+            # Then the first few replies of every comment shown, one query per level
+            parents = [row[0] for row in rows if row[3]]
+            for _ in range(max_depth - 1):
+                if not parents:
+                    break
+                placeholders = ", ".join(["%s"] * len(parents))
+                cursor.execute(f"""
+                    SELECT ranked.comment_id, ranked.parent_id, ranked.date_created,
+                           {_REPLY_COUNT.format(comment='ranked.comment_id')}
+                    FROM (
+                        SELECT comment_id, parent_id, date_created,
+                               ROW_NUMBER() OVER (PARTITION BY parent_id ORDER BY date_created, comment_id) AS position
+                        FROM comments
+                        WHERE post_id = %s AND parent_id IN ({placeholders})
+                    ) ranked
+                    WHERE ranked.position <= %s
+                    ORDER BY ranked.parent_id, ranked.date_created, ranked.comment_id
+                """, [post_id, *parents, replies_limit + 1])
+                level = cursor.fetchall()
+                thread.add(level)
+                parents = [row[0] for row in level if row[3]]
+        
+        if replies_to is None:
+            next_token = encode_cursor(roots[-1][0], roots[-1][1]) if has_more else None
+        else:
+            next_token = replies_token(replies_to[0], roots[-1]) if has_more else None
+        
+        nodes = thread.build(roots, max_depth, replies_limit)
+        details = CommentManager._get_comment_details(thread.visible_ids)
+        pending = list(nodes)
+        while pending:
+            node = pending.pop()
+            node.update(details.get(node['comment_id'], {}))
+            node['post_id'] = post_id
+            pending.extend(node['replies'])
+        return nodes, next_token
+    
+    @staticmethod
+    def _get_comment_details(comment_ids):
+        """Load content and author for just the comments being returned"""
+        if not comment_ids:
+            return {}
+        with read_connection().cursor() as cursor:
+            placeholders = ", ".join(["%s"] * len(comment_ids))
+            query = f"""
+                SELECT c.comment_id, c.content, c.user_id, u.name AS author
+                FROM comments c
+                JOIN users u ON c.user_id = u.user_id
+                WHERE c.comment_id IN ({placeholders})
+            """
+            cursor.execute(query, comment_ids)
+            return {row['comment_id']: row for row in fetch_dicts(cursor)}
     
     @staticmethod
     def create_comment(post_id, user_id, content, parent_id=None):
-        with connection.cursor() as cursor:
-            # First check if post exists
-            post_query = "SELECT post_id FROM posts WHERE post_id = %s"
+        with transaction.atomic(), connection.cursor() as cursor:
+            # First check the post exists and isn't deleted; the lock holds off a
+            # concurrent delete or archive until the comment is in
+            post_query = f"SELECT post_id FROM posts WHERE post_id = %s AND is_active = 1 {for_update_sql()}"
             cursor.execute(post_query, [post_id])
             if not cursor.fetchone():
                 return None
@@ -358,32 +791,33 @@ class CommentManager:
             query = "INSERT INTO comments (post_id, user_id, content, parent_id) VALUES (%s, %s, %s, %s)"
             cursor.execute(query, [post_id, user_id, content, parent_id])
             comment_id = cursor.lastrowid
+            _bump_post_counter(cursor, post_id, 'comment_count', 1)
+            search_index.changed(cursor, [post_id])
             
             # Get the created comment
             get_query = """
-                SELECT c.comment_id, c.content, c.date_created, c.user_id, u.name AS author 
+                SELECT c.comment_id, c.content, c.date_created, c.user_id, u.name AS author, c.post_id, c.parent_id 
                 FROM comments c 
                 JOIN users u ON c.user_id = u.user_id 
                 WHERE c.comment_id = %s
             """
             cursor.execute(get_query, [comment_id])
-            row = cursor.fetchone()
-            if row:
-                return {
-                    'comment_id': row[0],
-                    'content': row[1],
-                    'date_created': row[2],
-                    'user_id': row[3],
-                    'author': row[4],
-                    'post_id': post_id,
-                    'parent_id': parent_id
-                }
-            return None
+            return fetch_dict(cursor)
     
     @staticmethod
     def delete_comment(comment_id, user_id, is_admin=False):
-        with connection.cursor() as cursor:
+        with transaction.atomic(), connection.cursor() as cursor:
             # Only the comment owner or an admin can delete a comment
-            query = "DELETE FROM comments WHERE comment_id = %s AND (user_id = %s OR %s)"
-            cursor.execute(query, [comment_id, user_id, is_admin])
-            return cursor.rowcount > 0
+            cursor.execute(
+                f"SELECT post_id FROM comments WHERE comment_id = %s AND (user_id = %s OR %s) {for_update_sql()}",
+                [comment_id, user_id, is_admin]
+            )
+            row = cursor.fetchone()
+            if not row:
+                return False
+            
+            cursor.execute("DELETE FROM comments WHERE comment_id = %s", [comment_id])
+            deleted = cursor.rowcount
+            _bump_post_counter(cursor, row[0], 'comment_count', -deleted)
+            search_index.changed(cursor, [row[0]])
+            return deleted > 0
@@ -0,0 +1,192 @@
+import datetime
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from api.schema import schema
+from api.sql import insert_many_sql
+
+# Mirrors InnoDB's defaults (innodb_ft_min_token_size = 3) so both backends
+# agree on which words are searchable
+MIN_TOKEN_LENGTH = 3
+STOPWORDS = frozenset([
+    'about', 'and', 'are', 'com', 'for', 'from', 'how', 'that', 'the', 'this',
+    'was', 'what', 'when', 'where', 'who', 'will', 'with', 'www',
+])
+
+# Comment matches count for less than matches in the post itself
+POST_WEIGHT = 1.0
+COMMENT_WEIGHT = 0.5
+
+_token_re = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Split text into lowercase searchable terms"""
+    return [
+        token for token in _token_re.findall((text or '').lower())
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+
+class InvertedIndex:
+    """
+    Pure-Python term -> post index used when the database has no FULLTEXT
+    support (SQLite test runs). Scores are weighted TF-IDF summed over the
+    query terms, with comment text credited to its post at ``COMMENT_WEIGHT``.
+    """
+    def __init__(self):
+        self._postings = defaultdict(dict)
+        # post_id -> {term: weighted frequency}, so a post can be taken out again
+        self._docs = {}
+
+    def add(self, post_id, text, weight=POST_WEIGHT):
+        terms = self._docs.setdefault(post_id, {})
+        for term in tokenize(text):
+            terms[term] = terms.get(term, 0.0) + weight
+            postings = self._postings[term]
+            postings[post_id] = postings.get(post_id, 0.0) + weight
+
+    def remove(self, post_id):
+        for term in self._docs.pop(post_id, {}):
+            postings = self._postings[term]
+            postings.pop(post_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query):
+        """Return ``{post_id: score}`` for posts matching any query term"""
+        scores = defaultdict(float)
+        total = len(self._docs)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + total / len(postings))
+            for post_id, tf in postings.items():
+                scores[post_id] += tf * idf
+        return scores
+
+
+def has_fulltext_indexes():
+    """Whether search can use MySQL's FULLTEXT indexes instead of the in-process index"""
+    return (
+        connection.vendor == 'mysql'
+        and schema.has_index('posts', 'ft_posts_content')
+        and schema.has_index('comments', 'ft_comments_content')
+    )
+
+
+# How long search_index_changes keeps a row; a process that hasn't synced for longer rebuilds
+CHANGE_RETENTION = datetime.timedelta(days=1)
+
+# How far back each sync re-reads, for changes committed out of order or stamped by a slower clock
+SYNC_OVERLAP = datetime.timedelta(seconds=60)
+
+
+def _utcnow():
+    # Stored as naive UTC, like every other timestamp
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class SearchIndexCache:
+    """
+    The process-wide fallback index, kept current post by post.
+
+    Writes call ``changed`` with the posts they touched. Once the write
+    commits those posts are re-indexed by the next search in this process;
+    other processes learn of them from ``search_index_changes``, which each one
+    reads at most every ``SEARCH_INDEX_SYNC_SECONDS``. The full build happens
+    once per process and, like re-indexing, reads the database without
+    holding the lock searches take.
+    """
+    def __init__(self, timer=time.monotonic):
+        self._timer = timer
+        self._index = None
+        # Held while the index is read or changed, never across a query
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._pending = set()
+        self._read_until = None
+        self._synced_at = None
+
+    def changed(self, cursor, post_ids):
+        """Re-index ``post_ids`` after the current transaction commits, in every process"""
+        post_ids = sorted(set(post_ids))
+        if not post_ids or has_fulltext_indexes():
+            return
+        if schema.has_table('search_index_changes'):
+            now = _utcnow()
+            cursor.execute("DELETE FROM search_index_changes WHERE changed_at < %s", [now - CHANGE_RETENTION])
+            params = []
+            for post_id in post_ids:
+                params.extend([post_id, now])
+            cursor.execute(insert_many_sql('search_index_changes', ['post_id', 'changed_at'], len(post_ids)), params)
+        transaction.on_commit(lambda: self._mark(post_ids))
+
+    def _mark(self, post_ids):
+        with self._lock:
+            self._pending.update(post_ids)
+
+    def search(self, query, build, load):
+        """
+        Score ``query`` against the index. ``build()`` makes a whole index and
+        ``load(post_ids)`` returns ``{post_id: [(text, weight), ...]}`` for the
+        ones still active.
+        """
+        if self._index is None:
+            with self._build_lock:
+                if self._index is None:
+                    self._rebuild(build)
+        self._sync(build, load)
+        with self._lock:
+            return self._index.search(query)
+
+    def _rebuild(self, build):
+        # Taken before reading the posts, so changes made while building are applied afterwards
+        started = _utcnow()
+        index = build()
+        with self._lock:
+            self._index = index
+        self._read_until = started
+        self._synced_at = self._timer()
+
+    def _sync(self, build, load):
+        # A search that finds another one syncing uses the index as it stands
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            shared = schema.has_table('search_index_changes')
+            now = self._timer()
+            if shared and now - self._synced_at >= CHANGE_RETENTION.total_seconds():
+                # Changes this process never read may already be deleted
+                self._rebuild(build)
+            with self._lock:
+                post_ids, self._pending = self._pending, set()
+            interval = getattr(settings, 'SEARCH_INDEX_SYNC_SECONDS', 5)
+            if shared and now - self._synced_at >= interval:
+                read_until = _utcnow()
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT DISTINCT post_id FROM search_index_changes WHERE changed_at >= %s",
+                        [self._read_until - SYNC_OVERLAP]
+                    )
+                    post_ids.update(row[0] for row in cursor.fetchall())
+                self._read_until = read_until
+                self._synced_at = now
+            if post_ids:
+                documents = load(post_ids)
+                with self._lock:
+                    for post_id in post_ids:
+                        self._index.remove(post_id)
+                        for text, weight in documents.get(post_id, ()):
+                            self._index.add(post_id, text, weight)
+        finally:
+            self._sync_lock.release()
+
+
+search_index = SearchIndexCache()
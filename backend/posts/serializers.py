@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from .models import MODERATION_ACTIONS
 
 class PostSerializer(serializers.Serializer):
     post_id = serializers.IntegerField(read_only=True)
@@ -7,6 +8,11 @@ class PostSerializer(serializers.Serializer):
     post_type = serializers.CharField(read_only=True)
     author = serializers.CharField(read_only=True)
     course_name = serializers.CharField(read_only=True, allow_null=True)
+    comment_count = serializers.IntegerField(read_only=True)
+    group_member_count = serializers.IntegerField(read_only=True, allow_null=True)
+
+class PostSearchResultSerializer(PostSerializer):
+    score = serializers.FloatField(read_only=True)
 
 class PostCreateSerializer(serializers.Serializer):
     content = serializers.CharField()
@@ -24,6 +30,13 @@ class ReportedPostSerializer(serializers.Serializer):
     content = serializers.CharField(read_only=True)
     user_id = serializers.IntegerField(read_only=True)
     author = serializers.CharField(read_only=True)
+    report_count = serializers.IntegerField(read_only=True)
+    last_reported_at = serializers.DateTimeField(read_only=True, allow_null=True)
+    reasons = serializers.ListField(child=serializers.CharField(), read_only=True)
+
+class ModerationActionSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=MODERATION_ACTIONS)
+    post_ids = serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=500)
 
 class CommentSerializer(serializers.Serializer):
     comment_id = serializers.IntegerField(read_only=True)
@@ -34,6 +47,27 @@ class CommentSerializer(serializers.Serializer):
     post_id = serializers.IntegerField(read_only=True)
     parent_id = serializers.IntegerField(allow_null=True, required=False)
 
+class ArchivedPostSerializer(serializers.Serializer):
+    post_id = serializers.IntegerField(read_only=True)
+    content = serializers.CharField(read_only=True)
+    date_created = serializers.DateTimeField(read_only=True)
+    post_type = serializers.CharField(read_only=True)
+    user_id = serializers.IntegerField(read_only=True)
+    author = serializers.CharField(read_only=True)
+    course_id = serializers.IntegerField(read_only=True, allow_null=True)
+    deleted_at = serializers.DateTimeField(read_only=True, allow_null=True)
+    archived_at = serializers.DateTimeField(read_only=True)
+    comments = CommentSerializer(many=True, read_only=True)
+
+class CommentThreadSerializer(CommentSerializer):
+    depth = serializers.IntegerField(read_only=True)
+    reply_count = serializers.IntegerField(read_only=True)
+    more_replies = serializers.CharField(read_only=True, allow_null=True)
+    replies = serializers.SerializerMethodField()
+    
+    def get_replies(self, obj):
+        return CommentThreadSerializer(obj['replies'], many=True).data
+
 class CommentCreateSerializer(serializers.Serializer):
     content = serializers.CharField()
     parent_id = serializers.IntegerField(allow_null=True, required=False) 
\ No newline at end of file
@@ -0,0 +1,70 @@
+from api.pagination import encode_cursor
+
+DEFAULT_MAX_DEPTH = 3
+MAX_DEPTH_LIMIT = 10
+DEFAULT_REPLIES_LIMIT = 5
+
+
+class CommentThread:
+    """
+    Threaded view of one page of a post's comments, built from
+    ``(comment_id, parent_id, date_created, reply_count)`` rows fetched a
+    level at a time: the page itself, then the first ``replies_limit + 1``
+    replies to each comment shown, down to ``max_depth``.
+
+    Top-level comments are newest first; replies are oldest first so a thread
+    reads as a conversation. Anything cut off by ``max_depth`` or
+    ``replies_limit`` is summarised by ``reply_count`` and a ``more_replies``
+    token that continues from the last reply shown.
+    """
+    def __init__(self):
+        self.children = {}
+        self.reply_counts = {}
+        self.visible_ids = []
+
+    def add(self, rows):
+        """
+        Record fetched comments, each reply under its parent; rows must arrive
+        oldest first within a parent. Returns them as ``(date_created,
+        comment_id, parent_id)`` entries.
+        """
+        entries = []
+        for comment_id, parent_id, date_created, reply_count in rows:
+            entry = (date_created, comment_id, parent_id)
+            self.reply_counts[comment_id] = reply_count
+            self.children.setdefault(parent_id, []).append(entry)
+            entries.append(entry)
+        return entries
+
+    def build(self, entries, max_depth, replies_limit, depth=1):
+        """Expand ``entries`` into nested node dicts down to ``max_depth`` levels"""
+        nodes = []
+        for date_created, comment_id, parent_id in entries:
+            self.visible_ids.append(comment_id)
+            reply_count = self.reply_counts.get(comment_id, 0)
+            children = self.children.get(comment_id, [])
+            node = {
+                'comment_id': comment_id,
+                'parent_id': parent_id,
+                'date_created': date_created,
+                'depth': depth,
+                'reply_count': reply_count,
+                'replies': [],
+                'more_replies': None
+            }
+            if reply_count and depth >= max_depth:
+                node['more_replies'] = replies_token(comment_id)
+            elif children:
+                shown, has_more = children[:replies_limit], len(children) > replies_limit
+                node['replies'] = self.build(shown, max_depth, replies_limit, depth + 1)
+                if has_more:
+                    node['more_replies'] = replies_token(comment_id, shown[-1])
+            nodes.append(node)
+        return nodes
+
+
+def replies_token(parent_id, last_shown=None):
+    """Continuation token for the replies to ``parent_id`` after ``last_shown``"""
+    if last_shown is None:
+        return encode_cursor(parent_id, None, None)
+    return encode_cursor(parent_id, last_shown[0], last_shown[1])
@@ -1,9 +1,14 @@
+from django.conf import settings
 from django.urls import path
 from .views import (
+    AsyncPostListView,
+    AsyncEnrolledPostListView,
     PostListView, 
+    PostSearchView,
     PostDetailView, 
     PostReportView, 
     ReportedPostListView, 
+    ArchivedPostView,
     CommentListView, 
     CommentDetailView, 
     join_group_from_post,
@@ -11,11 +16,21 @@ from .views import (
     enrolled_posts
 )
 
+# ASYNC_VIEWS picks the event-loop or thread-pool versions of the feeds
+if settings.ASYNC_VIEWS:
+    post_list_view = AsyncPostListView.as_view()
+    enrolled_posts_view = AsyncEnrolledPostListView.as_view()
+else:
+    post_list_view = PostListView.as_view()
+    enrolled_posts_view = enrolled_posts
+
 urlpatterns = [
-    path('', PostListView.as_view(), name='post-list'),
-    path('enrolled/', enrolled_posts, name='enrolled-posts'),
+    path('', post_list_view, name='post-list'),
+    path('enrolled/', enrolled_posts_view, name='enrolled-posts'),
+    path('search/', PostSearchView.as_view(), name='post-search'),
     path('<int:post_id>/', PostDetailView.as_view(), name='post-detail'),
     path('<int:post_id>/report/', PostReportView.as_view(), name='post-report'),
+    path('<int:post_id>/archived/', ArchivedPostView.as_view(), name='post-archived'),
     path('reported/', ReportedPostListView.as_view(), name='reported-posts'),
     
     # Comment endpoints
@@ -4,14 +4,31 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
 from authentication.permissions import IsAuthenticated, IsAdmin
-from .serializers import PostSerializer, PostCreateSerializer, PostUpdateSerializer, PostReportSerializer, ReportedPostSerializer, CommentSerializer, CommentCreateSerializer
+from .serializers import PostSerializer, PostSearchResultSerializer, PostCreateSerializer, PostUpdateSerializer, PostReportSerializer, ReportedPostSerializer, ModerationActionSerializer, ArchivedPostSerializer, CommentSerializer, CommentThreadSerializer, CommentCreateSerializer
 from .models import PostManager, CommentManager
 from courses.models import CourseManager
 from groups.models import GroupManager
-from django.db import connection, DatabaseError
+from .threads import DEFAULT_MAX_DEPTH, MAX_DEPTH_LIMIT, DEFAULT_REPLIES_LIMIT
+from api.async_views import AsyncAPIView, json_response
+from api.serialization import FastSerializer
+from api.pagination import InvalidCursor, decode_cursor, page_params, paginate, parse_limit
 
 # Create your views here.
 
+# Hot list endpoints render rows through these instead of a per-row DRF Serializer
+post_list_serializer = FastSerializer(PostSerializer)
+search_result_serializer = FastSerializer(PostSearchResultSerializer)
+comment_list_serializer = FastSerializer(CommentSerializer)
+
+def _post_sort_key(post):
+    return (post['date_created'], post['post_id'])
+
+def _search_sort_key(post):
+    return (post['score'], post['post_id'])
+
+def _report_sort_key(post):
+    return (post['report_count'], post['last_reported_at'], post['post_id'])
+
 class PostListView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -20,69 +37,26 @@ class PostListView(APIView):
         post_type = request.query_params.get('post_type', None)
         
         try:
-            posts = PostManager.get_posts(course_id, post_type)
-            serializer = PostSerializer(posts, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except DatabaseError as e:
-            # If there's an error related to the post_type column
-            if "Unknown column 'p.post_type'" in str(e):
-                # Fallback: get posts without filtering by post_type
-                try:
-                    # Get posts without post_type filter
-                    with connection.cursor() as cursor:
-                        params = []
-                        conditions = ["p.is_active = 1"]
-                        
-                        if course_id is not None:
-                            conditions.append("p.course_id = %s")
-                            params.append(course_id)
-                            
-                        where_clause = " AND ".join(conditions)
-                        
-                        query = f"""
-                            SELECT p.post_id, p.content, p.date_created, 'seeking' AS post_type, u.name AS author, c.course_name 
-                            FROM posts p 
-                            JOIN users u ON p.user_id = u.user_id 
-                            LEFT JOIN courses c ON p.course_id = c.course_id 
-                            WHERE {where_clause}
-                            ORDER BY p.date_created DESC
-                        """
-                        cursor.execute(query, params)
-                        posts = []
-                        for row in cursor.fetchall():
-                            posts.append({
-                                'post_id': row[0],
-                                'content': row[1],
-                                'date_created': row[2],
-                                'post_type': row[3],
-                                'author': row[4],
-                                'course_name': row[5]
-                            })
-                        
-                        serializer = PostSerializer(posts, many=True)
-                        return Response(serializer.data, status=status.HTTP_200_OK)
-                except Exception as inner_error:
-                    return Response(
-                        {'error': f'Database error: {str(inner_error)}'},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-            else:
-                # For other database errors
-                return Response(
-                    {'error': f'Database error: {str(e)}'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+            limit, cursor = page_params(request.query_params)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        posts = PostManager.get_posts(course_id, post_type, limit=limit, after=cursor)
+        if limit is None:
+            return Response(post_list_serializer.many(posts), status=status.HTTP_200_OK)
+        
+        posts, next_cursor = paginate(posts, limit, _post_sort_key)
+        return Response({
+            'results': post_list_serializer.many(posts),
+            'next': next_cursor
+        }, status=status.HTTP_200_OK)
     
     def post(self, request):
         serializer = PostCreateSerializer(data=request.data)
         if serializer.is_valid():
             course_id = serializer.validated_data.get('course_id')
             
-            # Try to get post_type if it exists in the serializer
-            try:
-                post_type = serializer.validated_data.get('post_type', 'seeking')
-            except:
-                post_type = 'seeking'  # Default if there's an issue
+            post_type = serializer.validated_data.get('post_type', 'seeking')
             
             # Verify course exists if specified
             if course_id is not None:
@@ -90,49 +64,48 @@ class PostListView(APIView):
                 if not course:
                     return Response({'error': 'Course not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            try:
-                post_id = PostManager.create_post(
-                    user_id=request.user.user_id,
-                    content=serializer.validated_data['content'],
-                    course_id=course_id,
-                    post_type=post_type
-                )
-            except DatabaseError as e:
-                # If there's an error related to the post_type column
-                if "Unknown column 'post_type'" in str(e):
-                    # Fallback: create post without post_type
-                    try:
-                        with connection.cursor() as cursor:
-                            query = "INSERT INTO posts (user_id, course_id, content) VALUES (%s, %s, %s)"
-                            cursor.execute(query, [request.user.user_id, course_id, serializer.validated_data['content']])
-                            post_id = cursor.lastrowid
-                    except Exception as inner_error:
-                        return Response(
-                            {'error': f'Error creating post: {str(inner_error)}'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                        )
-                else:
-                    # For other database errors
-                    return Response(
-                        {'error': f'Database error: {str(e)}'},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
+            post_id = PostManager.create_post(
+                user_id=request.user.user_id,
+                content=serializer.validated_data['content'],
+                course_id=course_id,
+                post_type=post_type
+            )
             
             # Get the created post with author info
-            try:
-                posts = PostManager.get_posts(None)
-                post = next((p for p in posts if p['post_id'] == post_id), None)
-                
-                if post:
-                    return Response(PostSerializer(post).data, status=status.HTTP_201_CREATED)
-                
-                return Response({'error': 'Failed to retrieve created post'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            except DatabaseError:
-                # If there's an issue getting posts with post_type, return a basic success response
-                return Response({'message': 'Post created successfully', 'post_id': post_id}, status=status.HTTP_201_CREATED)
+            post = PostManager.get_post_summary(post_id)
+            
+            if post:
+                return Response(PostSerializer(post).data, status=status.HTTP_201_CREATED)
+            
+            return Response({'error': 'Failed to retrieve created post'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class PostSearchView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Search posts and their comments, best match first"""
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'Search query is required'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        course_id = request.query_params.get('course_id', None)
+        post_type = request.query_params.get('post_type', None)
+        
+        try:
+            limit = parse_limit(request.query_params.get('limit'))
+            after = decode_cursor(request.query_params.get('cursor'))
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        posts = PostManager.search_posts(query, course_id, post_type, limit=limit, after=after)
+        posts, next_cursor = paginate(posts, limit, _search_sort_key)
+        return Response({
+            'results': search_result_serializer.many(posts),
+            'next': next_cursor
+        }, status=status.HTTP_200_OK)
+
 class PostDetailView(APIView):
     permission_classes = [IsAuthenticated]
     
@@ -155,8 +128,7 @@ class PostDetailView(APIView):
                 return Response({'error': 'Failed to update post or not authorized'}, status=status.HTTP_403_FORBIDDEN)
             
             # Get the updated post with author info
-            posts = PostManager.get_posts(None)
-            updated_post = next((p for p in posts if p['post_id'] == post_id), None)
+            updated_post = PostManager.get_post_summary(post_id)
             
             if updated_post:
                 return Response(PostSerializer(updated_post).data, status=status.HTTP_200_OK)
@@ -193,14 +165,17 @@ class PostReportView(APIView):
         
         serializer = PostReportSerializer(data=request.data)
         if serializer.is_valid():
-            success = PostManager.report_post(
+            reported = PostManager.report_post(
                 post_id=post_id,
                 user_id=request.user.user_id,
                 reason=serializer.validated_data['reason']
             )
             
-            if not success:
-                return Response({'error': 'Failed to report post'}, status=status.HTTP_400_BAD_REQUEST)
+            if reported is None:
+                return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
+            if not reported:
+                # Reporting is idempotent; repeats don't count twice
+                return Response({'message': 'Post already reported'}, status=status.HTTP_200_OK)
             
             return Response({'message': 'Post reported successfully'}, status=status.HTTP_200_OK)
         
@@ -214,9 +189,48 @@ class ReportedPostListView(APIView):
         if not request.user.is_admin:
             return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
         
-        posts = PostManager.get_reported_posts()
-        serializer = ReportedPostSerializer(posts, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        try:
+            limit, cursor = page_params(request.query_params, cursor_size=3)
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        posts = PostManager.get_reported_posts(limit=limit, after=cursor)
+        if limit is None:
+            return Response(ReportedPostSerializer(posts, many=True).data, status=status.HTTP_200_OK)
+        
+        posts, next_cursor = paginate(posts, limit, _report_sort_key)
+        return Response({
+            'results': ReportedPostSerializer(posts, many=True).data,
+            'next': next_cursor
+        }, status=status.HTTP_200_OK)
+    
+    def post(self, request):
+        """Hide or dismiss many reported posts in one go"""
+        if not request.user.is_admin:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+        
+        serializer = ModerationActionSerializer(data=request.data)
+        if serializer.is_valid():
+            action = serializer.validated_data['action']
+            moderated = PostManager.moderate_posts(serializer.validated_data['post_ids'], action)
+            return Response({'action': action, 'moderated': moderated}, status=status.HTTP_200_OK)
+        
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class ArchivedPostView(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, post_id):
+        """A deleted post and its comments after archive_data.py has moved them out of the live tables"""
+        post = PostManager.get_archived_post(post_id)
+        if not post:
+            return Response({'error': 'Archived post not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        # Only the author or an admin can look at archived posts
+        if post['user_id'] != request.user.user_id and not request.user.is_admin:
+            return Response({'error': 'Unauthorized'}, status=status.HTTP_403_FORBIDDEN)
+        
+        return Response(ArchivedPostSerializer(post).data, status=status.HTTP_200_OK)
 
 class CommentListView(APIView):
     permission_classes = [IsAuthenticated]
@@ -227,9 +241,32 @@ class CommentListView(APIView):
         if not post:
             return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        comments = CommentManager.get_comments_for_post(post_id)
-        serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        params = request.query_params
+        if 'threaded' not in params and 'replies' not in params:
+            comments = CommentManager.get_comments_for_post(post_id)
+            return Response(comment_list_serializer.many(comments), status=status.HTTP_200_OK)
+        
+        try:
+            limit = parse_limit(params.get('limit'))
+            max_depth = parse_limit(params.get('max_depth'), default=DEFAULT_MAX_DEPTH, maximum=MAX_DEPTH_LIMIT)
+            replies_limit = parse_limit(params.get('replies_limit'), default=DEFAULT_REPLIES_LIMIT)
+            replies_to = decode_cursor(params.get('replies'), size=3)
+            after = decode_cursor(params.get('cursor')) if replies_to is None else None
+        except InvalidCursor as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        nodes, next_token = CommentManager.get_comment_thread(
+            post_id,
+            limit=limit,
+            after=after,
+            max_depth=max_depth,
+            replies_limit=replies_limit,
+            replies_to=replies_to
+        )
+        return Response({
+            'results': CommentThreadSerializer(nodes, many=True).data,
+            'next': next_token
+        }, status=status.HTTP_200_OK)
     
     def post(self, request, post_id):
         # Verify post exists
@@ -273,62 +310,11 @@ class CommentDetailView(APIView):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def join_group_from_post(request, post_id):
-    # Verify post exists
-    post = PostManager.get_post_by_id(post_id)
-    if not post:
+    # Find or create the post's group and add the author and current user in one transaction
+    group = GroupManager.ensure_group_for_post(post_id, request.user.user_id)
+    if not group:
         return Response({'error': 'Post not found'}, status=status.HTTP_404_NOT_FOUND)
     
-    # Check if post already has a group
-    existing_group = PostManager.get_post_group(post_id)
-    if existing_group:
-        # Post already has a group, join the existing group
-        group_id = existing_group['group_id']
-    else:
-        # Post doesn't have a group yet, create a new one
-        course_id = post.get('course_id')
-        
-        # Get course name if available for group title
-        course_name = None
-        if course_id:
-            course = CourseManager.get_course_by_id(course_id)
-            if course:
-                course_name = course.get('course_name')
-        
-        # Create a title for the group
-        if course_name:
-            group_title = f"Study Group for {course_name}"
-        else:
-            group_title = "Study Group"
-        
-        # Create the group
-        group_id = GroupManager.create_group(group_title)
-        
-        if not group_id:
-            return Response({'error': 'Failed to create group'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-        # Associate the group with the post
-        success = PostManager.associate_group_with_post(post_id, group_id)
-        if not success:
-            return Response({'error': 'Failed to associate group with post'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    # Add the original post creator to the group first (if not already a member)
-    post_creator_id = post.get('user_id')
-    if post_creator_id:
-        # Check if creator is already in the group
-        if not GroupManager.is_member(group_id, post_creator_id):
-            # Add post creator to the group
-            GroupManager.join_group(group_id, post_creator_id)
-            print(f"Added post creator (user_id: {post_creator_id}) to group {group_id}")
-    
-    # Add the current user (who clicked join) to the group
-    if not GroupManager.is_member(group_id, request.user.user_id):
-        success = GroupManager.join_group(group_id, request.user.user_id)
-        if not success:
-            return Response({'error': 'Failed to join group'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    # Get updated group information
-    group = GroupManager.get_group_by_id(group_id)
-    
     return Response(group, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
@@ -348,28 +334,37 @@ def enrolled_posts(request):
     """Get posts related to courses the user is enrolled in"""
     post_type = request.query_params.get('post_type', None)
     
+    try:
+        limit, cursor = page_params(request.query_params)
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
     try:
         # Get user's enrolled courses
         posts = PostManager.get_posts_for_enrolled_courses(
             user_id=request.user.user_id,
-            post_type=post_type
+            post_type=post_type,
+            limit=limit,
+            after=cursor
         )
         
         # Check if the user has any enrolled courses
-        if not posts:
+        if not posts and cursor is None:
             # Get user's enrolled courses to determine if they have any
             user_courses = CourseManager.get_user_courses(request.user.user_id)
             if not user_courses:
                 # User has no enrolled courses
                 return Response({
                     'posts': [],
-                    'has_enrolled_courses': False
+                    'has_enrolled_courses': False,
+                    'next': None
                 }, status=status.HTTP_200_OK)
         
-        serializer = PostSerializer(posts, many=True)
+        posts, next_cursor = paginate(posts, limit, _post_sort_key)
         return Response({
-            'posts': serializer.data,
-            'has_enrolled_courses': True
+            'posts': post_list_serializer.many(posts),
+            'has_enrolled_courses': True,
+            'next': next_cursor
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -377,3 +372,67 @@ def enrolled_posts(request):
             {'error': f'Error fetching enrolled posts: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+class AsyncPostListView(AsyncAPIView):
+    """``PostListView`` with the feed GET served on the event loop"""
+    sync_view = PostListView
+    
+    async def get(self, request):
+        course_id = request.GET.get('course_id', None)
+        post_type = request.GET.get('post_type', None)
+        
+        try:
+            limit, cursor = page_params(request.GET)
+        except InvalidCursor as e:
+            return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        posts = await PostManager.aget_posts(course_id, post_type, limit=limit, after=cursor)
+        if limit is None:
+            return json_response(post_list_serializer.many(posts))
+        
+        posts, next_cursor = paginate(posts, limit, _post_sort_key)
+        return json_response({
+            'results': post_list_serializer.many(posts),
+            'next': next_cursor
+        })
+
+class AsyncEnrolledPostListView(AsyncAPIView):
+    """``enrolled_posts`` served on the event loop"""
+    
+    async def get(self, request):
+        post_type = request.GET.get('post_type', None)
+        
+        try:
+            limit, cursor = page_params(request.GET)
+        except InvalidCursor as e:
+            return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            posts = await PostManager.aget_posts_for_enrolled_courses(
+                user_id=request.user.user_id,
+                post_type=post_type,
+                limit=limit,
+                after=cursor
+            )
+            
+            if not posts and cursor is None:
+                user_courses = await CourseManager.aget_user_courses(request.user.user_id)
+                if not user_courses:
+                    return json_response({
+                        'posts': [],
+                        'has_enrolled_courses': False,
+                        'next': None
+                    })
+            
+            posts, next_cursor = paginate(posts, limit, _post_sort_key)
+            return json_response({
+                'posts': post_list_serializer.many(posts),
+                'has_enrolled_courses': True,
+                'next': next_cursor
+            })
+            
+        except Exception as e:
+            return json_response(
+                {'error': f'Error fetching enrolled posts: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""
+Recompute the denormalised counters (posts.comment_count, posts.report_count and
+study_groups.member_count) from the rows they summarise, and bring every user's
+feed_inbox in line with their enrollments.
+
+The managers keep these in step on every write, but cascading deletes (such as
+removing a user), bulk imports and manual SQL bypass them. The repair runs in
+id-range batches, one transaction each, so it is safe on a live database.
+
+Usage: python reconcile_counters.py [--batch-size 10000]
+"""
+import argparse
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'upeer_project.settings')
+
+import django
+django.setup()
+
+from posts import inbox
+from posts.models import PostManager
+from groups.models import GroupManager
+
+
+def reconcile(batch_size=10000):
+    """Repair every counter and inbox; returns ``(posts_fixed, groups_fixed, inbox_rows_fixed)``"""
+    return (
+        PostManager.reconcile_counters(batch_size),
+        GroupManager.reconcile_member_counts(batch_size),
+        inbox.reconcile(batch_size)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--batch-size', type=int, default=10000, help='ids per transaction')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    posts_fixed, groups_fixed, inbox_fixed = reconcile(args.batch_size)
+    print(f"✅  Repaired {posts_fixed} post(s), {groups_fixed} group(s) and {inbox_fixed} feed inbox row(s) "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
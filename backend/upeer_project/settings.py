@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import copy
 import os
 import environ
 
@@ -39,6 +40,7 @@ CORS_ALLOW_ALL_ORIGINS = True  # For development only
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',  # Must come first so runserver serves ASGI (WebSockets)
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -49,6 +51,7 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'corsheaders',
+    'channels',
     
     # Project apps
     'api',
@@ -60,6 +63,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',  # Outermost, so request latency covers all the middleware
+    'api.query_stats.QueryStatsMiddleware',  # Ahead of the rest, so it counts every other middleware's queries too
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',   # CORS middleware
@@ -67,6 +72,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'authentication.middleware.JWTMiddleware',  # Our custom JWT middleware
+    'api.routing.ReadYourWritesMiddleware',  # Needs the user from JWTMiddleware
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -89,6 +95,16 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'upeer_project.wsgi.application'
+ASGI_APPLICATION = 'upeer_project.asgi.application'
+
+# Channel layer used to fan chat messages out to WebSocket consumers.
+# The in-memory layer only reaches sockets in the same process; point
+# CHANNEL_LAYER_BACKEND at a shared layer when running several workers.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': env.str('CHANNEL_LAYER_BACKEND', default='channels.layers.InMemoryChannelLayer'),
+    },
+}
 
 
 # Database
@@ -108,6 +124,49 @@ DATABASES = {
     }
 }
 
+# Borrow MySQL connections from a per-process pool (api/backends/pooled_mysql)
+# instead of opening a new one for every request. Django hands connections back
+# to the pool when it closes them, so CONN_MAX_AGE stays 0 while pooling; it and
+# CONN_HEALTH_CHECKS only matter with DB_POOL=0. The pool keeps at least MIN_SIZE
+# connections once opened and never more than MAX_SIZE, waits up to TIMEOUT
+# seconds for a free one, pings connections idle for CHECK_AFTER seconds, and
+# closes them after MAX_LIFETIME seconds (or MAX_IDLE seconds unused).
+DATABASES['default']['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=0)
+DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool('DB_CONN_HEALTH_CHECKS', default=True)
+if env.bool('DB_POOL', default=True) and DATABASES['default']['ENGINE'] == 'django.db.backends.mysql':
+    DATABASES['default']['ENGINE'] = 'api.backends.pooled_mysql'
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+        'max_size': env.int('DB_POOL_MAX_SIZE', default=20),
+        'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),
+        'check_after': env.float('DB_POOL_CHECK_AFTER', default=30.0),
+        'max_lifetime': env.float('DB_POOL_MAX_LIFETIME', default=3600.0),
+        'max_idle': env.float('DB_POOL_MAX_IDLE', default=600.0),
+    }
+
+# import_data.py --method load-data sends files with LOAD DATA LOCAL INFILE,
+# which the MySQL client refuses unless this is switched on
+if env.bool('DB_LOCAL_INFILE', default=False):
+    DATABASES['default']['OPTIONS']['local_infile'] = 1
+
+# Optional read replica. Setting DB_REPLICA_HOST (or DB_REPLICA_NAME, e.g. a
+# second SQLite file) adds a 'replica' database with the primary's settings
+# and pool; any DB_REPLICA_* variable that is set overrides the matching DB_*.
+# Read-only manager queries go to it (api/routing.py) except during writes,
+# inside transactions, and for READ_REPLICA_STICKY_SECONDS after a user's last
+# successful write, which should comfortably exceed the replication lag.
+READ_REPLICA_ALIAS = None
+if env.str('DB_REPLICA_HOST', default='') or env.str('DB_REPLICA_NAME', default=''):
+    DATABASES['replica'] = copy.deepcopy(DATABASES['default'])
+    for key in ('HOST', 'PORT', 'NAME', 'USER', 'PASSWORD'):
+        value = env.str(f'DB_REPLICA_{key}', default='')
+        if value:
+            DATABASES['replica'][key] = value
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    READ_REPLICA_ALIAS = 'replica'
+READ_REPLICA_STICKY_SECONDS = env.float('READ_REPLICA_STICKY_SECONDS', default=5.0)
+DATABASE_ROUTERS = ['api.routing.ReplicaRouter']
+
 
 
 # Password validation
@@ -173,6 +232,71 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Per-process cache of users loaded by the JWT auth pipeline.
+# Profile changes made in another worker become visible after the TTL.
+AUTH_USER_CACHE_SIZE = env.int('AUTH_USER_CACHE_SIZE', default=1024)
+AUTH_USER_CACHE_TTL = env.int('AUTH_USER_CACHE_TTL', default=60)
+
+# JWTs (authentication.tokens). Access tokens carry the user's claims and are checked
+# without a query, so keep them short-lived; refresh tokens get a new pair from
+# /api/auth/refresh/. Revocations made by other workers are picked up within
+# TOKEN_REVOCATION_SYNC_SECONDS.
+JWT_ACCESS_TOKEN_LIFETIME = env.int('JWT_ACCESS_TOKEN_LIFETIME', default=15 * 60)
+JWT_REFRESH_TOKEN_LIFETIME = env.int('JWT_REFRESH_TOKEN_LIFETIME', default=14 * 24 * 3600)
+TOKEN_REVOCATION_SYNC_SECONDS = env.float('TOKEN_REVOCATION_SYNC_SECONDS', default=5)
+
+# Post search without the FULLTEXT indexes (SQLite, or MySQL before add_search_indexes.sql)
+# uses an in-process index. Posts changed by other workers are re-indexed within
+# SEARCH_INDEX_SYNC_SECONDS.
+SEARCH_INDEX_SYNC_SECONDS = env.float('SEARCH_INDEX_SYNC_SECONDS', default=5)
+
+# Password hashing (authentication.passwords). New hashes use PASSWORD_HASH_ALGORITHM
+# ('pbkdf2_sha256' or 'scrypt') at PASSWORD_HASH_COST: iterations for PBKDF2, N for
+# scrypt, 0 for the module's default. Existing hashes are upgraded on the user's next
+# login when either changes. Hashing runs on PASSWORD_HASH_WORKERS threads (0 for half
+# the CPUs); logins beyond PASSWORD_HASH_QUEUE waiting for one get a 503.
+PASSWORD_HASH_ALGORITHM = env.str('PASSWORD_HASH_ALGORITHM', default='pbkdf2_sha256')
+PASSWORD_HASH_COST = env.int('PASSWORD_HASH_COST', default=0)
+PASSWORD_HASH_WORKERS = env.int('PASSWORD_HASH_WORKERS', default=0)
+PASSWORD_HASH_QUEUE = env.int('PASSWORD_HASH_QUEUE', default=64)
+
+# Cached course list responses (api.response_cache). 'local' keeps a per-process
+# LRU; use 'redis' (or a dotted backend class path) so invalidations reach every worker.
+RESPONSE_CACHE_BACKEND = env.str('RESPONSE_CACHE_BACKEND', default='local')
+RESPONSE_CACHE_URL = env.str('RESPONSE_CACHE_URL', default='redis://localhost:6379/1')
+RESPONSE_CACHE_SIZE = env.int('RESPONSE_CACHE_SIZE', default=256)
+RESPONSE_CACHE_TTL = env.int('RESPONSE_CACHE_TTL', default=300)
+
+# Serve the chat polling and post feed GETs from async views. They wait on the
+# database without holding a worker thread, so slow polls can't starve the
+# sync views. ASYNC_DB_DRIVER is how they reach it: 'aiomysql' keeps its own
+# connection pool per worker (ASYNC_DB_POOL_*), 'thread' runs each query on
+# Django's connection in the thread pool (any database, no extra package).
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=True)
+ASYNC_DB_DRIVER = env.str(
+    'ASYNC_DB_DRIVER',
+    default='aiomysql' if DATABASES['default']['ENGINE'] in ('django.db.backends.mysql', 'api.backends.pooled_mysql') else 'thread'
+)
+ASYNC_DB_POOL_MIN = env.int('ASYNC_DB_POOL_MIN', default=1)
+ASYNC_DB_POOL_MAX = env.int('ASYNC_DB_POOL_MAX', default=10)
+ASYNC_DB_POOL_RECYCLE = env.int('ASYNC_DB_POOL_RECYCLE', default=3600)
+
+# Query instrumentation (api.query_stats). Each response gets a Server-Timing header
+# with its query count and database time; statements slower than SLOW_QUERY_MS are
+# logged to api.queries.slow with their normalized SQL and the Manager method that
+# ran them, and requests making QUERY_COUNT_WARNING or more queries to api.queries.
+# QUERY_LOG_LEVEL=DEBUG logs every request's figures.
+QUERY_STATS = env.bool('QUERY_STATS', default=True)
+SLOW_QUERY_MS = env.float('SLOW_QUERY_MS', default=100)
+QUERY_COUNT_WARNING = env.int('QUERY_COUNT_WARNING', default=20)
+QUERY_STATS_SLOWEST = env.int('QUERY_STATS_SLOWEST', default=3)
+
+# Prometheus metrics (api.metrics), served at /api/metrics to admins' JWTs and to
+# scrapers sending METRICS_TOKEN as a bearer token. Left empty, only admins can read them.
+# Users count as active chat pollers for METRICS_CHAT_POLLER_WINDOW seconds after a poll.
+METRICS_TOKEN = env.str('METRICS_TOKEN', default='')
+METRICS_CHAT_POLLER_WINDOW = env.int('METRICS_CHAT_POLLER_WINDOW', default=60)
+
 # Channels logging
 LOGGING = {
     'version': 1,
@@ -201,5 +325,15 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        'channels': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'api.queries': {
+            'handlers': ['console'],
+            'level': env.str('QUERY_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
     },
 }
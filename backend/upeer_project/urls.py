@@ -16,6 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from api.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -24,4 +25,5 @@ urlpatterns = [
     path('api/posts/', include('posts.urls')),
     path('api/groups/', include('groups.urls')),
     path('api/chat/', include('chat.urls')),
+    path('api/metrics', metrics_view, name='metrics'),
 ]
@@ -2,7 +2,7 @@ import React, { createContext, useState, useEffect, useContext } from 'react';
 import { useNavigate } from 'react-router-dom';
 import axios from 'axios';
 import { jwtDecode } from 'jwt-decode';
-import axiosInstance from '../services/axiosConfig';
+import axiosInstance, { saveTokens, clearTokens, refreshTokens } from '../services/axiosConfig';
 import { API_URL } from '../config';
 
 // Create auth context
@@ -36,12 +36,19 @@ export const AuthProvider = ({ children }) => {
               isAdmin: decoded.is_admin
             });
           } else {
-            localStorage.removeItem('token');
-            setToken(null);
+            // The access token ran out while the app was closed; the refresh token may not have
+            const { token, user } = await refreshTokens();
+            setToken(token);
+            setUser({
+              id: user.user_id,
+              email: user.email,
+              name: user.name,
+              isAdmin: user.is_admin
+            });
           }
         } catch (error) {
           console.error('Token validation error:', error);
-          localStorage.removeItem('token');
+          clearTokens();
           setToken(null);
         }
       }
@@ -61,9 +68,9 @@ export const AuthProvider = ({ children }) => {
         password
       });
       
-      // Save token to localStorage and set user in state
+      // Save tokens to localStorage and set user in state
       const { token, user } = response.data;
-      localStorage.setItem('token', token);
+      saveTokens(response.data);
       setToken(token);
       setUser({
         id: user.user_id,
@@ -91,9 +98,9 @@ export const AuthProvider = ({ children }) => {
         password
       });
       
-      // Save token to localStorage and set user in state
+      // Save tokens to localStorage and set user in state
       const { token, user } = response.data;
-      localStorage.setItem('token', token);
+      saveTokens(response.data);
       setToken(token);
       setUser({
         id: user.user_id,
@@ -114,7 +121,12 @@ export const AuthProvider = ({ children }) => {
 
   // Logout a user
   const logout = () => {
-    localStorage.removeItem('token');
+    // Revoke both tokens server-side; the user is logged out here whatever the answer
+    const refreshToken = localStorage.getItem('refreshToken');
+    axios.post(`${API_URL}/api/auth/logout/`, { refresh_token: refreshToken || undefined }, {
+      headers: token ? { Authorization: `Bearer ${token}` } : {}
+    }).catch(() => {});
+    clearTokens();
     setToken(null);
     setUser(null);
     navigate('/login');
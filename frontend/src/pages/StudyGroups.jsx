@@ -12,6 +12,21 @@ import {
   UserIcon
 } from '@heroicons/react/24/outline';
 
+// Saved messages sort by id; optimistic ones (temp-*) stay at the end until confirmed
+const isSaved = (message) => typeof message.message_id === 'number';
+
+// Add server copies of messages, dropping only the optimistic entry each one confirms
+const mergeSaved = (prev, saved) => {
+  let next = prev;
+  for (const message of saved) {
+    const pending = next.find(
+      m => !isSaved(m) && m.sender === message.sender && m.content === message.content
+    );
+    next = [...next.filter(m => m !== pending && m.message_id !== message.message_id), message];
+  }
+  return [...next.filter(isSaved).sort((a, b) => a.message_id - b.message_id), ...next.filter(m => !isSaved(m))];
+};
+
 const StudyGroups = () => {
   const [groups, setGroups] = useState([]);
   const [loading, setLoading] = useState(true);
@@ -26,6 +41,8 @@ const StudyGroups = () => {
   const [addingMember, setAddingMember] = useState(false);
   const { user } = useContext(AuthContext);
   const messagesEndRef = useRef(null);
+  const lastMessageIdRef = useRef(0);
+  const socketRef = useRef(null);
   const location = useLocation();
   
   // Check for any newly joined group from query params
@@ -47,12 +64,12 @@ const StudyGroups = () => {
     const fetchGroups = async () => {
       setLoading(true);
       try {
-        const data = await groupService.getUserGroups();
+        const data = await groupService.getInbox();
         setGroups(data);
         
         // If there are groups but none selected, select the most recent one
         if (data.length > 0 && !selectedGroup) {
-          setSelectedGroup(data[0]); // Groups are ordered by most recent ones
+          setSelectedGroup(data[0]); // Groups are ordered by their newest message
         }
       } catch (err) {
         setError('Failed to load your study groups. Please try again.');
@@ -73,14 +90,36 @@ const StudyGroups = () => {
     }
   }, [selectedGroup]);
 
+  // Receive new messages over a WebSocket while the group is open
+  useEffect(() => {
+    if (!selectedGroup) return;
+    
+    const socket = chatService.openGroupSocket(selectedGroup.group_id);
+    socketRef.current = socket;
+    
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (!message.message_id) return;
+      // Replace the optimistic copy of our own message, if this is one, and skip ones we already have
+      setMessages(prev => mergeSaved(prev, [message]));
+    };
+    
+    return () => {
+      socketRef.current = null;
+      socket.close();
+    };
+  }, [selectedGroup]);
+
   // Set up polling for new messages
   useEffect(() => {
     let intervalId;
     
     if (selectedGroup) {
-      // Poll for new messages every 5 seconds
+      // Poll every 5 seconds, but only as a fallback when the socket is down
       intervalId = setInterval(() => {
-        fetchGroupDetails();
+        if (socketRef.current?.readyState !== WebSocket.OPEN) {
+          fetchNewMessages();
+        }
       }, 5000);
     }
     
@@ -92,6 +131,14 @@ const StudyGroups = () => {
     };
   }, [selectedGroup]);
 
+  // Remember the newest saved message so polls only fetch what is missing
+  useEffect(() => {
+    lastMessageIdRef.current = messages.reduce(
+      (max, m) => (typeof m.message_id === 'number' && m.message_id > max ? m.message_id : max),
+      0
+    );
+  }, [messages]);
+
   // Scroll to bottom when messages change
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
@@ -103,6 +150,7 @@ const StudyGroups = () => {
       // Get group messages
       const messagesData = await chatService.getGroupMessages(selectedGroup.group_id);
       setMessages(messagesData);
+      markRead(selectedGroup.group_id);
 
       // Get group members
       const groupDetails = await groupService.getGroupDetails(selectedGroup.group_id);
@@ -115,6 +163,30 @@ const StudyGroups = () => {
     }
   };
 
+  // Clear the group's unread count now that its messages are on screen
+  const markRead = async (groupId) => {
+    setGroups(prev => prev.map(g => (g.group_id === groupId ? { ...g, unread_count: 0 } : g)));
+    try {
+      await groupService.markGroupRead(groupId);
+    } catch (err) {
+      console.error('Error marking group read:', err);
+    }
+  };
+
+  const fetchNewMessages = async () => {
+    try {
+      const newMessages = await chatService.getNewMessages(
+        selectedGroup.group_id,
+        lastMessageIdRef.current
+      );
+      if (newMessages.length > 0) {
+        setMessages(prev => mergeSaved(prev, newMessages));
+      }
+    } catch (err) {
+      console.error('Error polling messages:', err);
+    }
+  };
+
   const handleGroupSelect = (group) => {
     setSelectedGroup(group);
     setShowDetails(false); // Hide details panel when switching groups
@@ -124,28 +196,30 @@ const StudyGroups = () => {
     e.preventDefault();
     if (!newMessage.trim() || !selectedGroup) return;
 
+    // The server stores the trimmed text, which is what its copy is matched on
+    const messageContent = newMessage.trim();
+    // Create temporary message for optimistic UI update
+    const tempMessage = {
+      message_id: `temp-${Date.now()}-${Math.random().toString(36).slice(2)}`,
+      content: messageContent,
+      timestamp: new Date().toISOString(),
+      sender: user.name,
+    };
+
     try {
-      // Create temporary message for optimistic UI update
-      const tempMessage = {
-        message_id: `temp-${Date.now()}`,
-        content: newMessage,
-        timestamp: new Date().toISOString(),
-        sender: user.name,
-      };
-      
       // Add to UI immediately for better UX
       setMessages(prev => [...prev, tempMessage]);
       
       // Clear input field
-      const messageContent = newMessage;
       setNewMessage('');
       
-      // Send via API
-      await chatService.sendMessage(selectedGroup.group_id, messageContent);
-      
-      // Refresh to get the latest messages with proper IDs
-      await fetchGroupDetails();
+      // Send via API; the saved copy replaces the temporary one unless the socket got there first
+      const saved = await chatService.sendMessage(selectedGroup.group_id, messageContent);
+      setMessages(prev => mergeSaved(prev, [saved]));
     } catch (err) {
+      // Take back just this message and give the text back to retry
+      setMessages(prev => prev.filter(m => m.message_id !== tempMessage.message_id));
+      setNewMessage(messageContent);
       const errorMessage = err.response?.data?.error || 'Failed to send message';
       toast.error(errorMessage);
       console.error('Error sending message:', err);
@@ -243,11 +317,24 @@ const StudyGroups = () => {
                           <UserGroupIcon className="h-5 w-5" />
                         </div>
                       </div>
-                      <div className="ml-3">
-                        <p className="text-sm font-medium text-gray-900">{group.title}</p>
-                        <p className="text-xs text-gray-500">
-                          Created: {formatDate(group.date_created)}
-                        </p>
+                      <div className="ml-3 min-w-0 flex-1">
+                        <div className="flex items-center justify-between">
+                          <p className="text-sm font-medium text-gray-900 truncate">{group.title}</p>
+                          {group.unread_count > 0 && (
+                            <span className="ml-2 inline-flex items-center justify-center rounded-full bg-primary px-2 text-xs font-medium text-white">
+                              {group.unread_count}
+                            </span>
+                          )}
+                        </div>
+                        {group.last_message ? (
+                          <p className="text-xs text-gray-500 truncate">
+                            {group.last_message.sender}: {group.last_message.content}
+                          </p>
+                        ) : (
+                          <p className="text-xs text-gray-500">
+                            Created: {formatDate(group.date_created)}
+                          </p>
+                        )}
                       </div>
                     </div>
                   </li>
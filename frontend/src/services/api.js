@@ -161,6 +161,18 @@ export const groupService = {
     return response.data;
   },
   
+  // Get the user's groups with each one's last message and unread count
+  getInbox: async () => {
+    const response = await axiosInstance.get('/api/groups/inbox/');
+    return response.data;
+  },
+  
+  // Mark a group read up to messageId, or up to its newest message
+  markGroupRead: async (groupId, messageId) => {
+    const response = await axiosInstance.post(`/api/groups/${groupId}/read/`, messageId ? { message_id: messageId } : {});
+    return response.data;
+  },
+  
   // Create a new group
   createGroup: async (title) => {
     const response = await axiosInstance.post('/api/groups/', { title });
@@ -212,9 +224,24 @@ export const chatService = {
     return response.data;
   },
   
+  // Get only the messages newer than sinceId
+  getNewMessages: async (groupId, sinceId) => {
+    const response = await axiosInstance.get(`/api/chat/${groupId}/messages/`, {
+      params: { since: sinceId }
+    });
+    return response.data;
+  },
+  
   // Send a message to a group
   sendMessage: async (groupId, content) => {
     const response = await axiosInstance.post(`/api/chat/${groupId}/messages/`, { content });
     return response.data;
+  },
+  
+  // Open a WebSocket that receives the group's new messages as they are sent
+  openGroupSocket: (groupId) => {
+    const token = localStorage.getItem('token');
+    const wsUrl = API_URL.replace(/^http/, 'ws');
+    return new WebSocket(`${wsUrl}/ws/chat/${groupId}/?token=${encodeURIComponent(token)}`);
   }
 }; 
\ No newline at end of file
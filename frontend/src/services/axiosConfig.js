@@ -20,19 +20,68 @@ axiosInstance.interceptors.request.use(
   }
 );
 
+// Store the token pair returned by login, register and refresh
+export const saveTokens = ({ token, refresh_token }) => {
+  localStorage.setItem('token', token);
+  if (refresh_token) {
+    localStorage.setItem('refreshToken', refresh_token);
+  }
+};
+
+export const clearTokens = () => {
+  localStorage.removeItem('token');
+  localStorage.removeItem('refreshToken');
+};
+
+// One refresh at a time; requests that fail while it runs wait for the same new token
+let refreshing = null;
+
+export const refreshTokens = () => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) {
+    return Promise.reject(new Error('No refresh token'));
+  }
+  if (!refreshing) {
+    refreshing = axios.post(`${API_URL}/api/auth/refresh/`, { refresh_token: refreshToken })
+      .then((response) => {
+        saveTokens(response.data);
+        return response.data;
+      })
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+};
+
 axiosInstance.interceptors.response.use(
   (response) => {
     return response;
   },
-  (error) => {
+  async (error) => {
+    const original = error.config;
+    const message = error.response?.data?.error;
+    
+    // Access tokens are short-lived; swap in a new one and retry once
+    if (error.response?.status === 401 && message === 'Token has expired' && original && !original._retried) {
+      original._retried = true;
+      try {
+        const { token } = await refreshTokens();
+        original.headers.Authorization = `Bearer ${token}`;
+        return axiosInstance(original);
+      } catch (refreshError) {
+        // Fall through and send the user to the login page
+      }
+    }
+    
     if (error.response && (error.response.status === 401 || error.response.status === 403)) {
-      if (error.response.data && 
-          (error.response.data.error === 'Token has expired' || 
-           error.response.data.error === 'Invalid token' ||
-           error.response.data.error === 'Authentication required')) {
+      if (message === 'Token has expired' || 
+          message === 'Token has been revoked' ||
+          message === 'Invalid token' ||
+          message === 'Authentication required') {
         
-        // Clear token from localStorage
-        localStorage.removeItem('token');
+        // Clear tokens from localStorage
+        clearTokens();
         
         if (window.location.pathname !== '/login') {
           window.location.href = '/login';